@@ -1,11 +1,18 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+import sys
+
+# Bake the PNGs into one memory-mapped pack shipped next to the executable
+sys.path.insert(0, SPECPATH)
+from assetpack import bake
+bake(os.path.join(SPECPATH, 'assets'), os.path.join(SPECPATH, 'assets.dgp'))
 
 
 a = Analysis(
     ['dagyiman.py'],
     pathex=[],
     binaries=[],
-    datas=[('assets/*', 'assets/')],
+    datas=[('assets/*', 'assets/'), ('assets.dgp', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
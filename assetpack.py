@@ -0,0 +1,156 @@
+import os
+import sys
+import mmap
+import struct
+import pygame
+from settings import *
+
+# Single-file image pack for the frozen builds. At build time every PNG in
+# assets/ is decoded once, scaled to each size the game draws it at and the
+# raw RGBA pixels are written one after another behind a manifest. At runtime
+# the pack is memory-mapped and surfaces are made straight from the mapped
+# bytes with pygame.image.frombuffer, nothing is opened, decoded or scaled.
+#
+#   python assetpack.py            bake assets/ into assets.dgp
+ASSET_PACK_MAGIC = b'DGAP'
+ASSET_PACK_VERSION = 1
+HEADER_FORMAT = '<HI'      # version, entry count
+ENTRY_FORMAT = '<HHIIQ'    # width, height, pixel offset, source size, source mtime
+PIXEL_FORMAT = 'RGBA'
+PIXEL_ALIGN = 16
+
+# Every size assets.get_image is called with: pickups and the in-game player,
+# the menu and loading screen player, chairs
+BAKE_SIZES = [(CELL_SIZE-4, CELL_SIZE-4), (CELL_SIZE*2, CELL_SIZE*2),
+              (CELL_SIZE*2-4, CELL_SIZE*2-4)]
+
+class AssetPackError(Exception):
+    pass
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+def bake(assets_dir, path, sizes=BAKE_SIZES):
+    # Returns the number of images written
+    entries = []
+    for filename in sorted(os.listdir(assets_dir)):
+        if not filename.lower().endswith('.png'):
+            continue
+        source = os.path.join(assets_dir, filename)
+        try:
+            image = pygame.image.load(source)
+        except pygame.error as e:
+            print(f"Skipping {filename}: {e}")
+            continue
+        source_size, source_mtime = _source_stamp(source)
+        for size in sizes:
+            pixels = pygame.image.tobytes(pygame.transform.scale(image, size), PIXEL_FORMAT)
+            entries.append((filename, size, pixels, source_size, source_mtime))
+
+    # Manifest first, then the pixel blocks aligned so they can be mapped as is
+    manifest_size = 4 + struct.calcsize(HEADER_FORMAT)
+    for filename, size, pixels, source_size, source_mtime in entries:
+        manifest_size += 2 + len(filename.encode('utf-8')) + struct.calcsize(ENTRY_FORMAT)
+    offset = -(-manifest_size // PIXEL_ALIGN) * PIXEL_ALIGN
+
+    parts = [ASSET_PACK_MAGIC, struct.pack(HEADER_FORMAT, ASSET_PACK_VERSION, len(entries))]
+    blocks = []
+    for filename, size, pixels, source_size, source_mtime in entries:
+        name = filename.encode('utf-8')
+        parts.append(struct.pack('<H', len(name)) + name)
+        parts.append(struct.pack(ENTRY_FORMAT, size[0], size[1], offset, source_size, source_mtime))
+        padding = -len(pixels) % PIXEL_ALIGN
+        blocks.append(pixels + bytes(padding))
+        offset += len(pixels) + padding
+    manifest = b''.join(parts)
+    manifest += bytes(-len(manifest) % PIXEL_ALIGN)
+
+    # Written next to the target and swapped in, a running game never sees half a pack
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(manifest)
+        for block in blocks:
+            f.write(block)
+    os.replace(temporary, path)
+    return len(entries)
+
+class AssetPack:
+    # check_sources drops entries whose PNG in assets_dir changed since the
+    # bake, so a stale pack never hides edited art during development
+    def __init__(self, path, assets_dir=None, check_sources=True):
+        self.entries = {}  # (filename, size) -> pixel offset
+        self.file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.data[:4] != ASSET_PACK_MAGIC:
+                raise AssetPackError(f"{path} is not an asset pack")
+            version, count = struct.unpack_from(HEADER_FORMAT, self.data, 4)
+            if version != ASSET_PACK_VERSION:
+                raise AssetPackError(f"{path} has version {version}, expected {ASSET_PACK_VERSION}")
+
+            offset = 4 + struct.calcsize(HEADER_FORMAT)
+            stamps = {}
+            for _ in range(count):
+                length, = struct.unpack_from('<H', self.data, offset)
+                filename = self.data[offset + 2:offset + 2 + length].decode('utf-8')
+                offset += 2 + length
+                width, height, pixels, source_size, source_mtime = \
+                    struct.unpack_from(ENTRY_FORMAT, self.data, offset)
+                offset += struct.calcsize(ENTRY_FORMAT)
+                if pixels + width * height * 4 > len(self.data):
+                    raise AssetPackError(f"{path} is truncated")
+
+                if check_sources and assets_dir is not None:
+                    if filename not in stamps:
+                        source = os.path.join(assets_dir, filename)
+                        stamps[filename] = _source_stamp(source) if os.path.exists(source) else None
+                    stamp = stamps[filename]
+                    if stamp is not None and stamp != (source_size, source_mtime):
+                        continue
+                self.entries[(filename, (width, height))] = pixels
+        except (struct.error, ValueError, UnicodeDecodeError) as e:
+            self.close()
+            raise AssetPackError(f"{path} is damaged: {e}")
+        except AssetPackError:
+            self.close()
+            raise
+        self.view = memoryview(self.data)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def filenames(self):
+        return sorted(set(filename for filename, size in self.entries))
+
+    def surface(self, filename, size):
+        # The surface shares the mapped pixels, it is only copied when
+        # assets converts it to the display format
+        offset = self.entries.get((filename, size))
+        if offset is None:
+            return None
+        return pygame.image.frombuffer(self.view[offset:offset + size[0] * size[1] * 4],
+                                       size, PIXEL_FORMAT)
+
+    def close(self):
+        # Surfaces made from the pack must be gone before this, the mapping
+        # stays open while anything still points into it
+        if getattr(self, 'data', None) is not None:
+            try:
+                if getattr(self, 'view', None) is not None:
+                    self.view.release()
+                self.data.close()
+            except BufferError:
+                pass
+            self.data = None
+        self.file.close()
+
+if __name__ == '__main__':
+    import assets
+    destination = sys.argv[1] if len(sys.argv) > 1 else assets.ASSET_PACK_PATH
+    count = bake(assets.ASSETS_DIR, destination)
+    print(f"Baked {count} images from {assets.ASSETS_DIR} into {destination} "
+          f"({os.path.getsize(destination)} bytes)")
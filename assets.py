@@ -0,0 +1,131 @@
+import os
+import sys
+import threading
+import pygame
+from assetpack import AssetPack, AssetPackError
+
+# Central image registry: every PNG is decoded once and every scaled size is
+# built once, sprites share the cached surfaces instead of owning copies.
+# Images may be decoded on the loading thread; conversion to the display
+# format only ever happens on the main thread, see convert_pending().
+# Sizes baked into the asset pack are taken from it instead of the PNGs.
+ASSETS_DIR = 'assets'
+ASSET_PACK_PATH = 'assets.dgp'
+
+_pack = None  # AssetPack, False once opening failed or there is none
+_images = {}
+_scaled = {}
+_pending = {}  # (cache, key) -> True for alpha images, False for opaque fallbacks
+_lock = threading.RLock()
+
+def _can_convert():
+    return (threading.current_thread() is threading.main_thread()
+            and pygame.display.get_init() and pygame.display.get_surface() is not None)
+
+def get_pack():
+    global _pack
+    with _lock:
+        if _pack is None:
+            _pack = False
+            if os.path.exists(ASSET_PACK_PATH):
+                try:
+                    # Frozen builds ship the pack they were built with, only a
+                    # source checkout can have edited PNGs
+                    _pack = AssetPack(ASSET_PACK_PATH, ASSETS_DIR,
+                                      check_sources=not getattr(sys, 'frozen', False))
+                except (OSError, AssetPackError) as e:
+                    print("Error opening asset pack:", str(e))
+        return _pack or None
+
+def image_files():
+    if not os.path.isdir(ASSETS_DIR):
+        return []
+    return [filename for filename in sorted(os.listdir(ASSETS_DIR))
+            if filename.lower().endswith('.png')]
+
+def load_image(filename):
+    with _lock:
+        if filename in _images:
+            return _images[filename]
+
+        image = None
+        try:
+            image_path = os.path.join(ASSETS_DIR, filename)
+            if os.path.exists(image_path):
+                image = pygame.image.load(image_path)
+                if _can_convert():
+                    image = image.convert_alpha()
+                else:
+                    _pending[('image', filename)] = True
+        except (pygame.error, FileNotFoundError):
+            image = None
+
+        _images[filename] = image
+        return image
+
+def unpacked_files():
+    # PNGs the asset pack does not cover, these still have to be decoded
+    pack = get_pack()
+    if pack is None:
+        return image_files()
+    packed = pack.filenames()
+    return [filename for filename in image_files() if filename not in packed]
+
+def get_image(filename, size, fallback_color):
+    key = (filename, size)
+    surface = _scaled.get(key)
+    if surface is not None:
+        return surface
+
+    with _lock:
+        pack = get_pack()
+        surface = pack.surface(filename, size) if pack is not None else None
+        if surface is not None:
+            if _can_convert():
+                surface = surface.convert_alpha()
+            else:
+                _pending[('scaled', key)] = True
+            _scaled[key] = surface
+            return surface
+
+        image = load_image(filename)
+        if image is not None:
+            surface = pygame.transform.scale(image, size)
+            alpha = True
+        else:
+            # Fallback to colored rectangle
+            surface = pygame.Surface(size)
+            surface.fill(fallback_color)
+            alpha = False
+
+        if not _can_convert() or ('image', filename) in _pending:
+            _pending[('scaled', key)] = alpha
+        elif not alpha:
+            surface = surface.convert()
+        _scaled[key] = surface
+        return surface
+
+def convert_pending():
+    # Main thread only, once the display mode is set. Converts everything that
+    # was decoded without a display and returns {old surface: new surface} so
+    # sprites built off-thread can swap their image
+    remap = {}
+    if not _can_convert():
+        return remap
+    with _lock:
+        for (cache_name, key), alpha in _pending.items():
+            cache = _images if cache_name == 'image' else _scaled
+            surface = cache.get(key)
+            if surface is None:
+                continue
+            converted = surface.convert_alpha() if alpha else surface.convert()
+            cache[key] = converted
+            remap[surface] = converted
+        _pending.clear()
+    return remap
+
+def clear():
+    with _lock:
+        _images.clear()
+        _scaled.clear()
+        _pending.clear()
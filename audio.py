@@ -0,0 +1,170 @@
+import os
+import math
+import wave
+import threading
+from array import array
+import pygame
+from settings import *
+
+# Music and sound effects. Effects are decoded once into Sound buffers and
+# played on a fixed pool of channels; when every channel is busy a new effect
+# takes over the channel of the least important (then oldest) effect playing.
+# The MP3 music track is decoded once into a WAV cache that later runs stream
+# instead, so startup never pays for MP3 decoding.
+SOUNDS_DIR = 'assets'
+MUSIC_PATH = os.path.join(SOUNDS_DIR, 'Danci és a Szék Fatality.mp3')
+MUSIC_CACHE_PATH = 'music_cache.wav'
+
+# Effect name -> (file in SOUNDS_DIR, priority, fallback tone (Hz, ms))
+EFFECTS = {
+    'pickup': ('pickup.wav', 1, (880, 60)),
+    'ambulance': ('ambulance.wav', 2, (660, 180)),
+    'hit': ('hit.wav', 3, (160, 220)),
+    'fatality': ('fatality.wav', 4, (110, 900)),
+}
+
+# Simulation events that trigger an effect
+EVENT_EFFECTS = {
+    'pickup': 'pickup',
+    'ambulance': 'ambulance',
+    'hit': 'hit',
+    'game_over': 'fatality',
+}
+
+def make_tone(frequency, duration, volume=0.4):
+    # Fading sine beep in the mixer's format, stands in for a missing file
+    mixer_frequency, size, channels = pygame.mixer.get_init()
+    if size != -16:
+        return None
+    count = int(mixer_frequency * duration / 1000)
+    amplitude = 32767 * volume
+    step = 2 * math.pi * frequency / mixer_frequency
+    samples = array('h')
+    for i in range(count):
+        value = int(amplitude * (1 - i / count) * math.sin(step * i))
+        samples.extend([value] * channels)
+    return pygame.mixer.Sound(buffer=samples)
+
+class AudioEngine:
+    def __init__(self, channels=EFFECT_CHANNELS):
+        self.channel_count = channels
+        self.enabled = False
+        self.sounds = {}
+        self.priorities = {}
+        self.channels = []
+        self.playing = []  # (priority, play order) of the effect on each channel
+        self.play_count = 0
+        self.volume = 1.0
+        self.cache_thread = None
+
+    def init(self, frequency=AUDIO_FREQUENCY, buffer=AUDIO_BUFFER):
+        # Returns False when there is no usable audio device, the game runs silent
+        try:
+            pygame.mixer.init(frequency=frequency, size=-16, channels=2, buffer=buffer)
+        except pygame.error as e:
+            print("Error initializing audio:", str(e))
+            return False
+        pygame.mixer.set_num_channels(self.channel_count)
+        self.channels = [pygame.mixer.Channel(i) for i in range(self.channel_count)]
+        self.playing = [(0, 0)] * self.channel_count
+        self.enabled = True
+        return True
+
+    def load_effects(self):
+        # Decode every effect once, safe to call from the loading thread
+        if not self.enabled or self.sounds:
+            return
+        sounds = {}
+        for name, (filename, priority, tone) in EFFECTS.items():
+            sound = None
+            path = os.path.join(SOUNDS_DIR, filename)
+            try:
+                if os.path.exists(path):
+                    sound = pygame.mixer.Sound(path)
+            except pygame.error as e:
+                print("Error loading sound:", path, str(e))
+            if sound is None:
+                sound = make_tone(*tone)
+            if sound is not None:
+                sounds[name] = sound
+                self.priorities[name] = priority
+        self.sounds = sounds
+
+    def play(self, name):
+        sound = self.sounds.get(name)
+        if sound is None:
+            return None
+        priority = self.priorities[name]
+
+        # A free channel if there is one, otherwise the least important and
+        # oldest effect that is not more important than this one
+        target = None
+        for index, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                target = index
+                break
+            if self.playing[index][0] <= priority and (target is None or self.playing[index] < self.playing[target]):
+                target = index
+        if target is None:
+            return None
+
+        self.play_count += 1
+        channel = self.channels[target]
+        channel.play(sound)  # Stops whatever was still playing on it
+        channel.set_volume(self.volume)
+        self.playing[target] = (priority, self.play_count)
+        return channel
+
+    def play_events(self, events):
+        for event in events:
+            name = EVENT_EFFECTS.get(event)
+            if name is not None:
+                self.play(name)
+
+    def set_volume(self, volume):
+        self.volume = volume
+        if self.enabled:
+            pygame.mixer.music.set_volume(volume)
+            for channel in self.channels:
+                channel.set_volume(volume)
+
+    def music_cache_valid(self, path=MUSIC_PATH):
+        return (os.path.exists(MUSIC_CACHE_PATH) and
+                os.path.getmtime(MUSIC_CACHE_PATH) >= os.path.getmtime(path))
+
+    def start_music(self, volume, path=MUSIC_PATH):
+        if not self.enabled:
+            return
+        if not os.path.exists(path):
+            print("Music file not found:", path)
+            return
+
+        cached = self.music_cache_valid(path)
+        try:
+            pygame.mixer.music.load(MUSIC_CACHE_PATH if cached else path)
+            pygame.mixer.music.play(-1)  # Loop indefinitely
+            pygame.mixer.music.set_volume(volume)
+        except (pygame.error, FileNotFoundError) as e:
+            print("Error loading music:", str(e))
+            return
+
+        if not cached:
+            # Stream the MP3 this time and decode the cache for the next run
+            self.cache_thread = threading.Thread(target=self._write_music_cache, args=(path,),
+                                                 name='MusicCache', daemon=True)
+            self.cache_thread.start()
+
+    def _write_music_cache(self, path):
+        temp_path = MUSIC_CACHE_PATH + '.tmp'
+        try:
+            sound = pygame.mixer.Sound(path)
+            frequency, size, channels = pygame.mixer.get_init()
+            with wave.open(temp_path, 'wb') as f:
+                f.setnchannels(channels)
+                f.setsampwidth(abs(size) // 8)
+                f.setframerate(frequency)
+                f.writeframes(sound.get_raw())
+            os.replace(temp_path, MUSIC_CACHE_PATH)
+        except (pygame.error, OSError, TypeError) as e:
+            # TypeError: the mixer was closed while decoding
+            print("Error caching music:", str(e))
@@ -0,0 +1,173 @@
+import os
+import csv
+import time
+import json
+import random
+import argparse
+import statistics
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+# Run without a window or audio device, also in the worker processes
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from settings import *
+from entities import MOVE_LEFT, MOVE_RIGHT, MOVE_UP, MOVE_DOWN
+from simulation import GameSimulation
+
+# Monte Carlo balance runs. Every combination of the swept settings plays
+# --games headless games with a bot at full speed, spread over a process
+# pool, and the survival time, score and lives over time are averaged per
+# combination. Game i uses seed --seed + i for every combination, so the
+# combinations are compared on the same maps and spawns.
+
+MOVES = [MOVE_LEFT, MOVE_RIGHT, MOVE_UP, MOVE_DOWN]
+
+class RandomPlayer:
+    # Holds a random direction for a while, like someone mashing keys
+    def __init__(self, rng):
+        self.rng = rng
+        self.move = 0
+        self.ticks_left = 0
+
+    def actions(self, simulation):
+        if self.ticks_left <= 0:
+            self.move = self.rng.choice(MOVES)
+            self.ticks_left = self.rng.randint(10, 60)
+        self.ticks_left -= 1
+        return self.move
+
+class GreedyPlayer:
+    # Heads for the nearest medicine (an ambulance on the last life) and
+    # wanders for a moment whenever a wall stops it
+    def __init__(self, rng):
+        self.wander = RandomPlayer(rng)
+        self.last_pos = None
+
+    def actions(self, simulation):
+        player = simulation.player
+        pos = player.rect.topleft
+        stuck = pos == self.last_pos
+        self.last_pos = pos
+        if stuck and self.wander.ticks_left <= 0:
+            self.wander.ticks_left = 0
+            self.wander.actions(simulation)
+            return self.wander.move
+        if self.wander.ticks_left > 0:
+            return self.wander.actions(simulation)
+
+        targets = simulation.ambulances if player.lives == 1 and simulation.ambulances else simulation.pickups
+        if not targets:
+            return 0
+        x, y = player.rect.center
+        target = min(targets, key=lambda sprite: abs(sprite.rect.centerx - x) + abs(sprite.rect.centery - y))
+        dx = target.rect.centerx - x
+        dy = target.rect.centery - y
+        if abs(dx) > abs(dy):
+            return MOVE_RIGHT if dx > 0 else MOVE_LEFT
+        return MOVE_DOWN if dy > 0 else MOVE_UP
+
+PLAYERS = {'random': RandomPlayer, 'greedy': GreedyPlayer}
+
+def play_game(task):
+    # One game; task is (settings, seed, player, max ticks, ticks per sample)
+    params, seed, player_name, max_ticks, sample_ticks = task
+    simulation = GameSimulation(**params)
+    state = simulation.reset(seed)
+    player = PLAYERS[player_name](random.Random(seed))
+    lives = []
+    while not state['game_over'] and simulation.tick < max_ticks:
+        state = simulation.step(player.actions(simulation))
+        if simulation.tick % sample_ticks == 0:
+            lives.append(state['lives'])
+    # A dead player has no lives for the rest of the samples
+    lives += [0 if state['game_over'] else state['lives']] * (max_ticks // sample_ticks - len(lives))
+    return {'params': params, 'seed': seed, 'ticks': simulation.tick,
+            'survived': not state['game_over'], 'score': state['score'], 'lives': lives}
+
+def aggregate(results, fps, sample_seconds):
+    groups = {}
+    for result in results:
+        groups.setdefault(json.dumps(result['params'], sort_keys=True), []).append(result)
+
+    rows = []
+    for key, games in groups.items():
+        survival = [game['ticks'] / fps for game in games]
+        row = dict(json.loads(key))
+        row.update({
+            'games': len(games),
+            'survival_mean_s': statistics.fmean(survival),
+            'survival_median_s': statistics.median(survival),
+            'survived_pct': 100 * sum(game['survived'] for game in games) / len(games),
+            'score_mean': statistics.fmean(game['score'] for game in games),
+            'score_median': statistics.median(game['score'] for game in games),
+        })
+        for i, lives in enumerate(zip(*(game['lives'] for game in games))):
+            row[f'lives_{(i + 1) * sample_seconds}s'] = statistics.fmean(lives)
+        rows.append(row)
+    return rows
+
+def print_table(rows):
+    if not rows:
+        return
+    columns = list(rows[0])
+    widths = [max(len(column), 8) for column in columns]
+    print("  ".join(f"{column:>{width}}" for column, width in zip(columns, widths)))
+    for row in rows:
+        cells = [f"{row[column]:.2f}" if isinstance(row[column], float) else str(row[column])
+                 for column in columns]
+        print("  ".join(f"{cell:>{width}}" for cell, width in zip(cells, widths)))
+
+def parse_list(kind):
+    return lambda value: [kind(v) for v in value.split(',')]
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless Dagyiman balance sweeps')
+    parser.add_argument('--enemy-speed', type=parse_list(float), default=[ENEMY_SPEED])
+    parser.add_argument('--min-medicines', type=parse_list(int), default=[MIN_MEDICINES])
+    parser.add_argument('--medicine-spawn-time', type=parse_list(int), default=[MEDICINE_SPAWN_TIME])
+    parser.add_argument('--ambulance-spawn-time', type=parse_list(int), default=[AMBULANCE_SPAWN_TIME])
+    parser.add_argument('--chair-respawn-time', type=parse_list(int), default=[CHAIR_RESPAWN_TIME])
+    parser.add_argument('--chair-ai', choices=['graph', 'hunt', 'wander'], default=CHAIR_AI)
+    parser.add_argument('--player', choices=sorted(PLAYERS), default='greedy')
+    parser.add_argument('--games', type=int, default=20, help='Games per combination')
+    parser.add_argument('--max-seconds', type=int, default=180, help='Game time before a game is cut off')
+    parser.add_argument('--sample-seconds', type=int, default=30, help='Interval of the lives columns')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--out', default='balance_results.csv')
+    args = parser.parse_args()
+
+    sweep = [dict(zip(['enemy_speed', 'min_medicines', 'medicine_spawn_time',
+                       'ambulance_spawn_time', 'chair_respawn_time'], values))
+             for values in itertools.product(args.enemy_speed, args.min_medicines,
+                                             args.medicine_spawn_time, args.ambulance_spawn_time,
+                                             args.chair_respawn_time)]
+    max_ticks = args.max_seconds * FPS
+    sample_ticks = args.sample_seconds * FPS
+    tasks = [(dict(params, chair_ai=args.chair_ai), args.seed + game, args.player, max_ticks, sample_ticks)
+             for params in sweep for game in range(args.games)]
+    print(f"{len(tasks)} games ({len(sweep)} combinations) on {args.workers} workers")
+
+    start = time.perf_counter()
+    if args.workers <= 1:
+        results = list(map(play_game, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            chunksize = max(1, len(tasks) // (args.workers * 4))
+            results = list(executor.map(play_game, tasks, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+    ticks = sum(result['ticks'] for result in results)
+    print(f"{elapsed:.1f} s, {len(results) / elapsed:.1f} games/s, {ticks / elapsed:.0f} ticks/s")
+
+    rows = aggregate(results, FPS, args.sample_seconds)
+    print_table(rows)
+    with open(args.out, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    print("Results written to", args.out)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import statistics
+
+# Run without a window or audio device
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+from settings import *
+from map import load_map, load_wall_grid, scaled_layout, compile_map, layout_hash, clear_compiled_maps
+from mapstore import ChunkedMap, write_chunked_map
+from spawning import SpawnIndex
+from entities import find_empty_position
+from simulation import GameSimulation, PICKUP_SIZE, AMBULANCE_SIZE, CHAIR_SIZE
+from camera import Camera, ChunkedBackground
+import text
+
+# Headless benchmarks for the hot paths: map loading, spawn placement, one
+# simulation tick and drawing. Results are written as JSON so two commits can
+# be compared with --compare.
+
+def measure(func, iterations, warmup=3):
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'mean_ms': statistics.fmean(samples),
+        'median_ms': statistics.median(samples),
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'min_ms': samples[0],
+        'max_ms': samples[-1],
+    }
+
+def bench_map_load(layout, iterations):
+    def run():
+        # Without the in-memory copy every iteration loads the map for real
+        clear_compiled_maps()
+        load_map(CELL_SIZE, layout)
+        load_wall_grid(CELL_SIZE, layout)
+    return measure(run, iterations)
+
+def bench_spawn(layout, occupancy, iterations):
+    wall_grid = load_wall_grid(CELL_SIZE, layout)
+    width = max(WINDOW_WIDTH, wall_grid.cols * CELL_SIZE)
+    height = max(WINDOW_HEIGHT, wall_grid.rows * CELL_SIZE)
+    spawn_index = SpawnIndex(wall_grid, width, height, CELL_SIZE*2,
+                             sizes=[PICKUP_SIZE, AMBULANCE_SIZE, CHAIR_SIZE])
+
+    # Fill the requested share of the pickup placements with dummy entities
+    rng = random.Random(0)
+    footprint = spawn_index.footprints[PICKUP_SIZE]
+    placements = list(footprint.placements)
+    rng.shuffle(placements)
+    for x, y in placements[:int(len(placements) * occupancy)]:
+        sprite = pygame.sprite.Sprite()
+        sprite.rect = pygame.Rect(x, y, PICKUP_SIZE[0], PICKUP_SIZE[1])
+        spawn_index.add(sprite)
+
+    def run():
+        find_empty_position(spawn_index, PICKUP_SIZE, rng=rng)
+        find_empty_position(spawn_index, CHAIR_SIZE, player_pos=(CELL_SIZE*2, CELL_SIZE*2), rng=rng)
+    return measure(run, iterations)
+
+def bench_chunked_map(layout, iterations):
+    # Open a chunked copy of the map and sweep a window-sized area across it
+    # with collision queries, only the chunks under the window are paged in
+    compiled = compile_map(layout)
+    width = compiled.cols * CELL_SIZE
+    height = compiled.rows * CELL_SIZE
+    rng = random.Random(0)
+    resident = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.dgc')
+        write_chunked_map(path, compiled, layout_hash(layout))
+
+        def run():
+            chunked_map = ChunkedMap(path)
+            x = rng.randrange(max(1, width - WINDOW_WIDTH))
+            y = rng.randrange(max(1, height - WINDOW_HEIGHT))
+            for _ in range(200):
+                chunked_map.collides_area(x + rng.randrange(WINDOW_WIDTH), y + rng.randrange(WINDOW_HEIGHT),
+                                          CELL_SIZE*2, CELL_SIZE*2)
+            resident.append(len(chunked_map))
+            chunked_map.close()
+        stats = measure(run, iterations)
+    stats['max_resident_chunks'] = max(resident)
+    return stats
+
+def make_simulation(layout, chairs, pickups, batched):
+    simulation = GameSimulation(chair_count=chairs, batched_chairs=batched,
+                                min_medicines=pickups, layout=layout)
+    simulation.reset(seed=0)
+    simulation.player.lives = 10 ** 9  # Keep the run going for the whole benchmark
+    return simulation
+
+def bench_step(layout, chairs, pickups, batched, iterations):
+    simulation = make_simulation(layout, chairs, pickups, batched)
+    rng = random.Random(0)
+    actions = [rng.choice([1, 2, 4, 8]) for _ in range(iterations + 10)]
+    counter = iter(actions)
+    return measure(lambda: simulation.step(next(counter)), iterations)
+
+def bench_draw(layout, chairs, pickups, batched, iterations):
+    simulation = make_simulation(layout, chairs, pickups, batched)
+    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    background = ChunkedBackground(simulation.walls, simulation.width, simulation.height)
+    background.prerender()
+    camera = Camera()
+    camera.set_world(simulation.width, simulation.height)
+    score_hud = text.HudText('Score: {}', 36, WHITE)
+    lives_hud = text.HudText('Lives: {}', 36, WHITE)
+
+    def run():
+        camera.follow(simulation.player.rect)
+        background.draw(screen, camera.rect)
+        camera.draw_sprites(screen, simulation.visible_sprites(camera.rect))
+        screen.blit(score_hud.render(simulation.player.score), (10, 10))
+        screen.blit(lives_hud.render(simulation.player.lives), (10, 50))
+    return measure(run, iterations)
+
+def run_suite(args):
+    results = []
+
+    def record(name, params, stats):
+        results.append({'name': name, 'params': params, **stats})
+        print(f"{name:<10} {json.dumps(params, sort_keys=True):<60} "
+              f"mean {stats['mean_ms']:8.3f} ms  p95 {stats['p95_ms']:8.3f} ms")
+
+    for scale in args.map_scale:
+        layout = scaled_layout(scale)
+        record('map_load', {'map_scale': scale}, bench_map_load(layout, max(args.iterations // 20, 5)))
+        record('chunk_map', {'map_scale': scale}, bench_chunked_map(layout, max(args.iterations // 10, 5)))
+
+        for occupancy in args.occupancy:
+            record('spawn', {'map_scale': scale, 'occupancy': occupancy},
+                   bench_spawn(layout, occupancy, args.iterations))
+
+        for chairs in args.chairs:
+            for pickups in args.pickups:
+                params = {'map_scale': scale, 'chairs': chairs, 'pickups': pickups,
+                          'batched': args.batched}
+                record('step', params, bench_step(layout, chairs, pickups, args.batched, args.iterations))
+                record('draw', params, bench_draw(layout, chairs, pickups, args.batched, args.iterations))
+
+    return results
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r['name'], json.dumps(r['params'], sort_keys=True)): r for r in baseline['results']}
+
+    regressions = 0
+    for result in results:
+        old = previous.get((result['name'], json.dumps(result['params'], sort_keys=True)))
+        if old is None or old['median_ms'] == 0:
+            continue
+        ratio = result['median_ms'] / old['median_ms']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"{result['name']:<10} {json.dumps(result['params'], sort_keys=True):<60} x{ratio:5.2f}{flag}")
+    return regressions
+
+def parse_list(kind):
+    return lambda value: [kind(v) for v in value.split(',')]
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless Dagyiman benchmarks')
+    parser.add_argument('--chairs', type=parse_list(int), default=[16, 200])
+    parser.add_argument('--pickups', type=parse_list(int), default=[15, 200])
+    parser.add_argument('--map-scale', type=parse_list(int), default=[1, 2])
+    parser.add_argument('--occupancy', type=parse_list(float), default=[0.0, 0.5, 0.9])
+    parser.add_argument('--batched', action='store_true', help='Use the NumPy chair swarm')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--out', default='benchmark_results.json')
+    parser.add_argument('--compare', help='Previous results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Relative median slowdown reported as a regression')
+    args = parser.parse_args()
+
+    pygame.display.init()
+    pygame.font.init()
+
+    results = run_suite(args)
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'platform': platform.platform(),
+        'args': {k: v for k, v in vars(args).items() if k not in ('out', 'compare')},
+        'results': results,
+    }
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("Results written to", args.out)
+
+    if args.compare:
+        if compare(results, args.compare, args.threshold):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
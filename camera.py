@@ -0,0 +1,154 @@
+import pygame
+from collections import OrderedDict
+from settings import *
+
+# Scrolling view for maps bigger than the window. The walls never move, so
+# they are drawn once into CHUNK_SIZE square surfaces; every frame only the
+# chunks and sprites that intersect the camera rect are blitted, which keeps
+# the render cost tied to the window size instead of the map size. For chunked
+# levels the walls come from the map store and rendered chunks are evicted
+# least recently used first once max_chunks are held. At a render scale
+# below 1 chunks and sprite images are scaled once and drawn at the lower
+# internal resolution, the view still covers the same part of the map.
+
+class Camera:
+    def __init__(self, width=WINDOW_WIDTH, height=WINDOW_HEIGHT):
+        self.rect = pygame.Rect(0, 0, width, height)
+        self.world = self.rect.copy()
+        self.scale = 1.0
+        self.images = {}  # Sprite image -> scaled copy
+
+    def set_scale(self, scale):
+        self.scale = scale
+        self.images.clear()
+
+    def set_world(self, width, height):
+        self.world = pygame.Rect(0, 0, width, height)
+        self.rect.topleft = (0, 0)
+        self.rect.clamp_ip(self.world)
+
+    def follow(self, target):
+        # Centre on the target rect without leaving the map, True if the view moved
+        old = self.rect.topleft
+        self.rect.center = target.center
+        self.rect.clamp_ip(self.world)
+        return self.rect.topleft != old
+
+    def draw_sprites(self, screen, sprites):
+        # Sprites are in map coordinates, returns the screen rects drawn
+        blit = screen.blit
+        scale = self.scale
+        if scale == 1:
+            ox, oy = self.rect.topleft
+            return [blit(sprite.image, (sprite.rect.x - ox, sprite.rect.y - oy)) for sprite in sprites]
+
+        ox = round(self.rect.x * scale)
+        oy = round(self.rect.y * scale)
+        images = self.images
+        rects = []
+        for sprite in sprites:
+            image = images.get(sprite.image)
+            if image is None:
+                width, height = sprite.image.get_size()
+                image = pygame.transform.smoothscale(sprite.image, (max(1, round(width * scale)),
+                                                                    max(1, round(height * scale))))
+                images[sprite.image] = image
+            rects.append(blit(image, (round(sprite.rect.x * scale) - ox, round(sprite.rect.y * scale) - oy)))
+        return rects
+
+class ChunkedBackground:
+    def __init__(self, walls, width, height, chunk_size=CHUNK_SIZE, color=BLACK, max_chunks=None):
+        # walls is a sprite group, or a ChunkedMap that pages its walls in
+        self.chunk_size = chunk_size
+        self.color = color
+        self.max_chunks = max_chunks
+        self.scale = 1.0
+        self.scaled_size = chunk_size
+        self.cols = -(-width // chunk_size)
+        self.rows = -(-height // chunk_size)
+        self.chunks = OrderedDict()
+        self.walls = {}
+        self.paged = hasattr(walls, 'walls_in')
+        if self.paged:
+            self.walls_in = walls.walls_in
+            if max_chunks is None:
+                self.max_chunks = MAX_RESIDENT_CHUNKS
+            return
+
+        # Every wall is filed under the chunks it overlaps
+        for wall in walls:
+            for key in self._keys_for(wall.rect):
+                self.walls.setdefault(key, []).append(wall)
+
+    def _keys_for(self, rect):
+        size = self.chunk_size
+        return [(cx, cy) for cy in range(rect.top // size, (rect.bottom - 1) // size + 1)
+                for cx in range(rect.left // size, (rect.right - 1) // size + 1)]
+
+    def replace_walls(self, removed, added):
+        # Refile edited walls, only the chunks they touch are drawn again
+        for wall in removed:
+            for key in self._keys_for(wall.rect):
+                self.walls[key].remove(wall)
+                self.chunks.pop(key, None)
+        for wall in added:
+            for key in self._keys_for(wall.rect):
+                self.walls.setdefault(key, []).append(wall)
+                self.chunks.pop(key, None)
+
+    def set_scale(self, scale):
+        self.scale = scale
+        self.scaled_size = round(self.chunk_size * scale)
+        self.chunks.clear()
+
+    def walls_in(self, rect):
+        size = self.chunk_size
+        return self.walls.get((rect.x // size, rect.y // size), ())
+
+    def chunk(self, cx, cy):
+        key = (cx, cy)
+        surface = self.chunks.get(key)
+        if surface is not None:
+            self.chunks.move_to_end(key)
+            return surface
+
+        size = self.chunk_size
+        surface = pygame.Surface((size, size))
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        surface.fill(self.color)
+        for wall in self.walls_in(pygame.Rect(cx * size, cy * size, size, size)):
+            surface.blit(wall.image, (wall.rect.x - cx * size, wall.rect.y - cy * size))
+        if self.scale != 1:
+            surface = pygame.transform.smoothscale(surface, (self.scaled_size, self.scaled_size))
+        self.chunks[key] = surface
+        if self.max_chunks is not None:
+            while len(self.chunks) > self.max_chunks:
+                self.chunks.popitem(last=False)
+        return surface
+
+    def prerender(self):
+        if self.paged:
+            return  # Chunked levels are drawn as the camera reaches them
+        for cy in range(self.rows):
+            for cx in range(self.cols):
+                self.chunk(cx, cy)
+
+    def draw(self, screen, view, area=None):
+        # Blit the chunks under the view rect, or only under the screen rect
+        # `area` when restoring the background behind moved sprites. Works
+        # in scaled pixels, the same rounding Camera.draw_sprites uses.
+        size = self.scaled_size
+        ox = round(view.x * self.scale)
+        oy = round(view.y * self.scale)
+        if area is None:
+            region = pygame.Rect(ox, oy, round(view.width * self.scale), round(view.height * self.scale))
+        else:
+            region = area.move(ox, oy)
+            clip = screen.get_clip()
+            screen.set_clip(area)
+        for cy in range(max(0, region.top // size), min(self.rows, (region.bottom - 1) // size + 1)):
+            for cx in range(max(0, region.left // size), min(self.cols, (region.right - 1) // size + 1)):
+                screen.blit(self.chunk(cx, cy), (cx * size - ox, cy * size - oy))
+        if area is not None:
+            screen.set_clip(clip)
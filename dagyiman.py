@@ -1,568 +1,533 @@
-import pygame
-import random
-import sys
-import os
-import warnings
-import math
-from pygame.locals import *
-from map import load_map
-
-# Initialize Pygame and suppress warnings
-pygame.init()
-pygame.mixer.init()
-warnings.filterwarnings('ignore')
-
-# Constants
-WINDOW_WIDTH = 1440
-WINDOW_HEIGHT = 900
-CELL_SIZE = 30
-FPS = 60
-
-# Game settings
-MEDICINE_SPAWN_TIME = 3000   # Spawn medicine every 3 seconds
-AMBULANCE_SPAWN_TIME = 30000  # Spawn ambulance every 30 seconds
-CHAIR_RESPAWN_TIME = 60000   # Chairs respawn every 60 seconds
-MIN_MEDICINES = 15           # More medicines on the map
-MIN_AMBULANCES = 2
-ENEMY_SPEED = 3.5           # Increased chair speed
-
-# Colors
-BLACK = (0, 0, 0)
-WHITE = (255, 255, 255)
-YELLOW = (255, 255, 0)
-RED = (255, 0, 0)
-BLUE = (0, 0, 255)
-MENU_HIGHLIGHT = (128, 128, 255)
-GRAY = (128, 128, 128)
-
-# Game states
-MENU = 0
-LOADING = 1
-PLAYING = 2
-
-def load_player_image():
-    try:
-        image_path = os.path.join('assets', 'player.png')
-        if os.path.exists(image_path):
-            image = pygame.image.load(image_path).convert_alpha()
-            return pygame.transform.scale(image, (CELL_SIZE*2, CELL_SIZE*2))
-    except (pygame.error, FileNotFoundError):
-        surface = pygame.Surface([CELL_SIZE*2, CELL_SIZE*2])
-        surface.fill(YELLOW)
-        return surface
-
-class LoadingScreen:
-    def __init__(self):
-        self.angle = 0
-        self.player_image = load_player_image()
-        self.font = pygame.font.Font(None, 74)
-        self.loading_text = self.font.render("Loading...", True, WHITE)
-        self.text_rect = self.loading_text.get_rect(centerx=WINDOW_WIDTH//2, 
-                                                  centery=WINDOW_HEIGHT//2 + 100)
-        
-    def update(self):
-        self.angle += 5  # Rotate 5 degrees per frame
-        
-    def draw(self, screen):
-        screen.fill(BLACK)
-        # Get the rotated player image
-        rotated_image = pygame.transform.rotate(self.player_image, self.angle)
-        rotated_rect = rotated_image.get_rect(center=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2))
-        screen.blit(rotated_image, rotated_rect)
-        screen.blit(self.loading_text, self.text_rect)
-
-class Menu:
-    def __init__(self):
-        self.font_big = pygame.font.Font(None, 74)
-        self.font_options = pygame.font.Font(None, 54)
-        self.font_volume = pygame.font.Font(None, 36)  # Smaller font for volume
-        self.selected_option = 0
-        self.options = ["Let's Dagyi!", "Ühm"]  # Removed Volume from menu options
-        self.volume = 0.1  # 10% volume by default
-        
-        # Position slider in top right corner
-        slider_width = 150
-        slider_height = 15
-        margin = 20
-        self.slider_rect = pygame.Rect(
-            WINDOW_WIDTH - slider_width - margin,
-            margin,
-            slider_width,
-            slider_height
-        )
-        self.slider_handle = pygame.Rect(
-            self.slider_rect.x + (self.volume * slider_width) - 5,
-            margin - 2,
-            10,  # Smaller handle
-            slider_height + 4
-        )
-        self.dragging_slider = False
-        
-        # Load and start music
-        try:
-            self.music_path = os.path.join('assets', 'Danci és a Szék Fatality.mp3')
-            if os.path.exists(self.music_path):
-                pygame.mixer.music.load(self.music_path)
-                pygame.mixer.music.play(-1)  # Loop indefinitely
-                pygame.mixer.music.set_volume(self.volume)
-            else:
-                print("Music file not found:", self.music_path)
-        except (pygame.error, FileNotFoundError) as e:
-            print("Error loading music:", str(e))
-        
-    def draw(self, screen):
-        # Draw title
-        title = self.font_big.render("DAGYIMAN", True, YELLOW)
-        title_rect = title.get_rect(centerx=WINDOW_WIDTH//2, y=WINDOW_HEIGHT//3)
-        screen.blit(title, title_rect)
-        
-        # Draw menu options
-        for i, option in enumerate(self.options):
-            color = MENU_HIGHLIGHT if i == self.selected_option else WHITE
-            text = self.font_options.render(option, True, color)
-            rect = text.get_rect(centerx=WINDOW_WIDTH//2, 
-                               y=WINDOW_HEIGHT//2 + i * 60)
-            screen.blit(text, rect)
-        
-        # Draw volume control in top right
-        volume_label = self.font_volume.render("Volume", True, WHITE)
-        volume_label_rect = volume_label.get_rect(
-            right=self.slider_rect.left - 10,
-            centery=self.slider_rect.centery
-        )
-        screen.blit(volume_label, volume_label_rect)
-        
-        # Draw slider background
-        pygame.draw.rect(screen, GRAY, self.slider_rect)
-        # Draw slider handle
-        pygame.draw.rect(screen, WHITE, self.slider_handle)
-        # Draw volume percentage
-        volume_text = self.font_volume.render(f"{int(self.volume * 100)}%", True, WHITE)
-        volume_rect = volume_text.get_rect(
-            left=self.slider_rect.right + 10,
-            centery=self.slider_rect.centery
-        )
-        screen.blit(volume_text, volume_rect)
-    
-    def handle_input(self, event):
-        if event.type == KEYDOWN:
-            if event.key in [K_UP, K_DOWN]:
-                self.selected_option = (self.selected_option + 1) % len(self.options)
-            elif event.key == K_RETURN:
-                if self.selected_option == 0:  # Let's Dagyi!
-                    return PLAYING
-                elif self.selected_option == 1:  # Ühm (quit)
-                    pygame.quit()
-                    sys.exit()
-        
-        # Handle mouse events for volume slider
-        elif event.type == MOUSEBUTTONDOWN:
-            if event.button == 1:  # Left click
-                if self.slider_rect.collidepoint(event.pos):
-                    self.dragging_slider = True
-                    self.update_volume(event.pos[0])
-        
-        elif event.type == MOUSEBUTTONUP:
-            if event.button == 1:
-                self.dragging_slider = False
-        
-        elif event.type == MOUSEMOTION:
-            if self.dragging_slider:
-                self.update_volume(event.pos[0])
-        
-        return MENU
-    
-    def update_volume(self, x_pos):
-        # Calculate volume based on slider position
-        slider_x = max(self.slider_rect.left, min(x_pos, self.slider_rect.right))
-        self.volume = (slider_x - self.slider_rect.left) / self.slider_rect.width
-        # Update slider handle position
-        self.slider_handle.centerx = slider_x
-        # Update music volume
-        pygame.mixer.music.set_volume(self.volume)
-
-# Load images with fallback
-def load_game_image(filename, fallback_color):
-    try:
-        image_path = os.path.join('assets', filename)
-        if os.path.exists(image_path):
-            image = pygame.image.load(image_path).convert_alpha()
-            return pygame.transform.scale(image, (CELL_SIZE-4, CELL_SIZE-4))
-    except (pygame.error, FileNotFoundError):
-        pass
-    
-    # Fallback to colored rectangle
-    surface = pygame.Surface([CELL_SIZE-4, CELL_SIZE-4])
-    surface.fill(fallback_color)
-    return surface
-
-class Player(pygame.sprite.Sprite):
-    def __init__(self, x, y):
-        super().__init__()
-        self.image = load_game_image('player.png', YELLOW)
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.y = y
-        self.speed = 4
-        self.lives = 3
-        self.score = 0
-        self.original_pos = (x, y)
-
-    def update(self, walls):
-        old_x = self.rect.x
-        old_y = self.rect.y
-        
-        keys = pygame.key.get_pressed()
-        # WASD movement
-        if keys[K_a] or keys[K_LEFT]:
-            self.rect.x -= self.speed
-        if keys[K_d] or keys[K_RIGHT]:
-            self.rect.x += self.speed
-        if keys[K_w] or keys[K_UP]:
-            self.rect.y -= self.speed
-        if keys[K_s] or keys[K_DOWN]:
-            self.rect.y += self.speed
-
-        wall_hits = pygame.sprite.spritecollide(self, walls, False)
-        if wall_hits:
-            self.rect.x = old_x
-            self.rect.y = old_y
-
-    def reset_position(self):
-        self.rect.x = self.original_pos[0]
-        self.rect.y = self.original_pos[1]
-
-class Enemy(pygame.sprite.Sprite):
-    def __init__(self, x, y):
-        super().__init__()
-        self.size = (CELL_SIZE*2-4, CELL_SIZE*2-4)
-        self.image = pygame.Surface(self.size)
-        try:
-            image_path = os.path.join('assets', 'enemy.png')
-            if os.path.exists(image_path):
-                loaded_image = pygame.image.load(image_path).convert_alpha()
-                self.image = pygame.transform.scale(loaded_image, self.size)
-            else:
-                self.image.fill(RED)
-        except (pygame.error, FileNotFoundError):
-            self.image.fill(RED)
-            
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.y = y
-        self.speed = ENEMY_SPEED
-        self.direction = random.choice([(1,0), (-1,0), (0,1), (0,-1)])
-        self.spawn_time = pygame.time.get_ticks()
-
-    def should_respawn(self, current_time):
-        return current_time - self.spawn_time >= CHAIR_RESPAWN_TIME
-
-    def respawn(self, walls, all_sprites):
-        new_pos = find_empty_position(walls, all_sprites, self.size)
-        if new_pos:
-            self.rect.x, self.rect.y = new_pos
-            self.spawn_time = pygame.time.get_ticks()
-            self.direction = random.choice([(1,0), (-1,0), (0,1), (0,-1)])
-
-    def update(self, walls):
-        old_x = self.rect.x
-        old_y = self.rect.y
-        
-        self.rect.x += self.direction[0] * self.speed
-        self.rect.y += self.direction[1] * self.speed
-
-        # Wall collision
-        wall_hits = pygame.sprite.spritecollide(self, walls, False)
-        if wall_hits:
-            self.rect.x = old_x
-            self.rect.y = old_y
-            # Change direction when hitting a wall
-            possible_directions = [(1,0), (-1,0), (0,1), (0,-1)]
-            possible_directions.remove((-self.direction[0], -self.direction[1]))
-            self.direction = random.choice(possible_directions)
-
-class Pickup(pygame.sprite.Sprite):
-    def __init__(self, x, y):
-        super().__init__()
-        self.image = load_game_image('medicine.png', WHITE)
-        self.rect = self.image.get_rect()
-        self.rect.centerx = x + CELL_SIZE // 2
-        self.rect.centery = y + CELL_SIZE // 2
-
-class Ambulance(pygame.sprite.Sprite):
-    def __init__(self, x, y):
-        super().__init__()
-        self.image = load_game_image('ambulance.png', BLUE)
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.y = y
-
-def find_empty_position(walls, all_sprites, size, player_pos=None):
-    max_attempts = 50  # Reduced max attempts
-    attempts = 0
-    safe_distance = CELL_SIZE * 6
-    
-    # Pre-calculate valid x and y positions
-    valid_x = list(range(CELL_SIZE*2, WINDOW_WIDTH - size[0], CELL_SIZE))
-    valid_y = list(range(CELL_SIZE*2, WINDOW_HEIGHT - size[1], CELL_SIZE))
-    
-    while attempts < max_attempts:
-        x = random.choice(valid_x)
-        y = random.choice(valid_y)
-        
-        # If player position is provided, check safe distance
-        if player_pos:
-            player_x, player_y = player_pos
-            distance = ((x - player_x) ** 2 + (y - player_y) ** 2) ** 0.5
-            if distance < safe_distance:
-                attempts += 1
-                continue
-        
-        # Quick boundary check for optimization
-        if x < 0 or x > WINDOW_WIDTH - size[0] or y < 0 or y > WINDOW_HEIGHT - size[1]:
-            attempts += 1
-            continue
-            
-        # Create a temporary sprite to check collisions
-        temp = pygame.sprite.Sprite()
-        temp.rect = pygame.Rect(x, y, size[0], size[1])
-        
-        # Optimize collision check by checking walls first
-        if pygame.sprite.spritecollideany(temp, walls):
-            attempts += 1
-            continue
-            
-        # Only check all_sprites if wall check passes
-        if not pygame.sprite.spritecollideany(temp, all_sprites):
-            return x, y
-        
-        attempts += 1
-    
-    return None
-
-def draw_fatality(screen):
-    # Create big font for FATALITY
-    fatality_font = pygame.font.Font(None, 150)  # Bigger font size
-    game_over_font = pygame.font.Font(None, 74)  # Regular game over size
-    
-    # Draw FATALITY text with shadow effect
-    shadow_offset = 4
-    fatality_shadow = fatality_font.render('FATALITY', True, (100, 0, 0))  # Dark red shadow
-    fatality_text = fatality_font.render('FATALITY', True, (255, 0, 0))  # Bright red
-    
-    # Center the text
-    shadow_rect = fatality_shadow.get_rect(center=(WINDOW_WIDTH//2 + shadow_offset, 
-                                                  WINDOW_HEIGHT//2 + shadow_offset))
-    text_rect = fatality_text.get_rect(center=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2))
-    
-    # Draw Game Over text below FATALITY
-    game_over_text = game_over_font.render('Game Over!', True, WHITE)
-    game_over_rect = game_over_text.get_rect(center=(WINDOW_WIDTH//2, 
-                                                    WINDOW_HEIGHT//2 + 80))
-    
-    # Draw the texts
-    screen.blit(fatality_shadow, shadow_rect)
-    screen.blit(fatality_text, text_rect)
-    screen.blit(game_over_text, game_over_rect)
-
-def main():
-    # Initialize mixer with higher quality
-    pygame.mixer.quit()
-    pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=4096)
-    
-    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-    pygame.display.set_caption('Dagyiman')
-    clock = pygame.time.Clock()
-    game_state = MENU
-    menu = Menu()
-    loading_screen = LoadingScreen()
-
-    # Make sure music is playing
-    if not pygame.mixer.music.get_busy():
-        try:
-            music_path = os.path.join('assets', 'Danci és a Szék Fatality.mp3')
-            if os.path.exists(music_path):
-                pygame.mixer.music.load(music_path)
-                pygame.mixer.music.play(-1)
-                pygame.mixer.music.set_volume(menu.volume)
-        except (pygame.error, FileNotFoundError) as e:
-            print("Error reloading music:", str(e))
-
-    # Game initialization (do this once, outside the game loop)
-    walls = None
-    player = None
-    enemies = None
-    pickups = None
-    ambulances = None
-    all_sprites = None
-
-    while True:
-        if game_state == MENU:
-            screen.fill(BLACK)
-            menu.draw(screen)
-            
-            for event in pygame.event.get():
-                if event.type == QUIT:
-                    pygame.quit()
-                    sys.exit()
-                game_state = menu.handle_input(event)
-            
-            if game_state == PLAYING:
-                game_state = LOADING
-                loading_start_time = pygame.time.get_ticks()
-            
-            pygame.display.flip()
-            clock.tick(FPS)
-            continue
-
-        if game_state == LOADING:
-            current_time = pygame.time.get_ticks()
-            
-            for event in pygame.event.get():
-                if event.type == QUIT:
-                    pygame.quit()
-                    sys.exit()
-            
-            loading_screen.update()
-            loading_screen.draw(screen)
-            pygame.display.flip()
-            clock.tick(FPS)
-
-            # Only proceed to game after loading screen finishes
-            if current_time - loading_start_time >= 2000:
-                # Initialize game objects
-                walls, player_start, enemy_starts, medicine_positions, ambulance_positions = load_map(CELL_SIZE)
-
-                # Sprite Groups
-                all_sprites = pygame.sprite.Group()
-                enemies = pygame.sprite.Group()
-                pickups = pygame.sprite.Group()
-                ambulances = pygame.sprite.Group()
-                all_sprites.add(walls)
-
-                # Create player
-                player = Player(player_start[0], player_start[1])
-                all_sprites.add(player)
-
-                # Create enemies with proper spawning, avoiding player area
-                for pos in enemy_starts:
-                    enemy_pos = find_empty_position(walls, all_sprites, 
-                                                  (CELL_SIZE*2-4, CELL_SIZE*2-4),
-                                                  player_pos=(player_start[0], player_start[1]))
-                    if enemy_pos:
-                        enemy = Enemy(enemy_pos[0], enemy_pos[1])
-                        all_sprites.add(enemy)
-                        enemies.add(enemy)
-
-                # Create initial pickups
-                for _ in range(MIN_MEDICINES):
-                    pickup_pos = find_empty_position(walls, all_sprites, (10, 10))
-                    if pickup_pos:
-                        pickup = Pickup(pickup_pos[0], pickup_pos[1])
-                        all_sprites.add(pickup)
-                        pickups.add(pickup)
-
-                # Create initial ambulances
-                for _ in range(MIN_AMBULANCES):
-                    ambulance_pos = find_empty_position(walls, all_sprites, (CELL_SIZE-4, CELL_SIZE-4))
-                    if ambulance_pos:
-                        ambulance = Ambulance(ambulance_pos[0], ambulance_pos[1])
-                        all_sprites.add(ambulance)
-                        ambulances.add(ambulance)
-
-                # Initialize spawn timers
-                last_medicine_spawn = pygame.time.get_ticks()
-                last_ambulance_spawn = pygame.time.get_ticks()
-                
-                game_state = PLAYING
-            continue
-
-        # Game loop
-        current_time = pygame.time.get_ticks()
-        
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                pygame.quit()
-                sys.exit()
-            elif event.type == KEYDOWN and event.key == K_ESCAPE:
-                game_state = MENU
-                break
-
-        if game_state == MENU:
-            continue
-
-        # Check for chair respawning
-        for enemy in enemies:
-            if enemy.should_respawn(current_time):
-                enemy_pos = find_empty_position(walls, all_sprites, 
-                                             (CELL_SIZE*2-4, CELL_SIZE*2-4),
-                                             player_pos=(player.rect.x, player.rect.y))
-                if enemy_pos:
-                    enemy.rect.x, enemy.rect.y = enemy_pos
-                    enemy.spawn_time = current_time
-
-        # Optimize medicine spawning
-        if len(pickups) < MIN_MEDICINES and current_time - last_medicine_spawn >= MEDICINE_SPAWN_TIME:
-            # Try to spawn up to 3 medicines at once to reduce spawn frequency
-            spawn_count = min(MIN_MEDICINES - len(pickups), 3)
-            for _ in range(spawn_count):
-                pickup_pos = find_empty_position(walls, all_sprites, (10, 10))
-                if pickup_pos:
-                    pickup = Pickup(pickup_pos[0], pickup_pos[1])
-                    all_sprites.add(pickup)
-                    pickups.add(pickup)
-            last_medicine_spawn = current_time
-
-        # Spawn new ambulance if needed
-        if len(ambulances) < MIN_AMBULANCES and current_time - last_ambulance_spawn >= AMBULANCE_SPAWN_TIME:
-            ambulance_pos = find_empty_position(walls, all_sprites, (CELL_SIZE-4, CELL_SIZE-4))
-            if ambulance_pos:
-                ambulance = Ambulance(ambulance_pos[0], ambulance_pos[1])
-                all_sprites.add(ambulance)
-                ambulances.add(ambulance)
-                last_ambulance_spawn = current_time
-
-        # Update
-        player.update(walls)
-        for enemy in enemies:
-            enemy.update(walls)
-
-        # Collision detection
-        pickup_collisions = pygame.sprite.spritecollide(player, pickups, True)
-        for pickup in pickup_collisions:
-            player.score += 10
-
-        ambulance_collisions = pygame.sprite.spritecollide(player, ambulances, True)
-        for ambulance in ambulance_collisions:
-            player.lives += 1
-
-        enemy_collisions = pygame.sprite.spritecollide(player, enemies, False)
-        if enemy_collisions:
-            player.lives -= 1
-            if player.lives <= 0:
-                # Show FATALITY message
-                screen.fill(BLACK)  # Clear screen
-                draw_fatality(screen)
-                pygame.display.flip()
-                pygame.time.wait(5000)  # Wait 5 seconds
-                game_state = MENU
-                continue
-            else:
-                player.reset_position()
-
-        # Draw
-        screen.fill(BLACK)
-        all_sprites.draw(screen)
-        
-        # Draw score and lives
-        font = pygame.font.Font(None, 36)
-        score_text = font.render(f'Score: {player.score}', True, WHITE)
-        lives_text = font.render(f'Lives: {player.lives}', True, WHITE)
-        screen.blit(score_text, (10, 10))
-        screen.blit(lives_text, (10, 50))
-
-        pygame.display.flip()
-        clock.tick(FPS)
-
-if __name__ == '__main__':
+import time
+STARTUP_BEGIN = time.perf_counter()  # Before pygame, so the import phase includes it
+
+import pygame
+import sys
+import os
+import warnings
+import math
+import gc
+from pygame.locals import *
+from settings import *
+from entities import MOVE_LEFT, MOVE_RIGHT, MOVE_UP, MOVE_DOWN
+from simulation import GameSimulation
+from swarm import numpy_available
+from profiler import FrameProfiler, StartupTimer
+from loader import GameLoader
+from audio import AudioEngine
+from camera import Camera, ChunkedBackground
+from replay import ReplayRecorder
+from display import Display
+from hotreload import MapWatcher, read_layout
+from map import GAME_MAP, MapError
+from netplay import NetHost, NetClient, NetError
+import text
+import assets
+
+# Subsystems are initialised in main(), only the ones the game uses
+warnings.filterwarnings('ignore')
+
+# Rendering settings
+DIRTY_RECT_RENDERING = True  # Only redraw what moved while the camera stands still
+MAX_STEPS_PER_FRAME = 5      # Drop simulation time instead of spiralling on slow frames
+
+# Profiler hotkeys: F3 toggles timing and the overlay, F4 exports the recorded
+# frames, F5 runs cProfile over the next PROFILE_CAPTURE_FRAMES frames.
+# F6 steps the render scale, F11 toggles fullscreen.
+PROFILE_CAPTURE_FRAMES = 300
+
+# Set DAGYIMAN_STARTUP_REPORT=1 to print the startup times, or to a file path
+# to append them there as JSON lines (frozen builds have no console)
+STARTUP_REPORT_ENV = 'DAGYIMAN_STARTUP_REPORT'
+
+# Set DAGYIMAN_MAP_WATCH=1 to apply edits to GAME_MAP in map.py while playing,
+# or to a text map file (one row per line) to play that file and watch it
+MAP_WATCH_ENV = 'DAGYIMAN_MAP_WATCH'
+
+# Set DAGYIMAN_LEVEL to a chunked level written by mapstore.py to play it
+# streamed, for levels too big to load whole. Not recorded as a replay.
+LEVEL_ENV = 'DAGYIMAN_LEVEL'
+
+# Co-op over UDP: set DAGYIMAN_HOST=1 (or to a port) to host a two-player
+# game, DAGYIMAN_JOIN=host[:port] to join one. DAGYIMAN_NET_LOSS (0-1) and
+# DAGYIMAN_NET_LATENCY (milliseconds) make the own packets drop and lag.
+HOST_ENV = 'DAGYIMAN_HOST'
+JOIN_ENV = 'DAGYIMAN_JOIN'
+NET_LOSS_ENV = 'DAGYIMAN_NET_LOSS'
+NET_LATENCY_ENV = 'DAGYIMAN_NET_LATENCY'
+
+# Game states
+MENU = 0
+LOADING = 1
+PLAYING = 2
+
+def load_player_image():
+    return assets.get_image('player.png', (CELL_SIZE*2, CELL_SIZE*2), YELLOW)
+
+class LoadingScreen:
+    def __init__(self):
+        self.angle = 0
+        self.player_image = load_player_image()
+        self.loading_text = text.render("Loading...", 74, WHITE)
+        self.text_rect = self.loading_text.get_rect(centerx=WINDOW_WIDTH//2, 
+                                                  centery=WINDOW_HEIGHT//2 + 100)
+        self.bar_rect = pygame.Rect(0, 0, 400, 12)
+        self.bar_rect.center = (WINDOW_WIDTH//2, WINDOW_HEIGHT//2 + 150)
+        
+    def update(self):
+        self.angle += 5  # Rotate 5 degrees per frame
+        
+    def draw(self, screen, progress=0.0, stage=""):
+        screen.fill(BLACK)
+        # Get the rotated player image
+        rotated_image = pygame.transform.rotate(self.player_image, self.angle)
+        rotated_rect = rotated_image.get_rect(center=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2))
+        screen.blit(rotated_image, rotated_rect)
+        screen.blit(self.loading_text, self.text_rect)
+
+        # Draw progress bar and the current loading stage
+        pygame.draw.rect(screen, GRAY, self.bar_rect, 1)
+        filled = self.bar_rect.copy()
+        filled.width = int(self.bar_rect.width * max(0.0, min(progress, 1.0)))
+        pygame.draw.rect(screen, WHITE, filled)
+        if stage:
+            stage_text = text.render(stage, 28, GRAY)
+            screen.blit(stage_text, stage_text.get_rect(centerx=WINDOW_WIDTH//2,
+                                                        top=self.bar_rect.bottom + 10))
+
+class Menu:
+    def __init__(self, audio):
+        self.audio = audio
+        self.selected_option = 0
+        self.options = ["Let's Dagyi!", "Ühm"]  # Removed Volume from menu options
+        self.volume = 0.1  # 10% volume by default
+        
+        # Position slider in top right corner
+        slider_width = 150
+        slider_height = 15
+        margin = 20
+        self.slider_rect = pygame.Rect(
+            WINDOW_WIDTH - slider_width - margin,
+            margin,
+            slider_width,
+            slider_height
+        )
+        self.slider_handle = pygame.Rect(
+            self.slider_rect.x + (self.volume * slider_width) - 5,
+            margin - 2,
+            10,  # Smaller handle
+            slider_height + 4
+        )
+        self.dragging_slider = False
+        
+    def draw(self, screen):
+        # Draw title
+        title = text.render("DAGYIMAN", 74, YELLOW)
+        title_rect = title.get_rect(centerx=WINDOW_WIDTH//2, y=WINDOW_HEIGHT//3)
+        screen.blit(title, title_rect)
+        
+        # Draw menu options
+        for i, option in enumerate(self.options):
+            color = MENU_HIGHLIGHT if i == self.selected_option else WHITE
+            option_text = text.render(option, 54, color)
+            rect = option_text.get_rect(centerx=WINDOW_WIDTH//2, 
+                                      y=WINDOW_HEIGHT//2 + i * 60)
+            screen.blit(option_text, rect)
+        
+        # Draw volume control in top right
+        volume_label = text.render("Volume", 36, WHITE)  # Smaller font for volume
+        volume_label_rect = volume_label.get_rect(
+            right=self.slider_rect.left - 10,
+            centery=self.slider_rect.centery
+        )
+        screen.blit(volume_label, volume_label_rect)
+        
+        # Draw slider background
+        pygame.draw.rect(screen, GRAY, self.slider_rect)
+        # Draw slider handle
+        pygame.draw.rect(screen, WHITE, self.slider_handle)
+        # Draw volume percentage
+        volume_text = text.render(f"{int(self.volume * 100)}%", 36, WHITE)
+        volume_rect = volume_text.get_rect(
+            left=self.slider_rect.right + 10,
+            centery=self.slider_rect.centery
+        )
+        screen.blit(volume_text, volume_rect)
+    
+    def handle_input(self, event):
+        if event.type == KEYDOWN:
+            if event.key in [K_UP, K_DOWN]:
+                self.selected_option = (self.selected_option + 1) % len(self.options)
+            elif event.key == K_RETURN:
+                if self.selected_option == 0:  # Let's Dagyi!
+                    return PLAYING
+                elif self.selected_option == 1:  # Ühm (quit)
+                    pygame.quit()
+                    sys.exit()
+        
+        # Handle mouse events for volume slider
+        elif event.type == MOUSEBUTTONDOWN:
+            if event.button == 1:  # Left click
+                if self.slider_rect.collidepoint(event.pos):
+                    self.dragging_slider = True
+                    self.update_volume(event.pos[0])
+        
+        elif event.type == MOUSEBUTTONUP:
+            if event.button == 1:
+                self.dragging_slider = False
+        
+        elif event.type == MOUSEMOTION:
+            if self.dragging_slider:
+                self.update_volume(event.pos[0])
+        
+        return MENU
+    
+    def update_volume(self, x_pos):
+        # Calculate volume based on slider position
+        slider_x = max(self.slider_rect.left, min(x_pos, self.slider_rect.right))
+        self.volume = (slider_x - self.slider_rect.left) / self.slider_rect.width
+        # Update slider handle position
+        self.slider_handle.centerx = slider_x
+        # Update music and effects volume
+        self.audio.set_volume(self.volume)
+
+def read_actions():
+    keys = pygame.key.get_pressed()
+    actions = 0
+    # WASD movement
+    if keys[K_a] or keys[K_LEFT]:
+        actions |= MOVE_LEFT
+    if keys[K_d] or keys[K_RIGHT]:
+        actions |= MOVE_RIGHT
+    if keys[K_w] or keys[K_UP]:
+        actions |= MOVE_UP
+    if keys[K_s] or keys[K_DOWN]:
+        actions |= MOVE_DOWN
+    return actions
+
+def end_session(recorder, host, simulation):
+    if recorder is not None:
+        recorder.save()
+    if host is not None:
+        host.close()
+    if isinstance(simulation, NetClient):
+        simulation.close()
+
+def make_huds(scale):
+    # Score and lives text at the internal render resolution
+    size = round(36 * scale)
+    return text.HudText('Score: {}', size, WHITE), text.HudText('Lives: {}', size, WHITE)
+
+def draw_fatality(screen):
+    # Draw FATALITY text with shadow effect, big font size
+    shadow_offset = 4
+    fatality_shadow = text.render('FATALITY', 150, (100, 0, 0))  # Dark red shadow
+    fatality_text = text.render('FATALITY', 150, (255, 0, 0))  # Bright red
+    
+    # Center the text
+    shadow_rect = fatality_shadow.get_rect(center=(WINDOW_WIDTH//2 + shadow_offset, 
+                                                  WINDOW_HEIGHT//2 + shadow_offset))
+    text_rect = fatality_text.get_rect(center=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2))
+    
+    # Draw Game Over text below FATALITY
+    game_over_text = text.render('Game Over!', 74, WHITE)  # Regular game over size
+    game_over_rect = game_over_text.get_rect(center=(WINDOW_WIDTH//2, 
+                                                    WINDOW_HEIGHT//2 + 80))
+    
+    # Draw the texts
+    screen.blit(fatality_shadow, shadow_rect)
+    screen.blit(fatality_text, text_rect)
+    screen.blit(game_over_text, game_over_rect)
+
+def net_options():
+    # Returns (host port, join address, loss, latency in ticks)
+    host = os.environ.get(HOST_ENV)
+    join = os.environ.get(JOIN_ENV)
+    port = None
+    if host:
+        port = NET_PORT if host == '1' else int(host)
+    address = None
+    if join:
+        name, _, join_port = join.partition(':')
+        address = (name, int(join_port) if join_port else NET_PORT)
+    loss = float(os.environ.get(NET_LOSS_ENV, 0))
+    latency = round(float(os.environ.get(NET_LATENCY_ENV, 0)) * FPS / 1000)
+    return port, address, loss, latency
+
+def main():
+    startup = StartupTimer(STARTUP_BEGIN)
+    startup.mark('import')
+
+    # Only display and font, pygame.init() would also start joystick and friends
+    pygame.display.init()
+    pygame.font.init()
+    display = Display()
+    screen = display.open()
+    pygame.display.set_caption('Dagyiman')
+    startup.mark('display')
+
+    clock = pygame.time.Clock()
+    game_state = MENU
+    audio = AudioEngine()
+    menu = Menu(audio)
+    loading_screen = None  # Created the first time the game loads
+
+    audio.init()
+    audio.set_volume(menu.volume)
+    audio.start_music(menu.volume)
+    startup.mark('audio')
+
+    # Game initialization (do this once, outside the game loop)
+    profiler = FrameProfiler()
+    profiler.set_enabled(os.environ.get('DAGYIMAN_PROFILE') == '1')
+    map_watcher = None
+    layout = GAME_MAP
+    host_port, join_address, net_loss, net_latency = net_options()
+    if host_port and join_address:
+        print("Set either DAGYIMAN_HOST or DAGYIMAN_JOIN, co-op is off")
+        host_port = join_address = None
+    level = os.environ.get(LEVEL_ENV)
+    if level and (host_port or join_address):
+        print("Streamed levels are single player, co-op is off")
+        host_port = join_address = None
+    watch = os.environ.get(MAP_WATCH_ENV)
+    if watch and (host_port or join_address or level):
+        print("Map watching is off in co-op games and streamed levels")
+    elif watch:
+        map_watcher = MapWatcher() if watch == '1' else MapWatcher(watch)
+        if watch != '1':
+            layout = read_layout(watch)
+    if join_address is not None:
+        # Everything but the map comes from the host
+        simulation = NetClient(*join_address, layout=layout, loss=net_loss, latency=net_latency)
+    elif level:
+        simulation = GameSimulation(chair_count=CHAIR_COUNT, profiler=profiler, level_path=level)
+    else:
+        # Snapshots carry chair sprites, co-op leaves the swarm engine out
+        simulation = GameSimulation(chair_count=CHAIR_COUNT,
+                                    batched_chairs=BATCHED_CHAIRS and numpy_available() and not host_port,
+                                    layout=layout, profiler=profiler, chair_ai=CHAIR_AI)
+    loader = None
+    recorder = None
+    host = None
+    background = None
+    camera = Camera()
+    accumulator = 0
+    score_hud, lives_hud = make_huds(display.scale)
+    hud_rects = []
+    sprite_rects = []
+    full_redraw = True
+    rescale = False
+
+    while True:
+        if game_state == MENU:
+            ui = display.ui_surface()
+            ui.fill(BLACK)
+            menu.draw(ui)
+            display.present_ui()
+            
+            for event in pygame.event.get():
+                if event.type == QUIT:
+                    pygame.quit()
+                    sys.exit()
+                game_state = menu.handle_input(display.ui_event(event))
+            
+            if game_state == PLAYING:
+                # Map, images and spawns load on a worker while the spinner runs
+                game_state = LOADING
+                loader = GameLoader(simulation, audio=audio).start()
+                if loading_screen is None:
+                    loading_screen = LoadingScreen()
+            
+            pygame.display.flip()
+            if not startup.finished:
+                startup.mark('first frame')
+                startup.finish(os.environ.get(STARTUP_REPORT_ENV))
+            clock.tick(FPS)
+            continue
+
+        if game_state == LOADING:
+            for event in pygame.event.get():
+                if event.type == QUIT:
+                    pygame.quit()
+                    sys.exit()
+            
+            loading_screen.update()
+            loading_screen.draw(display.ui_surface(), loader.progress, loader.stage)
+            display.present_ui()
+            pygame.display.flip()
+            clock.tick(FPS)
+
+            # Proceed to the game as soon as the loader is done
+            if loader.done():
+                # Convert to the display format on the main thread
+                try:
+                    loader.finish()
+                except (NetError, MapError, OSError) as e:
+                    print("Could not start the game:", str(e))
+                    game_state = MENU
+                    continue
+                background = ChunkedBackground(simulation.walls, simulation.width, simulation.height)
+                background.set_scale(display.scale)
+                background.prerender()
+                camera.set_scale(display.scale)
+                camera.set_world(simulation.width, simulation.height)
+                # Every session is recorded, the last one is kept as a replay
+                if join_address is None and not level:
+                    recorder = ReplayRecorder(simulation)
+                if host_port:
+                    host = NetHost(simulation, host_port, net_loss, net_latency)
+                    recorder.invalidate()
+                # Move everything loading created out of the collector's way,
+                # so full collections during play stay short. The last game's
+                # sprites are let go and thawed first, or they would never be freed
+                player = simulation.player
+                visible = []
+                hud_rects = []
+                sprite_rects = []
+                gc.unfreeze()
+                gc.collect()
+                gc.freeze()
+
+                full_redraw = True
+                accumulator = 0
+                game_state = PLAYING
+            continue
+
+        # Game loop
+        profiler.begin_frame()
+        frame_start = time.perf_counter()
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                end_session(recorder, host, simulation)
+                pygame.quit()
+                sys.exit()
+            elif event.type == KEYDOWN and event.key == K_ESCAPE:
+                end_session(recorder, host, simulation)
+                host = None
+                game_state = MENU
+                break
+            elif event.type == KEYDOWN and event.key == K_F3:
+                profiler.toggle()
+                full_redraw = True
+            elif event.type == KEYDOWN and event.key == K_F4:
+                print("Frame records written to", ", ".join(profiler.export('dagyiman')))
+            elif event.type == KEYDOWN and event.key == K_F5:
+                profiler.start_capture(PROFILE_CAPTURE_FRAMES, 'dagyiman.prof')
+            elif event.type == KEYDOWN and event.key == K_F6:
+                display.set_level((display.level + 1) % len(display.scales))
+                rescale = True
+            elif event.type == KEYDOWN and event.key == K_F11:
+                display.toggle_fullscreen()
+                rescale = True
+
+        if game_state == MENU:
+            continue
+        if map_watcher is not None:
+            layout = map_watcher.poll()
+            if layout is not None:
+                reload_start = time.perf_counter()
+                try:
+                    changed = simulation.apply_layout(layout)
+                except MapError as e:
+                    print("Map reload failed:", str(e))
+                else:
+                    if changed is None:
+                        # New map size, the background is built again
+                        background = ChunkedBackground(simulation.walls, simulation.width,
+                                                       simulation.height)
+                        background.set_scale(display.scale)
+                        camera.set_world(simulation.width, simulation.height)
+                    else:
+                        background.replace_walls(*changed)
+                    recorder.invalidate()
+                    full_redraw = True
+                    print(f"Map reloaded in {(time.perf_counter() - reload_start) * 1000:.1f} ms")
+        if rescale:
+            # The display was reopened, rebuild everything tied to its resolution
+            screen = display.screen
+            background.set_scale(display.scale)
+            camera.set_scale(display.scale)
+            # Text rendered at the old scale is not drawn again
+            text.clear_cache()
+            score_hud, lives_hud = make_huds(display.scale)
+            sprite_rects = []
+            hud_rects = []
+            full_redraw = True
+            rescale = False
+        profiler.mark('events')
+
+        # Advance the simulation in fixed steps, however long the last frame took
+        actions = read_actions()
+        steps = 0
+        game_over = False
+        while accumulator >= simulation.dt and not game_over:
+            if host is not None:
+                host.poll()
+                state = recorder.step(actions, host.next_input())
+                host.send_snapshot()
+            elif recorder is None:
+                state = simulation.step(actions)
+            else:
+                state = recorder.step(actions)
+            audio.play_events(state['events'])
+            game_over = state['game_over']
+            accumulator -= simulation.dt
+            steps += 1
+            if steps == MAX_STEPS_PER_FRAME:
+                accumulator = 0
+
+        if game_over:
+            end_session(recorder, host, simulation)
+            host = None
+            # Show FATALITY message
+            ui = display.ui_surface()
+            ui.fill(BLACK)  # Clear screen
+            draw_fatality(ui)
+            display.present_ui()
+            pygame.display.flip()
+            pygame.time.wait(5000)  # Wait 5 seconds
+            game_state = MENU
+            continue
+
+        player = simulation.player
+
+        # Draw only the chunks and sprites inside the camera, a scrolled view
+        # has to be redrawn in full
+        redraw = camera.follow(player.rect) or full_redraw or not DIRTY_RECT_RENDERING
+        visible = simulation.visible_sprites(camera.rect)
+        if redraw:
+            background.draw(screen, camera.rect)
+            sprite_rects = camera.draw_sprites(screen, visible)
+            dirty_rects = []
+        else:
+            # Restore the background under last frame's sprites and HUD only
+            for rect in sprite_rects + hud_rects:
+                background.draw(screen, camera.rect, rect)
+            dirty_rects = sprite_rects + hud_rects
+            sprite_rects = camera.draw_sprites(screen, visible)
+            dirty_rects += sprite_rects
+        profiler.mark('draw')
+        
+        # Draw score and lives, only re-rendered when they change
+        hud_rects = [screen.blit(score_hud.render(player.score), (10, 10)),
+                     screen.blit(lives_hud.render(player.lives), (10, round(50 * display.scale)))]
+        if profiler.enabled:
+            hud_rects += profiler.draw_overlay(screen)
+        profiler.mark('text')
+        work_ms = (time.perf_counter() - frame_start) * 1000
+
+        if redraw:
+            pygame.display.flip()
+            full_redraw = False
+        else:
+            pygame.display.update(dirty_rects + hud_rects)
+        profiler.mark('present')
+        # Frames that keep running over budget lower the render resolution
+        rescale = display.record_frame(work_ms)
+        accumulator += clock.tick(FPS)
+        profiler.mark('wait')
+        profiler.end_frame()
+
+if __name__ == '__main__':
     main() 
\ No newline at end of file
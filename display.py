@@ -0,0 +1,92 @@
+from collections import deque
+import pygame
+from settings import *
+
+# Display configuration. The game renders at an internal resolution, one of
+# the RENDER_SCALES steps of the window size, and SDL's SCALED renderer
+# stretches it to the window (or the desktop when fullscreen) on the GPU.
+# Menus keep their full-window layout and are drawn through a window-sized
+# canvas while the internal resolution is lower. With auto_quality, play
+# frames that keep running over budget step the internal resolution down.
+
+QUALITY_SAMPLE_FRAMES = 120  # Play frames measured per decision
+QUALITY_PERCENTILE = 0.9     # This share of them has to fit the budget...
+QUALITY_BUDGET = 0.9         # ...of the frame time, leaving room for presenting
+
+class Display:
+    def __init__(self, fullscreen=FULLSCREEN, vsync=VSYNC, scales=RENDER_SCALES,
+                 level=0, auto_quality=AUTO_QUALITY):
+        self.fullscreen = fullscreen
+        self.vsync = vsync
+        self.scales = list(scales)
+        self.level = level
+        self.auto_quality = auto_quality
+        self.screen = None
+        self.canvas = None
+        self.work_times = deque(maxlen=QUALITY_SAMPLE_FRAMES)
+
+    @property
+    def scale(self):
+        return self.scales[self.level]
+
+    def size(self):
+        return (round(WINDOW_WIDTH * self.scale), round(WINDOW_HEIGHT * self.scale))
+
+    def open(self):
+        flags = pygame.SCALED | (pygame.FULLSCREEN if self.fullscreen else 0)
+        try:
+            self.screen = pygame.display.set_mode(self.size(), flags, vsync=int(self.vsync))
+        except pygame.error as e:
+            # No hardware renderer: a plain window at full size, nothing to scale
+            print("Error opening scaled display:", str(e))
+            self.vsync = False
+            self.scales = [1.0]
+            self.level = 0
+            self.screen = pygame.display.set_mode(self.size(), flags & pygame.FULLSCREEN)
+        self.canvas = None
+        self.work_times.clear()
+        return self.screen
+
+    def set_level(self, level):
+        self.level = max(0, min(level, len(self.scales) - 1))
+        return self.open()
+
+    def toggle_fullscreen(self):
+        self.fullscreen = not self.fullscreen
+        return self.open()
+
+    def ui_surface(self):
+        # Surface for full-window layouts, call present_ui() once drawn
+        if self.scale == 1:
+            return self.screen
+        if self.canvas is None:
+            self.canvas = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT)).convert()
+        return self.canvas
+
+    def present_ui(self):
+        if self.scale != 1 and self.canvas is not None:
+            pygame.transform.smoothscale(self.canvas, self.screen.get_size(), self.screen)
+
+    def ui_event(self, event):
+        # Mouse positions in full-window coordinates, for the menus
+        if self.scale == 1 or not hasattr(event, 'pos'):
+            return event
+        x, y = event.pos
+        return pygame.event.Event(event.type, dict(event.dict, pos=(int(x / self.scale), int(y / self.scale))))
+
+    def record_frame(self, work_ms):
+        # Work done in a play frame before presenting it. Returns True when
+        # the display was reopened at a lower resolution
+        if not self.auto_quality or self.level >= len(self.scales) - 1:
+            return False
+        self.work_times.append(work_ms)
+        if len(self.work_times) < QUALITY_SAMPLE_FRAMES:
+            return False
+
+        slow = sorted(self.work_times)[int(QUALITY_SAMPLE_FRAMES * QUALITY_PERCENTILE)]
+        self.work_times.clear()
+        if slow <= 1000 / FPS * QUALITY_BUDGET:
+            return False
+        self.set_level(self.level + 1)
+        print(f"Frames over budget ({slow:.1f} ms), render scale now {self.scale}")
+        return True
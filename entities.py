@@ -0,0 +1,189 @@
+import pygame
+import math
+import random
+import assets
+from settings import *
+
+# Player actions, combined as a bitmask
+MOVE_LEFT = 1
+MOVE_RIGHT = 2
+MOVE_UP = 4
+MOVE_DOWN = 8
+
+DIRECTIONS = [(1,0), (-1,0), (0,1), (0,-1)]
+
+# Load images with fallback, shared through the asset registry
+def load_game_image(filename, fallback_color):
+    return assets.get_image(filename, (CELL_SIZE-4, CELL_SIZE-4), fallback_color)
+
+class Player(pygame.sprite.Sprite):
+    def __init__(self, x, y):
+        super().__init__()
+        self.image = load_game_image('player.png', YELLOW)
+        self.rect = self.image.get_rect()
+        self.rect.x = x
+        self.rect.y = y
+        self.speed = 4
+        self.lives = 3
+        self.score = 0
+        self.original_pos = (x, y)
+
+    def update(self, wall_grid, actions):
+        old_x = self.rect.x
+        old_y = self.rect.y
+        
+        if actions & MOVE_LEFT:
+            self.rect.x -= self.speed
+        if actions & MOVE_RIGHT:
+            self.rect.x += self.speed
+        if actions & MOVE_UP:
+            self.rect.y -= self.speed
+        if actions & MOVE_DOWN:
+            self.rect.y += self.speed
+
+        if wall_grid.collides(self.rect):
+            self.rect.x = old_x
+            self.rect.y = old_y
+
+    def reset_position(self):
+        self.rect.x = self.original_pos[0]
+        self.rect.y = self.original_pos[1]
+
+class Enemy(pygame.sprite.Sprite):
+    def __init__(self, x, y, spawn_time=0, rng=random, speed=ENEMY_SPEED,
+                 respawn_time=CHAIR_RESPAWN_TIME):
+        super().__init__()
+        self.size = (CELL_SIZE*2-4, CELL_SIZE*2-4)
+        self.image = assets.get_image('enemy.png', self.size, RED)
+        self.rect = self.image.get_rect()
+        self.rect.x = x
+        self.rect.y = y
+        self.speed = speed
+        self.respawn_time = respawn_time
+        self.rng = rng
+        self.direction = rng.choice(DIRECTIONS)
+        self.spawn_time = spawn_time
+        self.target = None
+
+    def respawn(self, spawn_index, current_time, player_pos=None):
+        new_pos = find_empty_position(spawn_index, self.size, player_pos, self.rng)
+        if new_pos:
+            self.rect.x, self.rect.y = new_pos
+            spawn_index.move(self)
+            self.spawn_time = current_time
+            self.target = None
+        return new_pos
+
+    def update(self, wall_grid):
+        old_x = self.rect.x
+        old_y = self.rect.y
+        
+        self.rect.x += self.direction[0] * self.speed
+        self.rect.y += self.direction[1] * self.speed
+
+        # Wall collision
+        if wall_grid.collides(self.rect):
+            self.rect.x = old_x
+            self.rect.y = old_y
+            # Change direction when hitting a wall
+            possible_directions = list(DIRECTIONS)
+            possible_directions.remove((-self.direction[0], -self.direction[1]))
+            self.direction = self.rng.choice(possible_directions)
+
+    def chase(self, flow_field, wall_grid):
+        # Walk cell by cell down the flow field, only deciding on arrival
+        cell_size = flow_field.cell_size
+        if self.target is None or self.rect.topleft == self.target:
+            col = self.rect.x // cell_size
+            row = self.rect.y // cell_size
+            if self.rect.topleft != (col * cell_size, row * cell_size):
+                # Off the grid (e.g. after wandering), line up with the cell first
+                self.target = (col * cell_size, row * cell_size)
+            else:
+                step = flow_field.next_step(col, row)
+                if step is None:
+                    self.target = None
+                    if flow_field.distance_at(col, row) < 0:
+                        self.update(wall_grid)  # Player unreachable, wander instead
+                    return
+                self.direction = step
+                self.target = ((col + step[0]) * cell_size, (row + step[1]) * cell_size)
+        self._move_to_target()
+
+    def patrol(self, nav_graph, wall_grid):
+        # Glide along a corridor to the next junction, corner or dead end and
+        # only pick a new direction there
+        if self.target is None or self.rect.topleft == self.target:
+            choice = nav_graph.choose(self.rect.x, self.rect.y, self.direction, self.rng)
+            if choice is None:
+                self.target = None
+                self.update(wall_grid)  # Not on the graph, wander instead
+                return
+            self.direction, self.target = choice
+        self._move_to_target()
+
+    def _move_to_target(self):
+        dx = self.target[0] - self.rect.x
+        dy = self.target[1] - self.rect.y
+        if dx:
+            self.rect.x += math.copysign(min(abs(dx), self.speed), dx)
+        if dy:
+            self.rect.y += math.copysign(min(abs(dy), self.speed), dy)
+
+class Pickup(pygame.sprite.Sprite):
+    def __init__(self, x, y):
+        super().__init__()
+        self.image = load_game_image('medicine.png', WHITE)
+        self.rect = self.image.get_rect()
+        self.place(x, y)
+
+    def place(self, x, y):
+        # Also picks up the display-format image once loading has converted it
+        self.image = load_game_image('medicine.png', WHITE)
+        self.rect.centerx = x + CELL_SIZE // 2
+        self.rect.centery = y + CELL_SIZE // 2
+
+class Ambulance(pygame.sprite.Sprite):
+    def __init__(self, x, y):
+        super().__init__()
+        self.image = load_game_image('ambulance.png', BLUE)
+        self.rect = self.image.get_rect()
+        self.place(x, y)
+
+    def place(self, x, y):
+        self.image = load_game_image('ambulance.png', BLUE)
+        self.rect.x = x
+        self.rect.y = y
+
+class EntityPool:
+    # Recycles collected pickups and ambulances, so spawning in the frame
+    # loop reuses sprites instead of allocating new ones
+    def __init__(self, factory):
+        self.factory = factory
+        self.free = []
+        self.created = 0
+
+    def __len__(self):
+        return len(self.free)
+
+    def acquire(self, x, y):
+        if self.free:
+            sprite = self.free.pop()
+            sprite.place(x, y)
+            return sprite
+        self.created += 1
+        return self.factory(x, y)
+
+    def release(self, sprite):
+        self.free.append(sprite)
+
+    def reserve(self, count):
+        # Allocate up front, while loading, what the game will need at once
+        while len(self.free) < count:
+            self.created += 1
+            self.free.append(self.factory(0, 0))
+
+def find_empty_position(spawn_index, size, player_pos=None, rng=random, allow_occupied=False):
+    # Constant-time pick from the free-cell index, keeps chairs away from the player
+    safe_distance = CELL_SIZE * 6
+    return spawn_index.find_position(size, player_pos, safe_distance, rng, allow_occupied)
@@ -0,0 +1,95 @@
+import os
+import ast
+import time
+from settings import *
+
+# Development mode for level design: the map source is polled while playing
+# and edits are applied to the running game with GameSimulation.apply_layout,
+# no restart, menu or loading screen. The source is either map.py, whose
+# GAME_MAP list is read with ast (the module is not imported again), or a
+# text file with one map row per line.
+
+MAP_SOURCE = 'map.py'
+
+def read_layout(path):
+    if path.endswith('.py'):
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read(), path)
+        for node in tree.body:
+            if (isinstance(node, ast.Assign) and len(node.targets) == 1
+                    and getattr(node.targets[0], 'id', None) == 'GAME_MAP'):
+                return list(ast.literal_eval(node.value))
+        raise ValueError(f"No GAME_MAP in {path}")
+
+    with open(path, encoding='utf-8') as f:
+        return [line.rstrip('\r\n') for line in f]
+
+class MapWatcher:
+    def __init__(self, path=MAP_SOURCE, interval=HOT_RELOAD_INTERVAL):
+        self.path = path
+        self.interval = interval / 1000
+        self.next_check = 0
+        self.stamp = self._stamp()
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self):
+        # Returns the new layout once the file changed, otherwise None. A file
+        # that does not parse is reported and skipped until the next save
+        now = time.perf_counter()
+        if now < self.next_check:
+            return None
+        self.next_check = now + self.interval
+        stamp = self._stamp()
+        if stamp is None or stamp == self.stamp:
+            return None
+        self.stamp = stamp
+        try:
+            return read_layout(self.path)
+        except (OSError, SyntaxError, ValueError) as e:
+            print("Map reload failed:", str(e))
+            return None
+
+def wall_edit_check(chair_ai, seed, ticks=120):
+    # Plays a second, walls off the cell four cells ahead of every chair and
+    # counts the ticks chairs then spend inside a wall
+    from simulation import GameSimulation
+
+    simulation = GameSimulation(chair_ai=chair_ai)
+    simulation.reset(seed)
+    simulation.player.lives = 1000
+    for _ in range(simulation.fps):
+        simulation.step()
+    rows = [list(row) for row in simulation.layout]
+    for enemy in simulation.enemies:
+        col = enemy.rect.centerx // CELL_SIZE + enemy.direction[0] * 4
+        row = enemy.rect.centery // CELL_SIZE + enemy.direction[1] * 4
+        if 0 <= row < len(rows) and 0 <= col < len(rows[row]) and rows[row][col] == ' ':
+            rows[row][col] = 'W'
+    simulation.apply_layout([''.join(row) for row in rows])
+
+    inside = 0
+    for _ in range(ticks):
+        simulation.step()
+        inside += sum(1 for enemy in simulation.enemies if simulation.wall_grid.collides(enemy.rect))
+    return inside
+
+if __name__ == '__main__':
+    # python hotreload.py [seeds]: edit walls into the way of moving chairs
+    # with every chair AI, exit 1 when a chair runs into one
+    import sys
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    seeds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    failed = False
+    for chair_ai in ('graph', 'hunt', 'wander'):
+        inside = sum(wall_edit_check(chair_ai, seed) for seed in range(seeds))
+        print(f"{chair_ai:7} {inside} chair ticks inside a wall over {seeds} seeds")
+        failed = failed or inside > 0
+    sys.exit(1 if failed else 0)
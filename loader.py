@@ -0,0 +1,64 @@
+import threading
+import assets
+from map import get_compiled_map
+
+# Does the real work behind the loading screen on a worker thread: map
+# parsing, image and sound decoding and the initial spawn placement. The main thread
+# polls progress/stage while it animates the spinner and calls finish() once
+# done() to convert the results to the display format.
+
+class GameLoader:
+    def __init__(self, simulation, seed=None, audio=None):
+        self.simulation = simulation
+        self.audio = audio
+        self.seed = seed
+        self.progress = 0.0
+        self.stage = "Starting"
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name='GameLoader', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def done(self):
+        return not self.thread.is_alive()
+
+    def _report(self, progress, stage):
+        self.progress = progress
+        self.stage = stage
+
+    def _run(self):
+        try:
+            if self.simulation.layout is not None:
+                self._report(0.0, "Parsing map")
+                get_compiled_map(self.simulation.layout)
+
+            self._report(0.05, "Mapping images")
+            files = assets.unpacked_files()
+            for i, filename in enumerate(files):
+                self._report(0.1 + 0.4 * i / len(files), f"Decoding {filename}")
+                assets.load_image(filename)
+
+            if self.audio is not None:
+                self._report(0.5, "Decoding sounds")
+                self.audio.load_effects()
+
+            self._report(0.6, "Placing chairs and pickups")
+            self.simulation.reset(self.seed, progress=lambda fraction: self._report(
+                0.6 + 0.4 * fraction, "Placing chairs and pickups"))
+            self._report(1.0, "Ready")
+        except Exception as e:
+            self.error = e
+
+    def finish(self):
+        # Main thread only
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+        remap = assets.convert_pending()
+        if remap:
+            for sprite in self.simulation.all_sprites:
+                sprite.image = remap.get(sprite.image, sprite.image)
+        return self.simulation
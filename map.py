@@ -1,76 +1,332 @@
-import pygame
-
-# Map layout
-# W = wall
-# P = player starting position
-# E = enemy starting position
-# M = medicine pickup (collectible points)
-# A = ambulance (extra life)
-
-GAME_MAP = [
-    "WWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWW",
-    "WWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWW",
-    "WW    MM      MM      WW      MM      MM    WW",
-    "WW    MM      MM      WW      MM      MM    WW",
-    "WW  WWWWWW  WWWWWW  WWWW  WWWWWW  WWWWWW  WW",
-    "WW  WWWWWW  WWWWWW  WWWW  WWWWWW  WWWWWW  WW",
-    "WW    MM      MM      EE      MM      MM    WW",
-    "WW    MM  AA  MM      EE      MM  AA  MM    WW",
-    "WW  WWWWWW  WWWWWWWWWWWWWWWWWWWW  WWWWWW  WW",
-    "WW  WWWWWW  WWWWWWWWWWWWWWWWWWWW  WWWWWW  WW",
-    "WW    MM      MM  WWWWWWWW  MM      MM    WW",
-    "WW    MM      MM  WWWWWWWW  MM      MM    WW",
-    "WWWWWWWW  WWWWWW    EE    WWWWWW  WWWWWWWWWW",
-    "WWWWWWWW  WWWWWW    EE    WWWWWW  WWWWWWWWWW",
-    "WW    EE                            EE    WW",
-    "WW    EE          PP  PP            EE    WW",
-    "WWWWWWWW  WWWWWW  WWWWWW  WWWWWW  WWWWWWWWWW",
-    "WWWWWWWW  WWWWWW  WWWWWW  WWWWWW  WWWWWWWWWW",
-    "WW    MM      MM      MM      MM      MM    WW",
-    "WW    MM  AA  MM      MM      MM  AA  MM    WW",
-    "WW  WWWWWW  WWWWWWWWWWWWWWWWWWWW  WWWWWW  WW",
-    "WW  WWWWWW  WWWWWWWWWWWWWWWWWWWW  WWWWWW  WW",
-    "WW    MM      MM      MM      MM      MM    WW",
-    "WW    MM  AA  MM      MM      MM  AA  MM    WW",
-    "WW  WWWWWW  WWWWWW  WWWW  WWWWWW  WWWWWW  WW",
-    "WW  WWWWWW  WWWWWW  WWWW  WWWWWW  WWWWWW  WW",
-    "WW    MM      MM      MM      MM      MM    WW",
-    "WW    MM      MM      MM      MM      MM    WW",
-    "WWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWW",
-    "WWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWW"
-]
-
-class Wall(pygame.sprite.Sprite):
-    def __init__(self, x, y, cell_size):
-        super().__init__()
-        self.image = pygame.Surface([cell_size, cell_size])
-        self.image.fill((0, 0, 255))  # Blue walls
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.y = y
-
-def load_map(cell_size):
-    walls = pygame.sprite.Group()
-    player_start = None
-    enemy_starts = []
-    medicine_positions = []
-    ambulance_positions = []
-
-    for row, line in enumerate(GAME_MAP):
-        for col, char in enumerate(line):
-            x = col * cell_size
-            y = row * cell_size
-            
-            if char == 'W':
-                wall = Wall(x, y, cell_size)
-                walls.add(wall)
-            elif char == 'P':
-                player_start = (x, y)
-            elif char == 'E':
-                enemy_starts.append((x, y))
-            elif char == 'M':
-                medicine_positions.append((x, y))
-            elif char == 'A':
-                ambulance_positions.append((x, y))
-
-    return walls, player_start, enemy_starts, medicine_positions, ambulance_positions 
\ No newline at end of file
+import os
+import sys
+import struct
+import hashlib
+import pygame
+
+# Map layout
+# W = wall
+# P = player starting position
+# E = enemy starting position
+# M = medicine pickup (collectible points)
+# A = ambulance (extra life)
+
+GAME_MAP = [
+    "WWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWW",
+    "WWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWW",
+    "WW    MM      MM      WW      MM      MM    WW",
+    "WW    MM      MM      WW      MM      MM    WW",
+    "WW  WWWWWW  WWWWWW  WWWW  WWWWWW  WWWWWW  WW",
+    "WW  WWWWWW  WWWWWW  WWWW  WWWWWW  WWWWWW  WW",
+    "WW    MM      MM      EE      MM      MM    WW",
+    "WW    MM  AA  MM      EE      MM  AA  MM    WW",
+    "WW  WWWWWW  WWWWWWWWWWWWWWWWWWWW  WWWWWW  WW",
+    "WW  WWWWWW  WWWWWWWWWWWWWWWWWWWW  WWWWWW  WW",
+    "WW    MM      MM  WWWWWWWW  MM      MM    WW",
+    "WW    MM      MM  WWWWWWWW  MM      MM    WW",
+    "WWWWWWWW  WWWWWW    EE    WWWWWW  WWWWWWWWWW",
+    "WWWWWWWW  WWWWWW    EE    WWWWWW  WWWWWWWWWW",
+    "WW    EE                            EE    WW",
+    "WW    EE          PP  PP            EE    WW",
+    "WWWWWWWW  WWWWWW  WWWWWW  WWWWWW  WWWWWWWWWW",
+    "WWWWWWWW  WWWWWW  WWWWWW  WWWWWW  WWWWWWWWWW",
+    "WW    MM      MM      MM      MM      MM    WW",
+    "WW    MM  AA  MM      MM      MM  AA  MM    WW",
+    "WW  WWWWWW  WWWWWWWWWWWWWWWWWWWW  WWWWWW  WW",
+    "WW  WWWWWW  WWWWWWWWWWWWWWWWWWWW  WWWWWW  WW",
+    "WW    MM      MM      MM      MM      MM    WW",
+    "WW    MM  AA  MM      MM      MM  AA  MM    WW",
+    "WW  WWWWWW  WWWWWW  WWWW  WWWWWW  WWWWWW  WW",
+    "WW  WWWWWW  WWWWWW  WWWW  WWWWWW  WWWWWW  WW",
+    "WW    MM      MM      MM      MM      MM    WW",
+    "WW    MM      MM      MM      MM      MM    WW",
+    "WWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWW",
+    "WWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWW"
+]
+
+class MapError(Exception):
+    pass
+
+# Tile codes used by the compiled map
+TILE_CODES = {' ': 0, 'W': 1, 'P': 2, 'E': 3, 'M': 4, 'A': 5}
+
+# Compiled maps are cached on disk, keyed by a hash of the layout text
+MAP_CACHE_PATH = 'game_map.dgm'
+MAP_CACHE_MAGIC = b'DGYM'
+MAP_CACHE_VERSION = 1
+
+class Wall(pygame.sprite.Sprite):
+    # One sprite per merged rectangle of wall cells
+    def __init__(self, x, y, cell_size, width=1, height=1):
+        super().__init__()
+        self.image = pygame.Surface([cell_size * width, cell_size * height])
+        self.image.fill((0, 0, 255))  # Blue walls
+        self.rect = self.image.get_rect()
+        self.rect.x = x
+        self.rect.y = y
+
+class CompiledMap:
+    # Tile array, spawn cells and merged wall rectangles, all in cell units
+    def __init__(self, cols, rows, tiles, player_start, enemy_starts,
+                 medicine_positions, ambulance_positions, wall_rects, problems=()):
+        self.cols = cols
+        self.rows = rows
+        self.tiles = tiles
+        self.player_start = player_start
+        self.enemy_starts = enemy_starts
+        self.medicine_positions = medicine_positions
+        self.ambulance_positions = ambulance_positions
+        self.wall_rects = wall_rects
+        self.problems = list(problems)
+
+    def wall_cells(self):
+        return bytearray(1 if tile == 1 else 0 for tile in self.tiles)
+
+def scaled_layout(scale, layout=GAME_MAP):
+    # Tile a layout scale x scale times, short rows are padded with floor
+    width = max(len(line) for line in layout)
+    rows = [line.ljust(width) * scale for line in layout]
+    return rows * scale
+
+def validate_layout(layout):
+    # Returns (fatal, warnings); ragged rows are only warnings because cells
+    # past the end of a row have always been treated as floor
+    fatal = []
+    warnings = []
+    if not layout:
+        return ["Map is empty"], warnings
+
+    width = max(len(line) for line in layout)
+    for row, line in enumerate(layout):
+        if len(line) != width:
+            warnings.append(f"Row {row} has {len(line)} cells, expected {width}")
+        for col, char in enumerate(line):
+            if char not in TILE_CODES:
+                fatal.append(f"Unknown tile {char!r} at row {row}, col {col}")
+
+    if not any('P' in line for line in layout):
+        fatal.append("Map has no player start 'P'")
+    return fatal, warnings
+
+def merge_wall_rects(wall_cells, cols, rows):
+    # Greedy merge: grow each unclaimed wall cell right as far as possible,
+    # then down while the whole span below is unclaimed wall
+    claimed = bytearray(cols * rows)
+    rects = []
+    for row in range(rows):
+        for col in range(cols):
+            index = row * cols + col
+            if not wall_cells[index] or claimed[index]:
+                continue
+
+            width = 1
+            while (col + width < cols and wall_cells[index + width]
+                   and not claimed[index + width]):
+                width += 1
+
+            height = 1
+            while row + height < rows:
+                start = (row + height) * cols + col
+                if all(wall_cells[start + i] and not claimed[start + i] for i in range(width)):
+                    height += 1
+                else:
+                    break
+
+            for r in range(row, row + height):
+                start = r * cols + col
+                claimed[start:start + width] = b'\x01' * width
+            rects.append((col, row, width, height))
+    return rects
+
+def compile_map(layout, strict=False, merge_walls=True):
+    # merge_walls=False leaves wall_rects empty, for callers that only need the tiles
+    fatal, warnings = validate_layout(layout)
+    if strict:
+        fatal += warnings
+    if fatal:
+        raise MapError("; ".join(fatal))
+
+    rows = len(layout)
+    cols = max(len(line) for line in layout)
+    tiles = bytearray(cols * rows)
+    player_start = None
+    enemy_starts = []
+    medicine_positions = []
+    ambulance_positions = []
+
+    for row, line in enumerate(layout):
+        for col, char in enumerate(line):
+            tiles[row * cols + col] = TILE_CODES[char]
+            if char == 'P':
+                player_start = (col, row)
+            elif char == 'E':
+                enemy_starts.append((col, row))
+            elif char == 'M':
+                medicine_positions.append((col, row))
+            elif char == 'A':
+                ambulance_positions.append((col, row))
+
+    wall_cells = bytearray(1 if tile == 1 else 0 for tile in tiles)
+    wall_rects = merge_wall_rects(wall_cells, cols, rows) if merge_walls else []
+    return CompiledMap(cols, rows, tiles, player_start, enemy_starts,
+                       medicine_positions, ambulance_positions, wall_rects, warnings)
+
+def layout_hash(layout):
+    return hashlib.sha1("\n".join(layout).encode('utf-8')).digest()
+
+def pack_cells(cells):
+    return struct.pack('<I', len(cells)) + b''.join(struct.pack('<HH', *cell) for cell in cells)
+
+def unpack_cells(data, offset):
+    count, = struct.unpack_from('<I', data, offset)
+    offset += 4
+    cells = [struct.unpack_from('<HH', data, offset + i * 4) for i in range(count)]
+    return cells, offset + count * 4
+
+def write_compiled_map(path, compiled, digest):
+    # Header, tile array, spawn lists and wall rects in one little-endian blob
+    parts = [MAP_CACHE_MAGIC, struct.pack('<H20sHH', MAP_CACHE_VERSION, digest,
+                                          compiled.cols, compiled.rows),
+             bytes(compiled.tiles),
+             pack_cells([compiled.player_start]),
+             pack_cells(compiled.enemy_starts),
+             pack_cells(compiled.medicine_positions),
+             pack_cells(compiled.ambulance_positions),
+             struct.pack('<I', len(compiled.wall_rects)),
+             b''.join(struct.pack('<HHHH', *rect) for rect in compiled.wall_rects)]
+    # Written next to the target and swapped in, so a reader never sees half
+    # a file. Pool workers can compile at the same time, each one gets its
+    # own temporary file.
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(b''.join(parts))
+    os.replace(temporary, path)
+
+def read_compiled_map(path, digest):
+    # Returns None when the file is missing, stale or from another version
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if data[:4] != MAP_CACHE_MAGIC:
+        return None
+
+    try:
+        version, file_digest, cols, rows = struct.unpack_from('<H20sHH', data, 4)
+        if version != MAP_CACHE_VERSION or file_digest != digest:
+            return None
+        offset = 4 + struct.calcsize('<H20sHH')
+        tiles = bytearray(data[offset:offset + cols * rows])
+        offset += cols * rows
+        player_start, offset = unpack_cells(data, offset)
+        enemy_starts, offset = unpack_cells(data, offset)
+        medicine_positions, offset = unpack_cells(data, offset)
+        ambulance_positions, offset = unpack_cells(data, offset)
+        count, = struct.unpack_from('<I', data, offset)
+        offset += 4
+        wall_rects = [struct.unpack_from('<HHHH', data, offset + i * 8) for i in range(count)]
+    except struct.error:
+        return None
+
+    return CompiledMap(cols, rows, tiles, player_start[0], enemy_starts,
+                       medicine_positions, ambulance_positions, wall_rects)
+
+_compiled_maps = {}
+
+def clear_compiled_maps():
+    # The next load reads the disk cache or compiles again
+    _compiled_maps.clear()
+
+def get_compiled_map(layout=GAME_MAP, cache_path=MAP_CACHE_PATH):
+    digest = layout_hash(layout)
+    compiled = _compiled_maps.get(digest)
+    if compiled is not None:
+        return compiled
+
+    # Only the shipped map is cached on disk, other layouts stay in memory
+    use_disk = cache_path and layout is GAME_MAP
+    if use_disk:
+        compiled = read_compiled_map(cache_path, digest)
+    if compiled is None:
+        compiled = compile_map(layout)
+        if compiled.problems:
+            print(f"Map warning: {len(compiled.problems)} problems, run map.py for details")
+        if use_disk:
+            try:
+                write_compiled_map(cache_path, compiled, digest)
+            except OSError:
+                pass  # Read-only install, compile again next start
+
+    _compiled_maps[digest] = compiled
+    return compiled
+
+def load_map(cell_size, layout=GAME_MAP):
+    compiled = get_compiled_map(layout)
+    walls = pygame.sprite.Group()
+    for col, row, width, height in compiled.wall_rects:
+        walls.add(Wall(col * cell_size, row * cell_size, cell_size, width, height))
+
+    def to_pixels(cells):
+        return [(col * cell_size, row * cell_size) for col, row in cells]
+
+    player_start = to_pixels([compiled.player_start])[0]
+    return (walls, player_start, to_pixels(compiled.enemy_starts),
+            to_pixels(compiled.medicine_positions), to_pixels(compiled.ambulance_positions))
+
+def partner_start(cell_size, layout=GAME_MAP):
+    # Co-op second player: the 'P' cell farthest from the first player's start
+    compiled = get_compiled_map(layout)
+    first_col, first_row = compiled.player_start
+    cells = [(col, row) for row, line in enumerate(layout)
+             for col, char in enumerate(line) if char == 'P']
+    col, row = max(cells, key=lambda cell: (cell[0] - first_col) ** 2 + (cell[1] - first_row) ** 2)
+    return col * cell_size, row * cell_size
+
+class WallGrid:
+    # Tile occupancy grid built once from the layout, one byte per cell
+    def __init__(self, cells, cols, rows, cell_size):
+        self.cell_size = cell_size
+        self.rows = rows
+        self.cols = cols
+        self.cells = cells
+
+    def is_wall(self, col, row):
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return self.cells[row * self.cols + col] == 1
+        return False
+
+    def collides(self, rect):
+        return self.collides_area(rect.x, rect.y, rect.width, rect.height)
+
+    def collides_area(self, x, y, width, height):
+        # Only look at the cells the area overlaps, outside the map is empty
+        left = max(x // self.cell_size, 0)
+        right = min((x + width - 1) // self.cell_size, self.cols - 1)
+        top = max(y // self.cell_size, 0)
+        bottom = min((y + height - 1) // self.cell_size, self.rows - 1)
+        if left > right or top > bottom:
+            return False
+
+        for row in range(top, bottom + 1):
+            start = row * self.cols + left
+            if self.cells.find(1, start, start + right - left + 1) != -1:
+                return True
+        return False
+
+def load_wall_grid(cell_size, layout=GAME_MAP):
+    compiled = get_compiled_map(layout)
+    return WallGrid(compiled.wall_cells(), compiled.cols, compiled.rows, cell_size)
+
+if __name__ == '__main__':
+    # python map.py [--strict]: validate GAME_MAP and rebuild the binary cache
+    try:
+        compiled = compile_map(GAME_MAP, strict='--strict' in sys.argv)
+    except MapError as e:
+        print("Map error:", e)
+        sys.exit(1)
+    for problem in compiled.problems:
+        print("Map warning:", problem)
+    write_compiled_map(MAP_CACHE_PATH, compiled, layout_hash(GAME_MAP))
+    print(f"{compiled.cols}x{compiled.rows} map, {sum(compiled.wall_cells())} wall cells "
+          f"merged into {len(compiled.wall_rects)} rects, written to {MAP_CACHE_PATH}")
@@ -0,0 +1,173 @@
+import sys
+import mmap
+import struct
+from collections import OrderedDict
+from settings import *
+from map import (MapError, Wall, compile_map, layout_hash, merge_wall_rects,
+                 scaled_layout, pack_cells, unpack_cells)
+
+# Chunked on-disk storage for levels too big to hold in memory. The tiles are
+# stored chunk by chunk, so one chunk is one contiguous slice of a memory-
+# mapped file. Chunks are decoded into collision cells (and wall rects for
+# drawing) the first time something touches them and evicted least recently
+# used first, so memory follows the area the player and chairs move through,
+# not the size of the level. ChunkedMap answers the same queries as WallGrid.
+CHUNKED_MAP_MAGIC = b'DGCH'
+CHUNKED_MAP_VERSION = 1
+HEADER_FORMAT = '<H20sHHH'  # version, layout hash, cols, rows, chunk cells
+
+# Tile code -> 1 for walls, for bytes.translate
+WALL_TABLE = bytes(1 if code == 1 else 0 for code in range(256))
+
+def write_chunked_map(path, compiled, digest, chunk_cells=MAP_CHUNK_CELLS):
+    # Header, the tiles chunk by chunk (edge chunks padded with floor), then
+    # the spawn lists
+    chunk_cols = -(-compiled.cols // chunk_cells)
+    chunk_rows = -(-compiled.rows // chunk_cells)
+    with open(path, 'wb') as f:
+        f.write(CHUNKED_MAP_MAGIC)
+        f.write(struct.pack(HEADER_FORMAT, CHUNKED_MAP_VERSION, digest,
+                            compiled.cols, compiled.rows, chunk_cells))
+        for cy in range(chunk_rows):
+            for cx in range(chunk_cols):
+                chunk = bytearray(chunk_cells * chunk_cells)
+                left = cx * chunk_cells
+                width = min(chunk_cells, compiled.cols - left)
+                for r in range(min(chunk_cells, compiled.rows - cy * chunk_cells)):
+                    start = (cy * chunk_cells + r) * compiled.cols + left
+                    chunk[r * chunk_cells:r * chunk_cells + width] = compiled.tiles[start:start + width]
+                f.write(chunk)
+        f.write(pack_cells([compiled.player_start]))
+        f.write(pack_cells(compiled.enemy_starts))
+        f.write(pack_cells(compiled.medicine_positions))
+        f.write(pack_cells(compiled.ambulance_positions))
+
+class MapChunk:
+    def __init__(self, cx, cy, cells):
+        self.cx = cx
+        self.cy = cy
+        self.cells = cells  # 1 for wall, chunk_cells x chunk_cells
+        self.walls = None   # Merged Wall sprites, built on the first draw
+
+class ChunkedMap:
+    def __init__(self, path, cell_size=CELL_SIZE, max_chunks=MAX_RESIDENT_CHUNKS):
+        self.cell_size = cell_size
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict()
+        self.loads = 0  # Chunks paged in so far, evicted ones count again
+
+        self.file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.data[:4] != CHUNKED_MAP_MAGIC:
+                raise MapError(f"{path} is not a chunked map")
+            version, self.digest, self.cols, self.rows, self.chunk_cells = \
+                struct.unpack_from(HEADER_FORMAT, self.data, 4)
+            if version != CHUNKED_MAP_VERSION:
+                raise MapError(f"{path} has version {version}, expected {CHUNKED_MAP_VERSION}")
+
+            self.tiles_offset = 4 + struct.calcsize(HEADER_FORMAT)
+            self.chunk_cols = -(-self.cols // self.chunk_cells)
+            self.chunk_rows = -(-self.rows // self.chunk_cells)
+            offset = self.tiles_offset + self.chunk_cols * self.chunk_rows * self.chunk_cells ** 2
+            player_start, offset = unpack_cells(self.data, offset)
+            self.enemy_starts, offset = unpack_cells(self.data, offset)
+            self.medicine_positions, offset = unpack_cells(self.data, offset)
+            self.ambulance_positions, offset = unpack_cells(self.data, offset)
+            self.player_start = player_start[0]
+        except (struct.error, ValueError, IndexError) as e:
+            self.close()
+            raise MapError(f"{path} is damaged: {e}")
+        except MapError:
+            self.close()
+            raise
+
+    def close(self):
+        self.chunks.clear()
+        if getattr(self, 'data', None) is not None:
+            self.data.close()
+            self.data = None
+        self.file.close()
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def chunk(self, cx, cy):
+        key = (cx, cy)
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            return chunk
+
+        size = self.chunk_cells * self.chunk_cells
+        offset = self.tiles_offset + (cy * self.chunk_cols + cx) * size
+        cells = bytearray(self.data[offset:offset + size].translate(WALL_TABLE))
+        chunk = MapChunk(cx, cy, cells)
+        self.chunks[key] = chunk
+        self.loads += 1
+        while len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+        return chunk
+
+    def is_wall(self, col, row):
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            cc = self.chunk_cells
+            chunk = self.chunk(col // cc, row // cc)
+            return chunk.cells[(row % cc) * cc + col % cc] == 1
+        return False
+
+    def collides(self, rect):
+        return self.collides_area(rect.x, rect.y, rect.width, rect.height)
+
+    def collides_area(self, x, y, width, height):
+        # Same rules as WallGrid, the area is cut along chunk borders
+        left = max(x // self.cell_size, 0)
+        right = min((x + width - 1) // self.cell_size, self.cols - 1)
+        top = max(y // self.cell_size, 0)
+        bottom = min((y + height - 1) // self.cell_size, self.rows - 1)
+        if left > right or top > bottom:
+            return False
+
+        cc = self.chunk_cells
+        for cy in range(top // cc, bottom // cc + 1):
+            row_start = max(top, cy * cc)
+            row_end = min(bottom, cy * cc + cc - 1)
+            for cx in range(left // cc, right // cc + 1):
+                cells = self.chunk(cx, cy).cells
+                col_start = max(left, cx * cc) - cx * cc
+                col_end = min(right, cx * cc + cc - 1) - cx * cc + 1
+                for row in range(row_start - cy * cc, row_end - cy * cc + 1):
+                    if cells.find(1, row * cc + col_start, row * cc + col_end) != -1:
+                        return True
+        return False
+
+    def walls_in(self, rect):
+        # Wall sprites of every chunk overlapping a pixel rect, for drawing
+        span = self.chunk_cells * self.cell_size
+        walls = []
+        for cy in range(max(0, rect.top // span), min(self.chunk_rows, (rect.bottom - 1) // span + 1)):
+            for cx in range(max(0, rect.left // span), min(self.chunk_cols, (rect.right - 1) // span + 1)):
+                chunk = self.chunk(cx, cy)
+                if chunk.walls is None:
+                    cc = self.chunk_cells
+                    cs = self.cell_size
+                    chunk.walls = [Wall((cx * cc + col) * cs, (cy * cc + row) * cs, cs, width, height)
+                                   for col, row, width, height in merge_wall_rects(chunk.cells, cc, cc)]
+                walls += chunk.walls
+        return walls
+
+if __name__ == '__main__':
+    # python mapstore.py <out.dgc> [scale]: store GAME_MAP, tiled scale x scale
+    # times, as a chunked map
+    if len(sys.argv) < 2:
+        print("usage: python mapstore.py <out.dgc> [scale]")
+        sys.exit(1)
+    layout = scaled_layout(int(sys.argv[2]) if len(sys.argv) > 2 else 1)
+    try:
+        compiled = compile_map(layout)
+    except MapError as e:
+        print("Map error:", e)
+        sys.exit(1)
+    write_chunked_map(sys.argv[1], compiled, layout_hash(layout))
+    print(f"{compiled.cols}x{compiled.rows} map written to {sys.argv[1]} "
+          f"in {MAP_CHUNK_CELLS}x{MAP_CHUNK_CELLS} cell chunks")
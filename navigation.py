@@ -0,0 +1,195 @@
+from collections import deque
+
+# Chair navigation over the tile grid, both built once per map.
+# FlowField is the shared chase field for the "hunt" chair AI. One
+# breadth-first search, rooted at the player's cell, gives every cell its step
+# distance to the player; chairs just walk downhill. The field is only
+# rebuilt when the player enters a new cell, so the cost does not grow with
+# the number of chairs. NavGraph is the corridor graph of the "graph" AI.
+
+NEIGHBOURS = [(1,0), (-1,0), (0,1), (0,-1)]
+REVERSE = [1, 0, 3, 2]  # Index of the opposite neighbour
+
+# bytes.translate tables between wall cells and the bit strings of int masks
+FLOOR_BITS = bytes.maketrans(b'\x00\x01', b'10')
+BIT_CELLS = bytes.maketrans(b'01', b'\x00\x01')
+
+def anchor_passable(wall_grid, span_x, span_y, cols=None, rows=None):
+    # Chairs are laid out over their top-left cell, which is only passable
+    # if the whole span_x x span_y chair fits there. cols/rows may extend
+    # past the map, where there are no walls. Each row is one int bitmask,
+    # so the fit test is a few shifts and ANDs per row instead of per cell.
+    cols = cols or wall_grid.cols
+    rows = rows or wall_grid.rows
+    grid_cols = wall_grid.cols
+    anchors = (1 << (cols - span_x + 1)) - 1 if cols >= span_x else 0
+    fits = []
+    for row in range(rows):
+        if row < wall_grid.rows:
+            line = bytes(wall_grid.cells[row * grid_cols:(row + 1) * grid_cols]).translate(FLOOR_BITS)
+            floor = int((line + b'1' * (cols - grid_cols))[::-1], 2)
+        else:
+            floor = (1 << cols) - 1
+        mask = floor
+        for dx in range(1, span_x):
+            mask &= floor >> dx
+        fits.append(mask & anchors)
+
+    passable = bytearray(cols * rows)
+    for row in range(rows - span_y + 1):
+        mask = fits[row]
+        for dy in range(1, span_y):
+            mask &= fits[row + dy]
+        if mask:
+            passable[row * cols:(row + 1) * cols] = format(mask, f'0{cols}b')[::-1].encode().translate(BIT_CELLS)
+    return passable
+
+class FlowField:
+    def __init__(self, wall_grid, footprint):
+        # footprint is the chair size in pixels
+        self.wall_grid = wall_grid
+        self.cell_size = wall_grid.cell_size
+        self.cols = wall_grid.cols
+        self.rows = wall_grid.rows
+        self.span_x = -(-footprint[0] // self.cell_size)
+        self.span_y = -(-footprint[1] // self.cell_size)
+        self.root = None
+        self.distance = [-1] * (self.cols * self.rows)
+        self.passable = anchor_passable(wall_grid, self.span_x, self.span_y)
+
+    def update(self, col, row):
+        # Returns True when the field had to be rebuilt
+        if (col, row) == self.root:
+            return False
+        self.root = (col, row)
+        self._search(col, row)
+        return True
+
+    def _search(self, col, row):
+        cols = self.cols
+        distance = [-1] * (cols * self.rows)
+        queue = deque()
+
+        # Every anchor whose chair footprint covers the player's cell is a goal
+        for anchor_row in range(row - self.span_y + 1, row + 1):
+            for anchor_col in range(col - self.span_x + 1, col + 1):
+                if 0 <= anchor_col < cols and 0 <= anchor_row < self.rows:
+                    index = anchor_row * cols + anchor_col
+                    if self.passable[index]:
+                        distance[index] = 0
+                        queue.append(index)
+
+        passable = self.passable
+        while queue:
+            index = queue.popleft()
+            next_distance = distance[index] + 1
+            c = index % cols
+            if c > 0 and passable[index - 1] and distance[index - 1] < 0:
+                distance[index - 1] = next_distance
+                queue.append(index - 1)
+            if c < cols - 1 and passable[index + 1] and distance[index + 1] < 0:
+                distance[index + 1] = next_distance
+                queue.append(index + 1)
+            if index >= cols and passable[index - cols] and distance[index - cols] < 0:
+                distance[index - cols] = next_distance
+                queue.append(index - cols)
+            below = index + cols
+            if below < len(distance) and passable[below] and distance[below] < 0:
+                distance[below] = next_distance
+                queue.append(below)
+
+        self.distance = distance
+
+    def distance_at(self, col, row):
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return self.distance[row * self.cols + col]
+        return -1
+
+    def next_step(self, col, row):
+        # Direction towards the neighbour closest to the player, None when the
+        # chair is already there or cannot reach the player
+        best = self.distance_at(col, row)
+        if best <= 0:
+            return None
+        step = None
+        for dx, dy in NEIGHBOURS:
+            distance = self.distance_at(col + dx, row + dy)
+            if 0 <= distance < best:
+                best = distance
+                step = (dx, dy)
+        return step
+
+class NavGraph:
+    # Corridor graph for wandering chairs, built once from the tile layout.
+    # Anchors where a chair can turn or has to stop (junctions, corners and
+    # dead ends) are nodes, the straight runs of anchors between them are
+    # the edges. For every anchor and direction the graph knows the node the
+    # run ends at, so a chair glides there without wall queries. width and
+    # height cover the play area when it is bigger than the map.
+    def __init__(self, wall_grid, footprint, width=0, height=0):
+        self.cell_size = wall_grid.cell_size
+        self.cols = max(wall_grid.cols, width // self.cell_size)
+        self.rows = max(wall_grid.rows, height // self.cell_size)
+        span_x = -(-footprint[0] // self.cell_size)
+        span_y = -(-footprint[1] // self.cell_size)
+        self.passable = passable = anchor_passable(wall_grid, span_x, span_y, self.cols, self.rows)
+        cols = self.cols
+        offsets = [dx + dy * cols for dx, dy in NEIGHBOURS]
+
+        # Directions out of every passable anchor
+        self.exits = exits = [()] * len(passable)
+        for index, free in enumerate(passable):
+            if free:
+                col = index % cols
+                row = index // cols
+                exits[index] = tuple(d for d, (dx, dy) in enumerate(NEIGHBOURS)
+                                     if 0 <= col + dx < cols and 0 <= row + dy < self.rows
+                                     and passable[index + offsets[d]])
+
+        self.nodes = nodes = bytearray(len(passable))
+        for index, directions in enumerate(exits):
+            if passable[index] and (len(directions) != 2 or directions[1] != REVERSE[directions[0]]):
+                nodes[index] = 1
+
+        # Walk every edge once from each end, filling in where it leads for
+        # each anchor on the way
+        self.ends = ends = [-1] * (len(passable) * 4)
+        for index, is_node in enumerate(nodes):
+            if not is_node:
+                continue
+            for d in exits[index]:
+                path = [index]
+                current = index + offsets[d]
+                while not nodes[current]:
+                    path.append(current)
+                    current += offsets[d]
+                for anchor in path:
+                    ends[anchor * 4 + d] = current
+
+    def choose(self, x, y, direction, rng):
+        # New (direction, target position) for a chair standing at x, y, None
+        # when it is not on a passable anchor. Chairs never reverse unless
+        # they hit a dead end, and keep going straight through corridors.
+        cell_size = self.cell_size
+        col, col_offset = divmod(x, cell_size)
+        row, row_offset = divmod(y, cell_size)
+        if not (0 <= col < self.cols and 0 <= row < self.rows):
+            return None
+        if col_offset or row_offset:
+            # Off the grid (e.g. after wandering), line up with the anchor
+            # first. It only covers cells the chair already covers.
+            return direction, (col * cell_size, row * cell_size)
+        index = row * self.cols + col
+        exits = self.exits[index]
+        if not self.passable[index] or not exits:
+            return None
+
+        current = NEIGHBOURS.index(direction)
+        if not self.nodes[index] and current in exits:
+            d = current
+        else:
+            options = [d for d in exits if d != REVERSE[current]] or list(exits)
+            d = options[0] if len(options) == 1 else rng.choice(options)
+
+        end = self.ends[index * 4 + d]
+        return NEIGHBOURS[d], ((end % self.cols) * cell_size, (end // self.cols) * cell_size)
@@ -0,0 +1,691 @@
+import math
+import time
+import random
+import socket
+import struct
+import argparse
+from collections import deque
+import pygame
+from settings import *
+from map import GAME_MAP, layout_hash, load_map, load_wall_grid, partner_start
+from entities import Player, Pickup, Ambulance, EntityPool, DIRECTIONS
+import assets
+
+# Two-player co-op over UDP. The host runs the only GameSimulation, with the
+# partner as its second player, and sends the client one snapshot per tick.
+# Snapshots are deltas against the last snapshot the client acknowledged:
+# players send only the fields that changed, pickups and ambulances the
+# positions that came and went, and chairs are dead-reckoned towards their
+# target on both ends, so a chair is only sent when it turned, bounced or
+# respawned. The client sends its inputs, the last few again in every packet
+# so a lost one is made up by the next, and predicts its own player by
+# replaying the inputs the host has not confirmed yet on top of every
+# snapshot. A snapshot stays under SNAPSHOT_BUDGET bytes, so it always fits
+# a single datagram: whatever does not fit follows in the next ones.
+#
+#   python netplay.py [--loss 0.1] [--latency 50]   localhost test with bots
+
+NET_MAGIC = b'DG'
+NET_VERSION = 1
+HELLO, WELCOME, INPUT, SNAPSHOT, BYE = range(1, 6)
+
+HELLO_FORMAT = '<B2sB20s'          # type, magic, version, layout hash
+WELCOME_FORMAT = '<B2sB20sBHd'     # ... player index, fps, chair speed
+INPUT_FORMAT = '<BIIB'             # type, acked tick, first input number, inputs
+SNAPSHOT_FORMAT = '<BBIBIB'        # type, flags, tick, baseline age (0 = none), last input, events
+CHAIR_FORMAT = '<HiiB'             # index, x, y, direction (+4 when a target follows)
+POSITION_FORMAT = '<ii'            # Pixels, big levels run past 16 bits
+CELL_FORMAT = '<HH'                # Chair targets sit on cells, sent as col, row
+TARGET_FLAG = 4
+PIXEL_TARGET_FLAG = 8              # The target is off the cell grid, sent in pixels
+
+MAX_DATAGRAM = 65535               # recvfrom() size, a smaller buffer cuts longer packets short
+EVENT_BITS = ['pickup', 'ambulance', 'hit', 'game_over']
+GAME_OVER_FLAG = 1
+CHAIR_SIZE = (CELL_SIZE*2-4, CELL_SIZE*2-4)
+
+class NetError(Exception):
+    pass
+
+class WorldState:
+    # One tick of the replicated game, what snapshots are encoded against.
+    # players are (x, y, score, lives), chairs (x, y, direction, target)
+    def __init__(self, tick=0, players=(), chairs=(), pickups=frozenset(),
+                 ambulances=frozenset(), game_over=False):
+        self.tick = tick
+        self.players = list(players)
+        self.chairs = list(chairs)
+        self.pickups = pickups
+        self.ambulances = ambulances
+        self.game_over = game_over
+
+    def __eq__(self, other):
+        return (self.tick, self.players, self.chairs, self.pickups, self.ambulances, self.game_over) == \
+               (other.tick, other.players, other.chairs, other.pickups, other.ambulances, other.game_over)
+
+EMPTY_STATE = WorldState()
+
+def capture_state(simulation):
+    return WorldState(
+        simulation.tick,
+        [(p.rect.x, p.rect.y, p.score, p.lives) for p in simulation.players],
+        [(e.rect.x, e.rect.y, DIRECTIONS.index(tuple(e.direction)),
+          tuple(e.target) if e.target is not None else None) for e in simulation.enemies],
+        frozenset(s.rect.topleft for s in simulation.pickups),
+        frozenset(s.rect.topleft for s in simulation.ambulances),
+        simulation.game_over)
+
+def advance_chair(chair, ticks, speed):
+    # Where a chair would be after `ticks` more ticks if it keeps going:
+    # towards its target (stopping there) or straight on. Moves a Rect the
+    # way Enemy does, so both ends round alike.
+    x, y, direction, target = chair
+    rect = pygame.Rect(x, y, 0, 0)
+    if target is None:
+        dx, dy = DIRECTIONS[direction]
+        for _ in range(ticks):
+            rect.x += dx * speed
+            rect.y += dy * speed
+    else:
+        for _ in range(ticks):
+            dx = target[0] - rect.x
+            dy = target[1] - rect.y
+            if not dx and not dy:
+                break
+            if dx:
+                rect.x += math.copysign(min(abs(dx), speed), dx)
+            if dy:
+                rect.y += math.copysign(min(abs(dy), speed), dy)
+    return (rect.x, rect.y, direction, target)
+
+def event_bits(events):
+    bits = 0
+    for event in events:
+        if event in EVENT_BITS:
+            bits |= 1 << EVENT_BITS.index(event)
+    return bits
+
+def encode_chair(index, chair):
+    x, y, direction, target = chair
+    if target is None:
+        return struct.pack(CHAIR_FORMAT, index, x, y, direction)
+    if target[0] % CELL_SIZE or target[1] % CELL_SIZE or min(target) < 0:
+        return struct.pack(CHAIR_FORMAT, index, x, y, direction | TARGET_FLAG | PIXEL_TARGET_FLAG) + \
+               struct.pack(POSITION_FORMAT, *target)
+    return struct.pack(CHAIR_FORMAT, index, x, y, direction | TARGET_FLAG) + \
+           struct.pack(CELL_FORMAT, target[0] // CELL_SIZE, target[1] // CELL_SIZE)
+
+def encode_snapshot(state, baseline, input_ack, events, speed, budget=SNAPSHOT_BUDGET):
+    # Returns (data, sent). data never grows past budget bytes: chairs,
+    # pickups and ambulances that do not fit wait for a later snapshot, and
+    # sent is the state the client rebuilds from data, the baseline later
+    # snapshots are encoded against.
+    flags = GAME_OVER_FLAG if state.game_over else 0
+    age = state.tick - baseline.tick if baseline is not EMPTY_STATE else 0
+    parts = [struct.pack(SNAPSHOT_FORMAT, SNAPSHOT, flags, state.tick, age, input_ack, events),
+             struct.pack('<B', len(state.players))]
+
+    # Players: a bit mask of the fields that changed, then those fields
+    for index, player in enumerate(state.players):
+        old = baseline.players[index] if index < len(baseline.players) else None
+        mask = 0
+        fields = []
+        if old is None or player[:2] != old[:2]:
+            mask |= 1
+            fields.append(struct.pack(POSITION_FORMAT, player[0], player[1]))
+        if old is None or player[2] != old[2]:
+            mask |= 2
+            fields.append(struct.pack('<I', player[2]))
+        if old is None or player[3] != old[3]:
+            mask |= 4
+            fields.append(struct.pack('<H', player[3]))
+        parts.append(struct.pack('<B', mask))
+        parts += fields
+    room = budget - sum(len(part) for part in parts) - 12  # Less the three count pairs
+
+    # Pickups and ambulances that came and went, removed ones first, in at
+    # most half of the room left
+    position_size = struct.calcsize(POSITION_FORMAT)
+    items = room // 2 // position_size
+    item_parts = []
+    sets = []
+    for now, before in ((state.pickups, baseline.pickups), (state.ambulances, baseline.ambulances)):
+        removed = sorted(before - now)[:items]
+        added = sorted(now - before)[:items - len(removed)]
+        items -= len(removed) + len(added)
+        room -= (len(removed) + len(added)) * position_size
+        item_parts.append(struct.pack('<HH', len(removed), len(added)))
+        item_parts += [struct.pack(POSITION_FORMAT, *position) for position in removed + added]
+        sets.append((before - frozenset(removed)) | frozenset(added))
+
+    # Chairs the client would not predict from the baseline: new ones in
+    # order, then the rest from an offset that moves every tick, so none is
+    # left behind for long when they do not all fit
+    ticks = state.tick - baseline.tick
+    chairs = [advance_chair(chair, ticks, speed) for chair in baseline.chairs[:len(state.chairs)]]
+    changed = [index for index, chair in enumerate(chairs) if chair != state.chairs[index]]
+    if changed:
+        shift = state.tick % len(changed)
+        changed = changed[shift:] + changed[:shift]
+    chair_parts = []
+    for index in list(range(len(chairs), len(state.chairs))) + changed:
+        part = encode_chair(index, state.chairs[index])
+        if len(part) > room:
+            break
+        room -= len(part)
+        chair_parts.append(part)
+        if index < len(chairs):
+            chairs[index] = state.chairs[index]
+        else:
+            chairs.append(state.chairs[index])
+    parts.append(struct.pack('<HH', len(chairs), len(chair_parts)))
+    parts += chair_parts + item_parts
+
+    sent = WorldState(state.tick, state.players, chairs, sets[0], sets[1], state.game_over)
+    return b''.join(parts), sent
+
+def decode_snapshot(data, history, speed):
+    # Returns (state, input_ack, events), or None when the baseline is no
+    # longer known. Raises NetError when the packet is damaged.
+    try:
+        kind, flags, tick, age, input_ack, events = struct.unpack_from(SNAPSHOT_FORMAT, data)
+        baseline = history.get(tick - age) if age else EMPTY_STATE
+        if baseline is None:
+            return None
+        offset = struct.calcsize(SNAPSHOT_FORMAT)
+        count, = struct.unpack_from('<B', data, offset)
+        offset += 1
+        players = []
+        for index in range(count):
+            x, y, score, lives = baseline.players[index] if index < len(baseline.players) else (0, 0, 0, 0)
+            mask = data[offset]
+            offset += 1
+            if mask & 1:
+                x, y = struct.unpack_from(POSITION_FORMAT, data, offset)
+                offset += 8
+            if mask & 2:
+                score, = struct.unpack_from('<I', data, offset)
+                offset += 4
+            if mask & 4:
+                lives, = struct.unpack_from('<H', data, offset)
+                offset += 2
+            players.append((x, y, score, lives))
+
+        total, changed = struct.unpack_from('<HH', data, offset)
+        offset += 4
+        ticks = tick - baseline.tick
+        chairs = [advance_chair(chair, ticks, speed) for chair in baseline.chairs[:total]]
+        chairs += [None] * (total - len(chairs))
+        for _ in range(changed):
+            index, x, y, direction = struct.unpack_from(CHAIR_FORMAT, data, offset)
+            offset += struct.calcsize(CHAIR_FORMAT)
+            target = None
+            if direction & PIXEL_TARGET_FLAG:
+                target = struct.unpack_from(POSITION_FORMAT, data, offset)
+                offset += 8
+            elif direction & TARGET_FLAG:
+                col, row = struct.unpack_from(CELL_FORMAT, data, offset)
+                target = (col * CELL_SIZE, row * CELL_SIZE)
+                offset += 4
+            chairs[index] = (x, y, direction & 3, target)
+
+        sets = []
+        for before in (baseline.pickups, baseline.ambulances):
+            removed, added = struct.unpack_from('<HH', data, offset)
+            offset += 4
+            positions = [struct.unpack_from(POSITION_FORMAT, data, offset + i * 8) for i in range(removed + added)]
+            offset += (removed + added) * 8
+            sets.append((before - frozenset(positions[:removed])) | frozenset(positions[removed:]))
+    except (struct.error, IndexError) as e:
+        raise NetError(f"Damaged snapshot: {e}")
+    if None in chairs:
+        raise NetError("Damaged snapshot: a new chair is missing")
+
+    state = WorldState(tick, players, chairs, sets[0], sets[1], bool(flags & GAME_OVER_FLAG))
+    return state, input_ack, [event for bit, event in enumerate(EVENT_BITS) if events & (1 << bit)]
+
+class Link:
+    # Non-blocking UDP socket that can drop and delay what it sends, for
+    # testing on localhost. latency is in ticks, flush() once per tick.
+    def __init__(self, port=0, loss=0.0, latency=0, seed=None):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(('', port))
+        self.socket.setblocking(False)
+        self.loss = loss
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.queue = deque()
+        self.bytes_sent = 0
+        self.packets_sent = 0
+
+    def send(self, data, address):
+        self.bytes_sent += len(data)
+        self.packets_sent += 1
+        if self.loss and self.rng.random() < self.loss:
+            return
+        if self.latency:
+            self.queue.append([self.latency, data, address])
+        else:
+            self._send(data, address)
+
+    def _send(self, data, address):
+        try:
+            self.socket.sendto(data, address)
+        except ConnectionError:
+            pass  # Nobody listening (yet), UDP does not care
+        except OSError as e:
+            print(f"Dropped a {len(data)} byte packet:", str(e))
+
+    def flush(self):
+        for entry in self.queue:
+            entry[0] -= 1
+        while self.queue and self.queue[0][0] <= 0:
+            entry = self.queue.popleft()
+            self._send(entry[1], entry[2])
+
+    def receive(self):
+        packets = []
+        while True:
+            try:
+                packets.append(self.socket.recvfrom(MAX_DATAGRAM))
+            except (BlockingIOError, InterruptedError):
+                return packets
+            except ConnectionResetError:
+                continue  # Windows reports an unreachable peer here
+            except OSError as e:
+                # Anything else will not go away by reading again, the
+                # timeout ends the game
+                print("Network error:", str(e))
+                return packets
+
+    def close(self):
+        self.socket.close()
+
+class NetHost:
+    # Runs next to the GameSimulation on the hosting machine: poll() before
+    # the step, next_input() as the partner's actions and send_snapshot()
+    # after it. The partner is only in the game while a client is connected.
+    def __init__(self, simulation, port=NET_PORT, loss=0.0, latency=0, seed=None):
+        self.simulation = simulation
+        self.link = Link(port, loss, latency, seed)
+        self.digest = layout_hash(simulation.layout)
+        self.client = None
+        self._reset_client()
+
+    def _reset_client(self):
+        self.history = {}      # tick -> state as sent to the client
+        self.inputs = deque()
+        self.last_input = 0    # Highest input number received
+        self.input_ack = 0     # Input number last applied
+        self.actions = 0
+        self.client_ack = 0    # Tick of the last snapshot the client has
+        self.last_heard = time.perf_counter()
+
+    def poll(self):
+        for data, address in self.link.receive():
+            if not data:
+                continue
+            if data[0] == HELLO:
+                self._hello(data, address)
+            elif address != self.client:
+                continue
+            elif data[0] == INPUT:
+                self._input(data)
+            elif data[0] == BYE:
+                print("Partner left the game")
+                self._drop_client()
+
+        if self.client is not None and time.perf_counter() - self.last_heard > NET_TIMEOUT / 1000:
+            print("Partner timed out")
+            self._drop_client()
+
+    def _drop_client(self):
+        self.client = None
+        self.simulation.remove_partner()
+
+    def _hello(self, data, address):
+        try:
+            kind, magic, version, digest = struct.unpack_from(HELLO_FORMAT, data)
+        except struct.error:
+            return
+        if magic != NET_MAGIC or version != NET_VERSION:
+            return
+        if self.client is not None and address != self.client:
+            return  # Already have a partner
+        if self.client is None:
+            print("Partner joined from", address[0])
+            self._reset_client()
+            self.simulation.add_partner()
+        self.client = address
+        self.last_heard = time.perf_counter()
+        self.link.send(struct.pack(WELCOME_FORMAT, WELCOME, NET_MAGIC, NET_VERSION, self.digest,
+                                   1, self.simulation.fps, self.simulation.enemy_speed), address)
+        self.link.flush()
+
+    def _input(self, data):
+        try:
+            kind, ack, first, count = struct.unpack_from(INPUT_FORMAT, data)
+        except struct.error:
+            print("Dropped a damaged input packet")
+            return
+        actions = data[struct.calcsize(INPUT_FORMAT):struct.calcsize(INPUT_FORMAT) + count]
+        self.client_ack = max(self.client_ack, ack)
+        self.last_heard = time.perf_counter()
+        for number, action in enumerate(actions, first):
+            if number > self.last_input:
+                self.inputs.append((number, action))
+                self.last_input = number
+
+    def next_input(self):
+        # One input per tick. A late input repeats the last one (the keys are
+        # most likely still held), a backlog is skipped to keep the lag down.
+        while len(self.inputs) > MAX_INPUT_BACKLOG:
+            self.inputs.popleft()
+        if self.inputs:
+            self.input_ack, self.actions = self.inputs.popleft()
+        return self.actions if self.client is not None else 0
+
+    def send_snapshot(self):
+        if self.client is not None:
+            state = capture_state(self.simulation)
+            baseline = self.history.get(self.client_ack, EMPTY_STATE)
+            data, sent = encode_snapshot(state, baseline, self.input_ack, event_bits(self.simulation.events),
+                                         self.simulation.enemy_speed)
+            self.history[state.tick] = sent
+            self.history.pop(state.tick - SNAPSHOT_HISTORY, None)
+            self.link.send(data, self.client)
+        self.link.flush()
+
+    def close(self):
+        if self.client is not None:
+            self.link.latency = 0
+            self.link.send(struct.pack('<B', BYE), self.client)
+        self.link.close()
+
+class NetClient:
+    # Stands in for the GameSimulation on the joining machine, the game loop
+    # drives it the same way: reset() joins the host, step(actions) sends the
+    # input and returns the predicted state, visible_sprites() draws it.
+    def __init__(self, host, port=NET_PORT, layout=GAME_MAP, loss=0.0, latency=0, seed=None):
+        self.host = host
+        self.port = port
+        self.address = None
+        self.layout = layout
+        self.loss = loss
+        self.latency = latency
+        self.seed = seed
+        self.link = None
+        self.fps = FPS
+        self.dt = 1000 / FPS
+        self.players = []
+        self.all_sprites = pygame.sprite.Group()
+        self.game_over = False
+        self.events = []
+
+    def reset(self, seed=None, progress=None):
+        # The map is loaded locally, everything on it comes from the host
+        report = progress or (lambda fraction: None)
+        self.walls, player_start = load_map(CELL_SIZE, self.layout)[:2]
+        self.wall_grid = load_wall_grid(CELL_SIZE, self.layout)
+        self.width = max(WINDOW_WIDTH, self.wall_grid.cols * CELL_SIZE)
+        self.height = max(WINDOW_HEIGHT, self.wall_grid.rows * CELL_SIZE)
+        self.players = [Player(*player_start), Player(*partner_start(CELL_SIZE, self.layout))]
+        self.all_sprites = pygame.sprite.Group(self.players)
+        self.chairs = []
+        self.pickups = {}   # position -> sprite
+        self.ambulances = {}
+        self.pickup_pool = EntityPool(Pickup)
+        self.ambulance_pool = EntityPool(Ambulance)
+        self.history = {}
+        self.latest = EMPTY_STATE
+        self.pending = deque()  # (input number, actions) not confirmed by the host
+        self.input_number = 0
+        self.input_ack = 0
+        self.game_over = False
+        self.events = []
+        report(0.2)
+        self._join(report)
+        return self.state()
+
+    def _join(self, report):
+        try:
+            self.address = (socket.gethostbyname(self.host), self.port)
+        except OSError as e:
+            raise NetError(f"Could not find the host {self.host}: {e}")
+        if self.link is not None:
+            self.link.close()
+        self.link = Link(0, self.loss, self.latency, self.seed)
+        hello = struct.pack(HELLO_FORMAT, HELLO, NET_MAGIC, NET_VERSION, layout_hash(self.layout))
+        start = time.perf_counter()
+        next_hello = start
+        while time.perf_counter() - start < NET_TIMEOUT / 1000:
+            now = time.perf_counter()
+            if now >= next_hello:
+                self.link._send(hello, self.address)
+                next_hello = now + 0.25
+                report(0.2 + 0.8 * (now - start) * 1000 / NET_TIMEOUT)
+            for data, address in self.link.receive():
+                if address != self.address or not data or data[0] != WELCOME:
+                    continue
+                try:
+                    kind, magic, version, digest, self.index, fps, self.speed = \
+                        struct.unpack_from(WELCOME_FORMAT, data)
+                except struct.error:
+                    continue
+                if magic != NET_MAGIC or version != NET_VERSION:
+                    raise NetError("The host runs another version of Dagyiman")
+                if digest != layout_hash(self.layout):
+                    raise NetError("The host is playing a different map")
+                self.fps = fps
+                self.dt = 1000 / fps
+                self.player = self.players[self.index]
+                self.last_heard = time.perf_counter()
+                return
+            time.sleep(0.01)
+        raise NetError(f"No answer from a host at {self.address[0]}:{self.address[1]}")
+
+    def step(self, actions=0):
+        self.events = []
+        if self.game_over:
+            return self.state()
+
+        received = False
+        for data, address in self.link.receive():
+            if address != self.address or not data:
+                continue
+            if data[0] == SNAPSHOT:
+                try:
+                    decoded = decode_snapshot(data, self.history, self.speed)
+                except NetError as e:
+                    print("Dropped a snapshot:", str(e))
+                    continue
+                if decoded is None or decoded[0].tick <= self.latest.tick:
+                    continue  # Late or on an unknown baseline
+                state, self.input_ack, events = decoded
+                self.history[state.tick] = state
+                self.history.pop(state.tick - SNAPSHOT_HISTORY, None)
+                self.latest = state
+                self.events += events
+                self.last_heard = time.perf_counter()
+                received = True
+            elif data[0] == BYE:
+                print("The host left the game")
+                self._end()
+
+        if time.perf_counter() - self.last_heard > NET_TIMEOUT / 1000:
+            print("Lost the connection to the host")
+            self._end()
+
+        # Predict the own player: inputs the host confirmed are dropped, the
+        # rest are replayed on top of the host's latest position
+        self.input_number += 1
+        self.pending.append((self.input_number, actions))
+        while self.pending and (self.pending[0][0] <= self.input_ack or len(self.pending) > SNAPSHOT_HISTORY):
+            self.pending.popleft()
+        if received:
+            self._apply(self.latest)
+        player = self.player
+        if player.lives > 0:
+            for number, pending_actions in (self.pending if received else [self.pending[-1]]):
+                player.update(self.wall_grid, pending_actions)
+
+        # Every packet repeats the unconfirmed inputs, a lost one costs nothing
+        inputs = list(self.pending)[-INPUT_REDUNDANCY:]
+        self.link.send(struct.pack(INPUT_FORMAT, INPUT, self.latest.tick, inputs[0][0], len(inputs)) +
+                       bytes(pending_actions for number, pending_actions in inputs), self.address)
+        self.link.flush()
+        if self.latest.game_over:
+            self.game_over = True
+        return self.state()
+
+    def _end(self):
+        if not self.game_over:
+            self.game_over = True
+            self.events.append('game_over')
+
+    def _apply(self, state):
+        for player, (x, y, score, lives) in zip(self.players, state.players):
+            player.rect.topleft = (x, y)
+            player.score = score
+            player.lives = lives
+
+        while len(self.chairs) < len(state.chairs):
+            chair = pygame.sprite.Sprite()
+            chair.image = assets.get_image('enemy.png', CHAIR_SIZE, RED)
+            chair.rect = chair.image.get_rect()
+            self.chairs.append(chair)
+            self.all_sprites.add(chair)
+        del self.chairs[len(state.chairs):]
+        for chair, (x, y, direction, target) in zip(self.chairs, state.chairs):
+            chair.rect.topleft = (x, y)
+
+        for sprites, pool, positions in ((self.pickups, self.pickup_pool, state.pickups),
+                                         (self.ambulances, self.ambulance_pool, state.ambulances)):
+            for position in [position for position in sprites if position not in positions]:
+                pool.release(sprites.pop(position))
+            for position in positions:
+                if position not in sprites:
+                    sprite = pool.acquire(*position)
+                    sprite.rect.topleft = position
+                    sprites[position] = sprite
+
+    def visible_sprites(self, rect):
+        sprites = [sprite for sprite in list(self.pickups.values()) + list(self.ambulances.values())
+                   if sprite.rect.colliderect(rect)]
+        sprites += [chair for chair in self.chairs if chair.rect.colliderect(rect)]
+        sprites += [player for player in self.players if player.lives > 0 and player.rect.colliderect(rect)]
+        return sprites
+
+    def state(self):
+        player = self.players[getattr(self, 'index', 1)] if self.players else None
+        return {
+            'tick': self.latest.tick if self.players else 0,
+            'score': player.score if player else 0,
+            'lives': player.lives if player else 0,
+            'players': list(self.latest.players) if self.players else [],
+            'events': list(self.events),
+            'game_over': self.game_over,
+        }
+
+    def close(self):
+        if self.link is not None:
+            self.link.latency = 0
+            self.link.send(struct.pack('<B', BYE), self.address)
+            self.link.close()
+            self.link = None
+
+def selftest(args):
+    # Host and client in one process over localhost, each moved by a bot,
+    # with packet loss and latency on both directions. Every snapshot the
+    # client decodes is compared with what the host sent. Returns the
+    # problems found, fails when snapshots are lost beyond the simulated
+    # loss or the client drifts away from the host.
+    import threading
+    from simulation import GameSimulation
+    from balance import RandomPlayer
+
+    simulation = GameSimulation(chair_count=args.chairs, min_medicines=args.pickups, chair_ai=args.chair_ai)
+    simulation.reset(args.seed)
+    latency = round(args.latency * simulation.fps / 1000)
+    host = NetHost(simulation, args.port, args.loss, latency, seed=args.seed)
+    client = NetClient('127.0.0.1', args.port, loss=args.loss, latency=latency, seed=args.seed + 1)
+
+    joining = threading.Thread(target=client.reset)
+    joining.start()
+    while joining.is_alive():
+        host.poll()
+        time.sleep(0.005)
+    joining.join()
+    for player in simulation.players:
+        player.lives = 60000  # Keep both playing for the whole test
+
+    rng = random.Random(args.seed)
+    host_bot = RandomPlayer(rng)
+    client_bot = RandomPlayer(rng)
+    ticks = args.seconds * simulation.fps
+    decoded = mismatches = 0
+    error_total = error_worst = 0
+    start = time.perf_counter()
+    for _ in range(ticks):
+        host.poll()
+        simulation.step(host_bot.actions(simulation), host.next_input())
+        host.send_snapshot()
+        latest = client.latest
+        client.step(client_bot.actions(client))
+        if client.latest is not latest:
+            decoded += 1
+            if client.latest != host.history[client.latest.tick]:
+                mismatches += 1
+        # How far the predicted player is from where the host has it now
+        partner = simulation.players[1].rect
+        error = abs(client.player.rect.x - partner.x) + abs(client.player.rect.y - partner.y)
+        error_total += error
+        error_worst = max(error_worst, error)
+    elapsed = time.perf_counter() - start
+    client_link = client.link
+    host.close()
+    client.close()
+
+    seconds = ticks / simulation.fps
+    print(f"{ticks} ticks in {elapsed:.1f} s, loss {args.loss:.0%}, latency {args.latency} ms each way, "
+          f"{len(simulation.enemies)} chairs")
+    print(f"host -> client  {host.link.bytes_sent / seconds / 1024:6.2f} KB/s  "
+          f"{host.link.bytes_sent / max(1, host.link.packets_sent):5.1f} bytes/snapshot")
+    print(f"client -> host  {client_link.bytes_sent / seconds / 1024:6.2f} KB/s  "
+          f"{client_link.bytes_sent / max(1, client_link.packets_sent):5.1f} bytes/input")
+    print(f"snapshots decoded {decoded} of {ticks}, {mismatches} differ from the host")
+    print(f"prediction error  mean {error_total / ticks:.1f} px, worst {error_worst} px")
+
+    problems = []
+    if mismatches:
+        problems.append(f"{mismatches} snapshots differ from the host")
+    if decoded < ticks * (1 - args.loss) / 2:
+        problems.append(f"only {decoded} of {ticks} snapshots decoded")
+    # The prediction runs ahead of the host by the input latency, and a
+    # lost snapshot or two adds a few ticks more
+    limit = simulation.players[1].speed * (2 * latency + 10)
+    if error_total / ticks > limit:
+        problems.append(f"mean prediction error above {limit} px")
+    for problem in problems:
+        print("FAIL:", problem)
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description='Localhost co-op test with simulated packet loss')
+    parser.add_argument('--seconds', type=int, default=20)
+    parser.add_argument('--loss', type=float, default=0.1, help='Share of packets dropped each way')
+    parser.add_argument('--latency', type=int, default=30, help='One-way delay in milliseconds')
+    parser.add_argument('--chairs', type=int, default=None)
+    parser.add_argument('--pickups', type=int, default=MIN_MEDICINES, help='Medicines kept on the map')
+    parser.add_argument('--chair-ai', default=CHAIR_AI, choices=['graph', 'hunt', 'wander'])
+    parser.add_argument('--port', type=int, default=NET_PORT)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    if selftest(args):
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    import os
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    main()
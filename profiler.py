@@ -0,0 +1,209 @@
+import csv
+import json
+import time
+import pstats
+import cProfile
+from collections import deque
+import pygame
+import text
+
+# Per-frame phase timing for the play loop. While disabled, begin_frame, mark
+# and end_frame are bound to a no-op, so leaving the calls in costs nothing.
+
+HISTORY_FRAMES = 600        # Rolling window used for the percentiles and exports
+OVERLAY_REFRESH_FRAMES = 30  # Recompute the overlay numbers twice a second at 60 FPS
+OVERLAY_COLOR = (0, 255, 0)
+
+def _noop(*args):
+    pass
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+class FrameProfiler:
+    def __init__(self, history=HISTORY_FRAMES):
+        self.frames = deque(maxlen=history)
+        self.frame_index = 0
+        self.phase_order = []
+        self.summary_lines = []
+        self.capture = None
+        self.capture_frames_left = 0
+        self.font_name = None
+        self.set_enabled(False)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        if enabled:
+            self.begin_frame = self._begin_frame
+            self.mark = self._mark
+            self.end_frame = self._end_frame
+            # Switched on mid-frame (F3), the rest of this frame is timed
+            self._begin_frame()
+        else:
+            self.begin_frame = _noop
+            self.mark = _noop
+            self.end_frame = self._end_capture_only
+
+    def toggle(self):
+        self.set_enabled(not self.enabled)
+        if self.enabled:
+            self.frames.clear()
+            self.summary_lines = []
+
+    def _begin_frame(self):
+        self.frame_start = self.last = time.perf_counter()
+        self.spans = []
+
+    def _mark(self, phase):
+        # Time since the previous mark is charged to this phase
+        now = time.perf_counter()
+        self.spans.append((phase, self.last, now - self.last))
+        self.last = now
+
+    def _end_frame(self):
+        total = time.perf_counter() - self.frame_start
+        phases = {}
+        for phase, start, duration in self.spans:
+            phases[phase] = phases.get(phase, 0.0) + duration
+            if phase not in self.phase_order:
+                self.phase_order.append(phase)
+        self.frames.append((self.frame_index, self.frame_start, total, phases, self.spans))
+        self.frame_index += 1
+
+        if self.frame_index % OVERLAY_REFRESH_FRAMES == 0:
+            self.summary_lines = self.summary()
+        self._end_capture_only()
+
+    def _end_capture_only(self):
+        if self.capture is not None:
+            self.capture_frames_left -= 1
+            if self.capture_frames_left <= 0:
+                self.stop_capture()
+
+    def stats(self):
+        # p50/p95/p99 and worst frame in milliseconds, per phase and overall
+        result = {}
+        totals = sorted(frame[2] * 1000 for frame in self.frames)
+        result['frame'] = (percentile(totals, 0.5), percentile(totals, 0.95),
+                           percentile(totals, 0.99), totals[-1] if totals else 0.0)
+        for phase in self.phase_order:
+            values = sorted(frame[3].get(phase, 0.0) * 1000 for frame in self.frames)
+            result[phase] = (percentile(values, 0.5), percentile(values, 0.95),
+                             percentile(values, 0.99), values[-1] if values else 0.0)
+        return result
+
+    def summary(self):
+        lines = [f"{'phase':<9}{'p50':>7}{'p95':>7}{'p99':>7}{'max':>7}"]
+        for phase, (p50, p95, p99, worst) in self.stats().items():
+            lines.append(f"{phase:<9}{p50:7.2f}{p95:7.2f}{p99:7.2f}{worst:7.2f}")
+        return lines
+
+    def draw_overlay(self, screen):
+        # Returns the rects drawn so the dirty-rect path can present them
+        if self.font_name is None:
+            self.font_name = pygame.font.match_font('monospace') or ''
+        rects = []
+        x = screen.get_width() - 320
+        y = 50
+        for line in self.summary_lines:
+            surface = text.render(line, 24, OVERLAY_COLOR, self.font_name or None)
+            rects.append(screen.blit(surface, (x, y)))
+            y += surface.get_height()
+        return rects
+
+    def export_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'total_ms'] + self.phase_order)
+            for index, start, total, phases, spans in self.frames:
+                writer.writerow([index, round(total * 1000, 4)] +
+                                [round(phases.get(phase, 0.0) * 1000, 4) for phase in self.phase_order])
+
+    def export_json(self, path):
+        records = [{'frame': index, 'total_ms': total * 1000,
+                    'phases': {phase: value * 1000 for phase, value in phases.items()}}
+                   for index, start, total, phases, spans in self.frames]
+        with open(path, 'w') as f:
+            json.dump({'stats': self.stats(), 'frames': records}, f, indent=1)
+
+    def export_chrome_trace(self, path):
+        # Load in chrome://tracing or Perfetto
+        events = []
+        for index, start, total, phases, spans in self.frames:
+            events.append({'name': f'frame {index}', 'ph': 'X', 'pid': 0, 'tid': 0,
+                           'ts': start * 1e6, 'dur': total * 1e6})
+            for phase, span_start, duration in spans:
+                events.append({'name': phase, 'ph': 'X', 'pid': 0, 'tid': 1,
+                               'ts': span_start * 1e6, 'dur': duration * 1e6})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def export(self, prefix):
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        paths = [f'{prefix}_frames_{stamp}.csv', f'{prefix}_frames_{stamp}.json',
+                 f'{prefix}_trace_{stamp}.json']
+        self.export_csv(paths[0])
+        self.export_json(paths[1])
+        self.export_chrome_trace(paths[2])
+        return paths
+
+    def start_capture(self, frames, path):
+        # cProfile the next `frames` frames and write the stats to `path`
+        if self.capture is not None:
+            return
+        self.capture = cProfile.Profile()
+        self.capture_path = path
+        self.capture_frames_left = frames
+        self.capture.enable()
+
+    def stop_capture(self):
+        if self.capture is None:
+            return
+        self.capture.disable()
+        self.capture.dump_stats(self.capture_path)
+        pstats.Stats(self.capture).sort_stats('cumulative').print_stats(15)
+        print("Profile written to", self.capture_path)
+        self.capture = None
+
+class StartupTimer:
+    # Wall-clock phases from process start to the first presented frame, for
+    # tracking time-to-first-frame of the frozen builds
+    def __init__(self, start=None):
+        self.start = self.last = start if start is not None else time.perf_counter()
+        self.phases = []
+        self.finished = False
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self.last) * 1000))
+        self.last = now
+
+    def total(self):
+        return (self.last - self.start) * 1000
+
+    def lines(self):
+        lines = [f"{phase:<12}{duration:9.1f} ms" for phase, duration in self.phases]
+        lines.append(f"{'total':<12}{self.total():9.1f} ms")
+        return lines
+
+    def finish(self, destination=None):
+        # destination '1' prints the report, anything else is a file the
+        # report is appended to as one JSON line, so runs can be compared
+        self.finished = True
+        if not destination:
+            return
+        if destination == '1':
+            print("Startup times:")
+            for line in self.lines():
+                print("  " + line)
+            return
+        record = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                  'phases': dict(self.phases), 'total_ms': self.total()}
+        try:
+            with open(destination, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        except OSError as e:
+            print("Error writing startup report:", str(e))
@@ -0,0 +1,219 @@
+import os
+import sys
+import time
+import struct
+import hashlib
+from array import array
+from settings import *
+from map import GAME_MAP, layout_hash
+
+# Deterministic replays. A session is its seed, the simulation settings and
+# the action bitmask of every tick, stored run-length encoded because the
+# keys change far less often than once per tick. The recorder also stores a
+# hash of the game state every check_interval ticks, and the replay runner
+# re-simulates the session headless as fast as possible and compares them.
+# The map rows are stored too, so sessions on edited maps play back as well.
+REPLAY_MAGIC = b'DGRP'
+REPLAY_VERSION = 3
+REPLAY_CHECK_TICKS = 60  # One state hash per second of play
+LAST_REPLAY_PATH = 'last_replay.dgr'
+
+# version, seed, fps, chair count (-1 for the map's own), min medicines,
+# batched chairs, chair AI, layout hash, enemy speed, medicine, ambulance and
+# chair respawn times, check interval, layout bytes, runs, checks
+HEADER_FORMAT = '<HQHiIBB20sddddIIII'
+RUN_FORMAT = '<HB'     # ticks, actions
+CHECK_FORMAT = '<IQ'   # tick, state hash
+CHAIR_AIS = ['wander', 'hunt', 'graph']
+BALANCE_SETTINGS = ['enemy_speed', 'medicine_spawn_time', 'ambulance_spawn_time',
+                    'chair_respawn_time']
+MAX_RUN = 0xFFFF
+
+class ReplayError(Exception):
+    pass
+
+def _rects(sprites):
+    values = array('i')
+    for sprite in sprites:
+        values.extend(sprite.rect)
+    return values.tobytes()
+
+def state_hash(simulation):
+    # 64-bit hash of everything a diverging replay would change
+    player = simulation.player
+    h = hashlib.blake2b(digest_size=8)
+    h.update(struct.pack('<iiiii', simulation.tick, player.score, player.lives,
+                         player.rect.x, player.rect.y))
+    h.update(_rects(simulation.enemies))
+    h.update(_rects(simulation.pickups))
+    h.update(_rects(simulation.ambulances))
+    return struct.unpack('<Q', h.digest())[0]
+
+class Replay:
+    def __init__(self, seed, fps=FPS, chair_count=None, min_medicines=MIN_MEDICINES,
+                 batched_chairs=False, chair_ai=CHAIR_AI, layout_digest=None,
+                 check_interval=REPLAY_CHECK_TICKS, balance=None, layout=None):
+        self.seed = seed
+        self.fps = fps
+        self.chair_count = chair_count
+        self.min_medicines = min_medicines
+        self.batched_chairs = batched_chairs
+        self.chair_ai = chair_ai
+        self.layout = layout or GAME_MAP
+        self.layout_digest = layout_digest or layout_hash(self.layout)
+        self.check_interval = check_interval
+        # enemy_speed, medicine_spawn_time, ambulance_spawn_time, chair_respawn_time
+        self.balance = balance or {'enemy_speed': ENEMY_SPEED,
+                                   'medicine_spawn_time': MEDICINE_SPAWN_TIME,
+                                   'ambulance_spawn_time': AMBULANCE_SPAWN_TIME,
+                                   'chair_respawn_time': CHAIR_RESPAWN_TIME}
+        self.runs = []    # [ticks, actions]
+        self.checks = []  # (tick, state hash)
+
+    @classmethod
+    def from_simulation(cls, simulation, check_interval=REPLAY_CHECK_TICKS):
+        # Call after simulation.reset(), the seed is only known from then on
+        return cls(simulation.seed, simulation.fps, simulation.chair_count,
+                   simulation.min_medicines, simulation.batched_chairs,
+                   simulation.chair_ai, layout_hash(simulation.layout), check_interval,
+                   {name: getattr(simulation, name) for name in BALANCE_SETTINGS},
+                   list(simulation.layout))
+
+    def ticks(self):
+        return sum(run[0] for run in self.runs)
+
+    def add_tick(self, actions):
+        runs = self.runs
+        if runs and runs[-1][1] == actions and runs[-1][0] < MAX_RUN:
+            runs[-1][0] += 1
+        else:
+            runs.append([1, actions])
+
+    def save(self, path):
+        chair_count = -1 if self.chair_count is None else self.chair_count
+        layout = '\n'.join(self.layout).encode('utf-8')
+        parts = [REPLAY_MAGIC,
+                 struct.pack(HEADER_FORMAT, REPLAY_VERSION, self.seed, self.fps, chair_count,
+                             self.min_medicines, int(self.batched_chairs),
+                             CHAIR_AIS.index(self.chair_ai), self.layout_digest,
+                             *[self.balance[name] for name in BALANCE_SETTINGS],
+                             self.check_interval, len(layout), len(self.runs), len(self.checks)),
+                 layout]
+        parts += [struct.pack(RUN_FORMAT, ticks, actions) for ticks, actions in self.runs]
+        parts += [struct.pack(CHECK_FORMAT, tick, value) for tick, value in self.checks]
+        with open(path, 'wb') as f:
+            f.write(b''.join(parts))
+
+def load_replay(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != REPLAY_MAGIC:
+        raise ReplayError(f"{path} is not a replay")
+    try:
+        version, = struct.unpack_from('<H', data, 4)
+        if version != REPLAY_VERSION:
+            raise ReplayError(f"{path} has version {version}, expected {REPLAY_VERSION}")
+        (version, seed, fps, chair_count, min_medicines, batched, chair_ai, digest,
+         enemy_speed, medicine_spawn_time, ambulance_spawn_time, chair_respawn_time,
+         check_interval, layout_size, run_count, check_count) = struct.unpack_from(HEADER_FORMAT, data, 4)
+        balance = dict(zip(BALANCE_SETTINGS, (enemy_speed, medicine_spawn_time,
+                                              ambulance_spawn_time, chair_respawn_time)))
+        offset = 4 + struct.calcsize(HEADER_FORMAT)
+        layout = data[offset:offset + layout_size].decode('utf-8').split('\n')
+        offset += layout_size
+        replay = Replay(seed, fps, None if chair_count < 0 else chair_count, min_medicines,
+                        bool(batched), CHAIR_AIS[chair_ai], digest, check_interval, balance, layout)
+        run_size = struct.calcsize(RUN_FORMAT)
+        replay.runs = [list(struct.unpack_from(RUN_FORMAT, data, offset + i * run_size))
+                       for i in range(run_count)]
+        offset += run_count * run_size
+        check_size = struct.calcsize(CHECK_FORMAT)
+        replay.checks = [struct.unpack_from(CHECK_FORMAT, data, offset + i * check_size)
+                         for i in range(check_count)]
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ReplayError(f"{path} is damaged: {e}")
+    return replay
+
+class ReplayRecorder:
+    # Wraps simulation.step() in the play loop, call after simulation.reset()
+    def __init__(self, simulation, check_interval=REPLAY_CHECK_TICKS):
+        self.simulation = simulation
+        self.replay = Replay.from_simulation(simulation, check_interval)
+        self.valid = True
+
+    def step(self, actions, partner_actions=0):
+        simulation = self.simulation
+        tick = simulation.tick
+        state = simulation.step(actions, partner_actions)
+        if simulation.tick != tick:
+            self.replay.add_tick(actions)
+            if simulation.tick % self.replay.check_interval == 0 or state['game_over']:
+                self.replay.checks.append((simulation.tick, state_hash(simulation)))
+        return state
+
+    def invalidate(self):
+        # The map was edited mid-session or a partner played along over the
+        # network, the replay could not be played back
+        self.valid = False
+
+    def save(self, path=LAST_REPLAY_PATH):
+        if not self.valid:
+            return
+        try:
+            self.replay.save(path)
+        except OSError as e:
+            print("Error saving replay:", str(e))
+
+def run_replay(replay, layout=None, profiler=None):
+    # Re-simulate a replay headless, on the map it was recorded on unless
+    # another layout is given. Returns (ticks, seconds, mismatches),
+    # mismatches being the ticks whose state hash differed
+    from simulation import GameSimulation
+
+    layout = replay.layout if layout is None else layout
+    if layout_hash(layout) != replay.layout_digest:
+        raise ReplayError("Replay was recorded on a different map")
+    simulation = GameSimulation(fps=replay.fps, chair_count=replay.chair_count,
+                                batched_chairs=replay.batched_chairs,
+                                min_medicines=replay.min_medicines, layout=layout,
+                                profiler=profiler, chair_ai=replay.chair_ai, **replay.balance)
+    simulation.reset(replay.seed)
+
+    checks = iter(replay.checks)
+    next_check = next(checks, None)
+    mismatches = []
+    step = simulation.step
+    start = time.perf_counter()
+    for ticks, actions in replay.runs:
+        for _ in range(ticks):
+            step(actions)
+            while next_check is not None and next_check[0] <= simulation.tick:
+                if next_check[0] == simulation.tick and state_hash(simulation) != next_check[1]:
+                    mismatches.append(next_check[0])
+                next_check = next(checks, None)
+    elapsed = time.perf_counter() - start
+    return simulation.tick, elapsed, mismatches
+
+if __name__ == '__main__':
+    # python replay.py <file.dgr>...: re-run replays headless, exit 1 on a desync
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    if len(sys.argv) < 2:
+        print("usage: python replay.py <file.dgr>...")
+        sys.exit(1)
+
+    failed = False
+    for path in sys.argv[1:]:
+        try:
+            ticks, elapsed, mismatches = run_replay(load_replay(path))
+        except (OSError, ReplayError) as e:
+            print(f"{path}: {e}")
+            failed = True
+            continue
+        rate = ticks / elapsed if elapsed else 0
+        if mismatches:
+            failed = True
+            print(f"{path}: DESYNC at tick {mismatches[0]} ({len(mismatches)} checks differ)")
+        else:
+            print(f"{path}: {ticks} ticks OK, {rate:.0f} ticks/s")
+    sys.exit(1 if failed else 0)
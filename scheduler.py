@@ -0,0 +1,38 @@
+import heapq
+
+# Timers on the game clock. Everything that happens "n milliseconds from now"
+# (chair respawns, medicine waves, ambulances) registers the tick it is due
+# on, and each step only pops the timers that are due instead of checking
+# every entity. Time is simulation ticks, so timers stop whenever the
+# simulation does, in the menu or while a level is being edited.
+#
+# Timers due on the same tick run in `order`, then in the order they were
+# scheduled. A reset clears them all.
+
+class Scheduler:
+    def __init__(self):
+        self.heap = []
+        self.count = 0  # Scheduling order, breaks ties between equal orders
+
+    def __len__(self):
+        return len(self.heap)
+
+    def schedule(self, tick, action, *args, order=()):
+        timer = [tick, order, self.count, action, args]
+        self.count += 1
+        heapq.heappush(self.heap, timer)
+        return timer
+
+    def run_due(self, tick):
+        # Runs every timer due on or before tick, including ones the actions
+        # schedule for tick itself. Returns how many ran.
+        heap = self.heap
+        ran = 0
+        while heap and heap[0][0] <= tick:
+            timer = heapq.heappop(heap)
+            timer[3](*timer[4])
+            ran += 1
+        return ran
+
+    def clear(self):
+        self.heap.clear()
@@ -0,0 +1,54 @@
+# Constants
+WINDOW_WIDTH = 1440
+WINDOW_HEIGHT = 900
+CELL_SIZE = 30
+FPS = 60
+
+# Game settings
+MEDICINE_SPAWN_TIME = 3000   # Spawn medicine every 3 seconds
+AMBULANCE_SPAWN_TIME = 30000  # Spawn ambulance every 30 seconds
+CHAIR_RESPAWN_TIME = 60000   # Chairs respawn every 60 seconds
+MIN_MEDICINES = 15           # More medicines on the map
+MIN_AMBULANCES = 2
+ENEMY_SPEED = 3.5           # Increased chair speed
+CHAIR_COUNT = None          # None spawns one chair per 'E' in the map
+BATCHED_CHAIRS = False      # Move chairs with the NumPy swarm engine (chair swarm levels)
+CHAIR_AI = 'graph'          # Chairs roam the corridor graph, 'hunt' chases Dagyiman along a
+                            # shared flow field, 'wander' bounces them off walls
+
+# Audio
+AUDIO_FREQUENCY = 44100
+AUDIO_BUFFER = 512          # Mixer buffer in samples, lower fires effects sooner but may crackle
+EFFECT_CHANNELS = 8         # Channels shared by all sound effects
+
+# Display
+RENDER_SCALES = [1.0, 0.75, 0.5]  # Internal resolution steps, the GPU stretches them to the window
+FULLSCREEN = False
+VSYNC = False               # Needs a hardware renderer
+AUTO_QUALITY = True         # Step the render scale down while frames run over budget
+
+# Rendering
+CHUNK_SIZE = 512            # Side of the pre-rendered map chunks in pixels
+MAP_CHUNK_CELLS = 32        # Side of the on-disk map chunks in cells
+MAX_RESIDENT_CHUNKS = 64    # Map chunks and rendered chunks kept in memory at once
+ACTIVE_AREA_CHUNKS = 3      # Side of the area around the player a streamed level simulates, in map chunks
+
+# Development
+HOT_RELOAD_INTERVAL = 250   # How often the watched map source is checked, in milliseconds
+
+# Network
+NET_PORT = 47800            # UDP port the co-op host listens on
+NET_TIMEOUT = 5000          # Milliseconds without a packet before the other side is gone
+SNAPSHOT_HISTORY = 64       # Ticks of snapshots kept as delta baselines
+SNAPSHOT_BUDGET = 1200      # Bytes per snapshot, under the usual 1500 byte MTU
+INPUT_REDUNDANCY = 8        # Recent inputs repeated in every input packet
+MAX_INPUT_BACKLOG = 3       # Partner inputs queued on the host before the oldest are skipped
+
+# Colors
+BLACK = (0, 0, 0)
+WHITE = (255, 255, 255)
+YELLOW = (255, 255, 0)
+RED = (255, 0, 0)
+BLUE = (0, 0, 255)
+MENU_HIGHLIGHT = (128, 128, 255)
+GRAY = (128, 128, 128)
@@ -1,6 +1,15 @@
 import sys
-from cx_Freeze import setup, Executable
+from cx_Freeze import setup, Executable, build_exe
 import os
+from assetpack import bake
+
+class BakeAndBuildExe(build_exe):
+    # Bake the PNGs into one memory-mapped pack before freezing, the game
+    # reads its images from there instead of decoding and scaling every PNG
+    # at startup. Only building does this, not every setup.py command.
+    def run(self):
+        bake("assets", "assets.dgp")
+        super().run()
 
 # Dependencies are automatically detected, but it might need fine tuning.
 build_exe_options = {
@@ -8,6 +17,7 @@ build_exe_options = {
     "excludes": [],
     "include_files": [
         ("assets", "assets"),  # Copy the entire assets folder
+        ("assets.dgp", "assets.dgp"),
     ]
 }
 
@@ -21,6 +31,7 @@ setup(
     version="1.0",
     description="Dagyiman Game",
     options={"build_exe": build_exe_options},
+    cmdclass={"build_exe": BakeAndBuildExe},
     executables=[
         Executable(
             "dagyiman.py",
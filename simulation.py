@@ -0,0 +1,605 @@
+import pygame
+import random
+from settings import *
+from map import GAME_MAP, Wall, compile_map, load_map, load_wall_grid, merge_wall_rects, partner_start
+from mapstore import ChunkedMap
+from spawning import SpawnIndex, AreaSpawnIndex
+from entities import Player, Enemy, Pickup, Ambulance, EntityPool, find_empty_position
+from swarm import ChairSwarm
+from spatial import SpatialHash
+from navigation import FlowField, NavGraph
+from profiler import FrameProfiler
+from scheduler import Scheduler
+
+# Headless game core. Nothing in here touches pygame.display, the keyboard or
+# the mixer, and time only moves when step() is called, so bots and tests can
+# run it under the SDL dummy drivers as fast as the CPU allows.
+
+CHAIR_SIZE = (CELL_SIZE*2-4, CELL_SIZE*2-4)
+PICKUP_SIZE = (10, 10)
+AMBULANCE_SIZE = (CELL_SIZE-4, CELL_SIZE-4)
+
+# Timers due on the same tick run chairs first (in chair order), then the
+# medicine wave, then the ambulance
+CHAIR_TIMERS = 0
+MEDICINE_TIMER = (1,)
+AMBULANCE_TIMER = (2,)
+
+class GameSimulation:
+    # chair_count overrides the number of 'E' starts in the map, batched_chairs
+    # moves all chairs through the NumPy ChairSwarm instead of Enemy.update and
+    # chair_ai 'hunt' makes per-sprite chairs follow a flow field to the player,
+    # 'graph' moves them along the corridor graph and 'wander' bounces them
+    # off walls.
+    # The balance settings default to settings.py and can be swept per game.
+    # add_partner() brings in a co-op partner, moved by the second argument of
+    # step(); a player out of lives sits out and the game ends once all of
+    # them are.
+    # level_path plays a chunked level (mapstore.py) instead of layout: map
+    # chunks are paged in around the player and chairs, and only the active
+    # area around the player is spawned into and simulated.
+    def __init__(self, fps=FPS, chair_count=None, batched_chairs=False,
+                 min_medicines=MIN_MEDICINES, layout=GAME_MAP, profiler=None,
+                 chair_ai=CHAIR_AI, enemy_speed=ENEMY_SPEED,
+                 medicine_spawn_time=MEDICINE_SPAWN_TIME,
+                 ambulance_spawn_time=AMBULANCE_SPAWN_TIME,
+                 chair_respawn_time=CHAIR_RESPAWN_TIME, level_path=None):
+        if level_path is not None:
+            # The swarm, flow field and corridor graph are whole-map tables
+            layout = None
+            batched_chairs = False
+            chair_ai = 'wander'
+        self.fps = fps
+        self.dt = 1000 / fps  # Fixed timestep in milliseconds
+        self.profiler = profiler or FrameProfiler()
+        self.chair_count = chair_count
+        self.min_medicines = min_medicines
+        self.enemy_speed = enemy_speed
+        self.medicine_spawn_time = medicine_spawn_time
+        self.ambulance_spawn_time = ambulance_spawn_time
+        self.chair_respawn_time = chair_respawn_time
+        self.layout = layout
+        self.level_path = level_path
+        self.level = None
+        self.active_area = None
+        self.batched_chairs = batched_chairs
+        self.chair_ai = chair_ai
+        self.swarm = None
+        self.flow_field = None
+        self.nav_graph = None
+        # Kept across resets, a new game reuses the last game's sprites
+        self.pickup_pool = EntityPool(Pickup)
+        self.ambulance_pool = EntityPool(Ambulance)
+        self.pickups = pygame.sprite.Group()
+        self.ambulances = pygame.sprite.Group()
+        self.rng = random.Random()
+        self.scheduler = Scheduler()
+        self.medicine_timer = None
+        self.ambulance_timer = None
+        self.due_ticks = {}  # (start, delay) -> due tick, for the current tick only
+        self.due_ticks_tick = None
+        self.seed = None
+        self.time = 0
+        self.tick = 0
+        self.events = []
+        self.game_over = False
+
+    def reset(self, seed=None, progress=None):
+        # progress, if given, is called with the fraction of the reset done
+        report = progress or (lambda fraction: None)
+        # Always run from a known seed so the session can be replayed
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.time = 0
+        self.tick = 0
+        self.events = []
+        self.game_over = False
+        self.scheduler.clear()
+
+        if self.level_path is not None:
+            player_start, enemy_starts = self._open_level()
+        else:
+            self.walls, player_start, enemy_starts, medicine_positions, ambulance_positions = load_map(CELL_SIZE, self.layout)
+            self.wall_grid = load_wall_grid(CELL_SIZE, self.layout)
+            # Maps bigger than the window spawn over their full extent
+            self.width = max(WINDOW_WIDTH, self.wall_grid.cols * CELL_SIZE)
+            self.height = max(WINDOW_HEIGHT, self.wall_grid.rows * CELL_SIZE)
+            self.spawn_index = SpawnIndex(self.wall_grid, self.width, self.height, CELL_SIZE*2,
+                                          sizes=[PICKUP_SIZE, AMBULANCE_SIZE, CHAIR_SIZE])
+        report(0.3)
+        # Broad-phase for the player's collisions with pickups, ambulances and chairs
+        self.entity_hash = SpatialHash(CELL_SIZE*2)
+
+        for sprite in self.pickups.sprites():
+            sprite.kill()
+            self.pickup_pool.release(sprite)
+        for sprite in self.ambulances.sprites():
+            sprite.kill()
+            self.ambulance_pool.release(sprite)
+        # Enough sprites for a full map, the frame loop never has to allocate
+        self.pickup_pool.reserve(self.min_medicines)
+        self.ambulance_pool.reserve(MIN_AMBULANCES)
+
+        # Sprite Groups (walls are drawn from a background, not from all_sprites)
+        self.all_sprites = pygame.sprite.RenderUpdates()
+        self.enemies = pygame.sprite.Group()
+        self.pickups = pygame.sprite.Group()
+        self.ambulances = pygame.sprite.Group()
+
+        # Create player
+        self.player = Player(player_start[0], player_start[1])
+        self.players = [self.player]
+        self.all_sprites.add(self.player)
+        self.spawn_index.add(self.player)
+
+        # Swarm chairs are not tracked by the spawn index or the spatial hash,
+        # with thousands of them the bookkeeping would cost more than the movement
+        if self.batched_chairs:
+            self.swarm = ChairSwarm(self.wall_grid, CHAIR_SIZE, self.enemy_speed,
+                                    seed=self.rng.getrandbits(64),
+                                    respawn_time=self.chair_respawn_time)
+        else:
+            self.swarm = None
+        self._build_navigation()
+
+        # Create enemies with proper spawning, avoiding player area
+        chair_count = len(enemy_starts) if self.chair_count is None else self.chair_count
+        for _ in range(chair_count):
+            enemy_pos = find_empty_position(self.spawn_index, CHAIR_SIZE,
+                                            player_pos=player_start, rng=self.rng,
+                                            allow_occupied=self.swarm is not None)
+            if enemy_pos:
+                enemy = Enemy(enemy_pos[0], enemy_pos[1], self.time, self.rng,
+                              self.enemy_speed, self.chair_respawn_time)
+                order = (CHAIR_TIMERS, len(self.enemies))
+                self._add(enemy, self.enemies, tracked=self.swarm is None)
+                due = self._due_tick(self.time, self.chair_respawn_time)
+                if self.swarm is not None:
+                    self.swarm.add(enemy, self.time)
+                    self.scheduler.schedule(due, self._respawn_swarm_chair, len(self.swarm) - 1, order=order)
+                else:
+                    self.scheduler.schedule(due, self._respawn_chair, enemy, order, order=order)
+
+        report(0.7)
+
+        # Create initial pickups and ambulances
+        for _ in range(self.min_medicines):
+            self._spawn_pickup()
+        for _ in range(MIN_AMBULANCES):
+            self._spawn_ambulance()
+
+        # Initialize spawn timers
+        self.last_medicine_spawn = self.time
+        self.last_ambulance_spawn = self.time
+        self.medicine_timer = None
+        self.ambulance_timer = None
+        self._arm_medicine()
+        self._arm_ambulance()
+        report(1.0)
+        return self.state()
+
+    def _open_level(self):
+        # The chunked map stands in for both the wall sprites (ChunkedBackground
+        # pages its walls in) and the wall grid
+        if self.level is not None:
+            self.level.close()
+        self.level = ChunkedMap(self.level_path)
+        self.walls = self.wall_grid = self.level
+        self.width = max(WINDOW_WIDTH, self.level.cols * CELL_SIZE)
+        self.height = max(WINDOW_HEIGHT, self.level.rows * CELL_SIZE)
+        player_start = (self.level.player_start[0] * CELL_SIZE, self.level.player_start[1] * CELL_SIZE)
+        self.active_area = self._area_around(player_start)
+        # One chair per 'E' in the starting area, not per 'E' in the level
+        enemy_starts = [(col * CELL_SIZE, row * CELL_SIZE) for col, row in self.level.enemy_starts
+                        if self.active_area.collidepoint(col * CELL_SIZE, row * CELL_SIZE)]
+        self.spawn_index = AreaSpawnIndex(self.level, self.active_area, CELL_SIZE*2)
+        return player_start, enemy_starts
+
+    def _area_around(self, position):
+        # ACTIVE_AREA_CHUNKS map chunks square, centred on the chunk at position
+        span = self.level.chunk_cells * CELL_SIZE
+        offset = ACTIVE_AREA_CHUNKS // 2
+        return pygame.Rect((position[0] // span - offset) * span, (position[1] // span - offset) * span,
+                           ACTIVE_AREA_CHUNKS * span, ACTIVE_AREA_CHUNKS * span)
+
+    def _follow_player(self):
+        # Streamed levels: once the player enters another chunk the active area
+        # moves along. Pickups and ambulances left outside it are dropped and
+        # the spawn waves refill the new area, chairs outside stand still
+        # until their respawn brings them back.
+        area = self._area_around(self.player.rect.center)
+        if area == self.active_area:
+            return
+        self.active_area = area
+        self.spawn_index.set_area(area)
+        for sprite in [sprite for sprite in self.pickups if not area.colliderect(sprite.rect)]:
+            self._remove(sprite, self.pickup_pool)
+        for sprite in [sprite for sprite in self.ambulances if not area.colliderect(sprite.rect)]:
+            self._remove(sprite, self.ambulance_pool)
+        self._arm_medicine()
+        self._arm_ambulance()
+
+    def _build_navigation(self):
+        if self.chair_ai == 'hunt' and self.swarm is None:
+            self.flow_field = FlowField(self.wall_grid, CHAIR_SIZE)
+        else:
+            self.flow_field = None
+        if self.chair_ai == 'graph' and self.swarm is None:
+            self.nav_graph = NavGraph(self.wall_grid, CHAIR_SIZE, self.width, self.height)
+        else:
+            self.nav_graph = None
+
+    def apply_layout(self, layout):
+        # Map hot reload: swap in an edited layout without restarting the game.
+        # Only the wall tiles that changed are patched into the wall grid, the
+        # merged wall sprites and the spawn index, then whatever a new wall
+        # landed on is moved out. Returns the (removed, added) wall sprites for
+        # the render caches, or None when the map changed size and everything
+        # derived from it was rebuilt. Raises MapError for a broken layout.
+        compiled = compile_map(layout, merge_walls=False)
+        self.layout = layout
+        self.player.original_pos = (compiled.player_start[0] * CELL_SIZE,
+                                    compiled.player_start[1] * CELL_SIZE)
+        if len(self.players) > 1:
+            self.players[1].original_pos = partner_start(CELL_SIZE, layout)
+        grid = self.wall_grid
+        if (compiled.cols, compiled.rows) != (grid.cols, grid.rows):
+            self._rebuild_map()
+            return None
+
+        cells = compiled.wall_cells()
+        changed = [index for index, (old, new) in enumerate(zip(grid.cells, cells)) if old != new]
+        if not changed:
+            return [], []
+        for index in changed:
+            grid.cells[index] = cells[index]
+
+        # Walls over the edited cells are merged again, together with every
+        # wall cell those sprites covered
+        cs = CELL_SIZE
+        cols = grid.cols
+        left = min(index % cols for index in changed)
+        right = max(index % cols for index in changed)
+        top = changed[0] // cols
+        bottom = changed[-1] // cols
+        area = pygame.Rect(left * cs, top * cs, (right - left + 1) * cs, (bottom - top + 1) * cs)
+        removed = [wall for wall in self.walls if wall.rect.colliderect(area)]
+        region = area.unionall([wall.rect for wall in removed]) if removed else area
+        region_left, region_top = region.x // cs, region.y // cs
+        region_cols, region_rows = region.width // cs, region.height // cs
+        mask = bytearray(region_cols * region_rows)
+        for rect in [area] + [wall.rect for wall in removed]:
+            for row in range(rect.top // cs, rect.bottom // cs):
+                start = row * cols
+                offset = (row - region_top) * region_cols - region_left
+                for col in range(rect.left // cs, rect.right // cs):
+                    mask[offset + col] = grid.cells[start + col]
+        added = [Wall((region_left + col) * cs, (region_top + row) * cs, cs, width, height)
+                 for col, row, width, height in merge_wall_rects(mask, region_cols, region_rows)]
+        self.walls.remove(*removed)
+        self.walls.add(*added)
+
+        self.spawn_index.update_walls(area.x, area.y, area.width, area.height)
+        if self.swarm is not None:
+            self.swarm.set_walls(grid)
+        self._build_navigation()
+        self._relocate_stuck()
+        return removed, added
+
+    def _rebuild_map(self):
+        # The map changed size, rebuild the walls and every index over them
+        # and file the live sprites again
+        self.walls = load_map(CELL_SIZE, self.layout)[0]
+        self.wall_grid = load_wall_grid(CELL_SIZE, self.layout)
+        self.width = max(WINDOW_WIDTH, self.wall_grid.cols * CELL_SIZE)
+        self.height = max(WINDOW_HEIGHT, self.wall_grid.rows * CELL_SIZE)
+        self.spawn_index = SpawnIndex(self.wall_grid, self.width, self.height, CELL_SIZE*2,
+                                      sizes=[PICKUP_SIZE, AMBULANCE_SIZE, CHAIR_SIZE])
+        self.entity_hash = SpatialHash(CELL_SIZE*2)
+        for player in self.active_players():
+            self.spawn_index.add(player)
+        tracked = list(self.pickups) + list(self.ambulances)
+        if self.swarm is None:
+            tracked += list(self.enemies)
+        for sprite in tracked:
+            self.spawn_index.add(sprite)
+            self.entity_hash.insert(sprite)
+        if self.swarm is not None:
+            self.swarm.set_walls(self.wall_grid)
+        self._build_navigation()
+        self._relocate_stuck()
+
+    def _relocate_stuck(self):
+        # Move everything a wall was edited onto, or that the map shrank away from
+        world = pygame.Rect(0, 0, self.width, self.height)
+
+        def stuck(rect):
+            return self.wall_grid.collides(rect) or not world.contains(rect)
+
+        for pickup in [sprite for sprite in self.pickups if stuck(sprite.rect)]:
+            self._remove(pickup, self.pickup_pool)
+            self._spawn_pickup()
+        for ambulance in [sprite for sprite in self.ambulances if stuck(sprite.rect)]:
+            self._remove(ambulance, self.ambulance_pool)
+            self._spawn_ambulance()
+
+        player = self.player
+        player_pos = (player.rect.x, player.rect.y)
+        if self.swarm is not None:
+            for index in self.swarm.inside_walls().tolist():
+                enemy_pos = find_empty_position(self.spawn_index, CHAIR_SIZE, player_pos,
+                                                self.rng, allow_occupied=True)
+                if enemy_pos:
+                    self.swarm.place(index, enemy_pos[0], enemy_pos[1], self.swarm.spawn_time[index])
+        else:
+            for enemy in self.enemies:
+                # Targets were picked on the old walls and may run into a new
+                # one, every chair picks its next one on the new navigation
+                enemy.target = None
+                if stuck(enemy.rect):
+                    enemy_pos = find_empty_position(self.spawn_index, CHAIR_SIZE, player_pos, self.rng)
+                    if enemy_pos:
+                        enemy.rect.topleft = enemy_pos
+                        self.spawn_index.move(enemy)
+                        self.entity_hash.move(enemy)
+
+        for player in self.active_players():
+            if stuck(player.rect):
+                start = pygame.Rect(player.original_pos, player.rect.size)
+                if stuck(start):
+                    start.topleft = find_empty_position(self.spawn_index, player.rect.size,
+                                                        rng=self.rng) or start.topleft
+                player.rect.topleft = start.topleft
+                self.spawn_index.move(player)
+        self._arm_medicine()
+        self._arm_ambulance()
+
+    def _add(self, sprite, *groups, tracked=True):
+        self.all_sprites.add(sprite)
+        if tracked:
+            self.spawn_index.add(sprite)
+            self.entity_hash.insert(sprite)
+        for group in groups:
+            group.add(sprite)
+
+    def _remove(self, sprite, pool=None):
+        sprite.kill()
+        self.spawn_index.remove(sprite)
+        self.entity_hash.remove(sprite)
+        if pool is not None:
+            pool.release(sprite)
+
+    def _spawn_pickup(self):
+        pickup_pos = find_empty_position(self.spawn_index, PICKUP_SIZE, rng=self.rng)
+        if pickup_pos:
+            self._add(self.pickup_pool.acquire(pickup_pos[0], pickup_pos[1]), self.pickups)
+        return pickup_pos
+
+    def _spawn_ambulance(self):
+        ambulance_pos = find_empty_position(self.spawn_index, AMBULANCE_SIZE, rng=self.rng)
+        if ambulance_pos:
+            self._add(self.ambulance_pool.acquire(ambulance_pos[0], ambulance_pos[1]), self.ambulances)
+        return ambulance_pos
+
+    def add_partner(self):
+        # The co-op partner joins the running game at the 'P' cell farthest
+        # from the first player's start
+        if len(self.players) > 1:
+            return self.players[1]
+        partner = Player(*partner_start(CELL_SIZE, self.layout))
+        self.players.append(partner)
+        self.all_sprites.add(partner)
+        self.spawn_index.add(partner)
+        return partner
+
+    def remove_partner(self):
+        # The partner left, the game ends if the first player was already out
+        if len(self.players) < 2:
+            return
+        partner = self.players.pop()
+        partner.kill()
+        self.spawn_index.remove(partner)
+        if not self.active_players() and not self.game_over:
+            self.game_over = True
+            self.events.append('game_over')
+
+    def active_players(self):
+        return [player for player in self.players if player.lives > 0]
+
+    def step(self, actions=0, partner_actions=0):
+        self.events = []
+        if self.game_over:
+            return self.state()
+
+        self.tick += 1
+        self.time += self.dt
+        player = self.player
+        mark = self.profiler.mark
+
+        # Chair respawns, medicine waves and ambulances that are due this tick
+        self.scheduler.run_due(self.tick)
+        mark('spawn')
+
+        # Update, a knocked out co-op player stays where it fell
+        for each, player_actions in zip(self.players, (actions, partner_actions)):
+            if each.lives > 0:
+                each.update(self.wall_grid, player_actions)
+                self.spawn_index.move(each)
+        if self.active_area is not None:
+            self._follow_player()
+            area = self.active_area
+            for enemy in self.enemies:
+                if area.colliderect(enemy.rect):
+                    enemy.update(self.wall_grid)
+                    self.spawn_index.move(enemy)
+                    self.entity_hash.move(enemy)
+        elif self.swarm is not None:
+            self.swarm.update()
+            self.swarm.sync_sprites()
+        elif self.flow_field is not None:
+            # Rebuilt only when the player's centre moves into a new cell
+            self.flow_field.update(player.rect.centerx // CELL_SIZE, player.rect.centery // CELL_SIZE)
+            for enemy in self.enemies:
+                enemy.chase(self.flow_field, self.wall_grid)
+                self.spawn_index.move(enemy)
+                self.entity_hash.move(enemy)
+        elif self.nav_graph is not None:
+            for enemy in self.enemies:
+                enemy.patrol(self.nav_graph, self.wall_grid)
+                self.spawn_index.move(enemy)
+                self.entity_hash.move(enemy)
+        else:
+            for enemy in self.enemies:
+                enemy.update(self.wall_grid)
+                self.spawn_index.move(enemy)
+                self.entity_hash.move(enemy)
+
+        mark('update')
+
+        for player in self.active_players():
+            self._collide(player)
+        mark('collide')
+
+        return self.state()
+
+    def _collide(self, player):
+        # Collision detection, only against entities in the buckets around the player
+        nearby = self.entity_hash.query(player.rect)
+        pickup_collisions = [sprite for sprite in nearby if sprite in self.pickups]
+        for pickup in pickup_collisions:
+            self._remove(pickup, self.pickup_pool)
+            player.score += 10
+            self.events.append('pickup')
+        if pickup_collisions:
+            self._arm_medicine()
+
+        ambulance_collisions = [sprite for sprite in nearby if sprite in self.ambulances]
+        for ambulance in ambulance_collisions:
+            self._remove(ambulance, self.ambulance_pool)
+            player.lives += 1
+            self.events.append('ambulance')
+        if ambulance_collisions:
+            self._arm_ambulance()
+
+        if self.swarm is not None:
+            enemy_collisions = self.swarm.colliding(player.rect)
+        else:
+            enemy_collisions = [sprite for sprite in nearby if sprite in self.enemies]
+        if enemy_collisions:
+            player.lives -= 1
+            self.events.append('hit')
+            if player.lives > 0:
+                player.reset_position()
+                self.spawn_index.move(player)
+            elif self.active_players():
+                # Co-op partner out of lives, the other one plays on
+                player.kill()
+                self.spawn_index.remove(player)
+            else:
+                self.game_over = True
+                self.events.append('game_over')
+
+    def _due_tick(self, start_time, delay):
+        # First tick whose clock is at least delay past start_time. The clock
+        # is stepped exactly like step() advances it, so timers fire on the
+        # same tick the per-frame `time - start >= delay` checks did. Chairs
+        # respawning together share the answer.
+        if self.due_ticks_tick != self.tick:
+            self.due_ticks.clear()
+            self.due_ticks_tick = self.tick
+        key = (start_time, delay)
+        due = self.due_ticks.get(key)
+        if due is None:
+            due = self.tick
+            time = self.time
+            while time - start_time < delay:
+                due += 1
+                time += self.dt
+            self.due_ticks[key] = due
+        return due
+
+    def _respawn_chair(self, enemy, order):
+        player_pos = (self.player.rect.x, self.player.rect.y)
+        if enemy.respawn(self.spawn_index, self.time, player_pos=player_pos):
+            self.entity_hash.move(enemy)
+            tick = self._due_tick(self.time, enemy.respawn_time)
+        else:
+            tick = self.tick + 1  # No room, try again next tick
+        self.scheduler.schedule(tick, self._respawn_chair, enemy, order, order=order)
+
+    def _respawn_swarm_chair(self, index):
+        player_pos = (self.player.rect.x, self.player.rect.y)
+        enemy_pos = find_empty_position(self.spawn_index, CHAIR_SIZE, player_pos,
+                                        self.rng, allow_occupied=True)
+        if enemy_pos:
+            self.swarm.place(index, enemy_pos[0], enemy_pos[1], self.time)
+            tick = self._due_tick(self.time, self.chair_respawn_time)
+        else:
+            tick = self.tick + 1
+        self.scheduler.schedule(tick, self._respawn_swarm_chair, index, order=(CHAIR_TIMERS, index))
+
+    def _arm_medicine(self):
+        # The wave timer only runs while pickups are missing, it is armed
+        # again when one is collected
+        if self.medicine_timer is None and len(self.pickups) < self.min_medicines:
+            self.medicine_timer = self.scheduler.schedule(
+                self._due_tick(self.last_medicine_spawn, self.medicine_spawn_time),
+                self._medicine_wave, order=MEDICINE_TIMER)
+
+    def _medicine_wave(self):
+        self.medicine_timer = None
+        if len(self.pickups) >= self.min_medicines:
+            return
+        # Try to spawn up to 3 medicines at once to reduce spawn frequency
+        spawn_count = min(self.min_medicines - len(self.pickups), 3)
+        for _ in range(spawn_count):
+            self._spawn_pickup()
+        self.last_medicine_spawn = self.time
+        self._arm_medicine()
+
+    def _arm_ambulance(self):
+        if self.ambulance_timer is None and len(self.ambulances) < MIN_AMBULANCES:
+            self.ambulance_timer = self.scheduler.schedule(
+                self._due_tick(self.last_ambulance_spawn, self.ambulance_spawn_time),
+                self._ambulance_due, order=AMBULANCE_TIMER)
+
+    def _ambulance_due(self):
+        self.ambulance_timer = None
+        if len(self.ambulances) >= MIN_AMBULANCES:
+            return
+        if self._spawn_ambulance():
+            self.last_ambulance_spawn = self.time
+            self._arm_ambulance()
+        else:
+            self.ambulance_timer = self.scheduler.schedule(self.tick + 1, self._ambulance_due,
+                                                           order=AMBULANCE_TIMER)
+
+    def visible_sprites(self, rect):
+        # Sprites overlapping rect in drawing order: pickups and ambulances,
+        # then chairs, then the player on top
+        nearby = self.entity_hash.query(rect)
+        sprites = [sprite for sprite in nearby if sprite not in self.enemies]
+        if self.swarm is not None:
+            sprites += self.swarm.colliding(rect)
+        else:
+            sprites += [sprite for sprite in nearby if sprite in self.enemies]
+        sprites += [player for player in self.players
+                    if player.lives > 0 and player.rect.colliderect(rect)]
+        return sprites
+
+    def state(self):
+        return {
+            'tick': self.tick,
+            'time': self.time,
+            'score': self.player.score,
+            'lives': self.player.lives,
+            'player': (self.player.rect.x, self.player.rect.y),
+            'players': [(p.rect.x, p.rect.y, p.score, p.lives) for p in self.players],
+            'enemies': len(self.enemies),
+            'pickups': len(self.pickups),
+            'ambulances': len(self.ambulances),
+            'events': list(self.events),
+            'game_over': self.game_over,
+        }
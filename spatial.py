@@ -0,0 +1,72 @@
+# Uniform spatial hash for moving entities. Every sprite is filed under the
+# buckets its rect overlaps and is refiled only when that set changes, so a
+# query only looks at the sprites in the buckets around the query rect.
+
+class SpatialHash:
+    def __init__(self, bucket_size):
+        self.bucket_size = bucket_size
+        self.buckets = {}
+        self.keys = {}
+        self.bounds = {}  # Bucket range per sprite, compared before refiling
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, sprite):
+        return sprite in self.keys
+
+    def _bounds_for(self, rect):
+        size = self.bucket_size
+        return (rect.left // size, (rect.right - 1) // size,
+                rect.top // size, (rect.bottom - 1) // size)
+
+    def _keys_in(self, bounds):
+        left, right, top, bottom = bounds
+        return tuple((bx, by)
+                     for by in range(top, bottom + 1)
+                     for bx in range(left, right + 1))
+
+    def _keys_for(self, rect):
+        return self._keys_in(self._bounds_for(rect))
+
+    def insert(self, sprite):
+        bounds = self._bounds_for(sprite.rect)
+        keys = self._keys_in(bounds)
+        self.bounds[sprite] = bounds
+        self.keys[sprite] = keys
+        for key in keys:
+            self.buckets.setdefault(key, []).append(sprite)
+
+    def remove(self, sprite):
+        keys = self.keys.pop(sprite, None)
+        if keys is None:
+            return
+        del self.bounds[sprite]
+        for key in keys:
+            bucket = self.buckets[key]
+            bucket.remove(sprite)
+            if not bucket:
+                del self.buckets[key]
+
+    def move(self, sprite):
+        bounds = self._bounds_for(sprite.rect)
+        if bounds != self.bounds.get(sprite):
+            self.remove(sprite)
+            self.insert(sprite)
+
+    def clear(self):
+        self.buckets.clear()
+        self.keys.clear()
+        self.bounds.clear()
+
+    def query(self, rect):
+        # Sprites whose rect overlaps `rect`, in a stable order
+        found = []
+        seen = set()
+        for key in self._keys_for(rect):
+            for sprite in self.buckets.get(key, ()):
+                if sprite not in seen:
+                    seen.add(sprite)
+                    if sprite.rect.colliderect(rect):
+                        found.append(sprite)
+        return found
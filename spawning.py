@@ -0,0 +1,281 @@
+import random
+import pygame
+from spatial import SpatialHash
+
+# Free-cell index for spawn placement. Every footprint size gets a precomputed
+# list of wall-free placements on the cell grid, and a free list that is kept
+# up to date as entities occupy and release cells, so a spawn is a single
+# random pick instead of rejection sampling against every sprite.
+
+class _Footprint:
+    def __init__(self, size, placements, covered):
+        self.size = size
+        self.placements = placements          # (x, y) per placement id
+        self.covered = covered                # cell ids per placement id
+        self.blocked = [0] * len(placements)  # occupied cells per placement id
+        self.by_cell = {}
+        for pid, cells in enumerate(covered):
+            for cell in cells:
+                self.by_cell.setdefault(cell, []).append(pid)
+        self.free = list(range(len(placements)))
+        self.free_slot = list(range(len(placements)))
+        self.by_position = {position: pid for pid, position in enumerate(placements)}
+        self.walled = set()  # Placements a wall was edited onto, kept blocked
+
+    def add_placement(self, position, cells, occupied):
+        pid = len(self.placements)
+        self.placements.append(position)
+        self.covered.append(cells)
+        self.blocked.append(0)
+        self.free_slot.append(len(self.free))
+        self.free.append(pid)
+        self.by_position[position] = pid
+        for cell in cells:
+            self.by_cell.setdefault(cell, []).append(pid)
+            if occupied[cell]:
+                self.block(pid)
+
+    def block(self, pid):
+        self.blocked[pid] += 1
+        if self.blocked[pid] == 1:
+            # Swap-remove from the free list
+            slot = self.free_slot[pid]
+            last = self.free.pop()
+            if last != pid:
+                self.free[slot] = last
+                self.free_slot[last] = slot
+            self.free_slot[pid] = -1
+
+    def unblock(self, pid):
+        self.blocked[pid] -= 1
+        if self.blocked[pid] == 0:
+            self.free_slot[pid] = len(self.free)
+            self.free.append(pid)
+
+class SpawnIndex:
+    def __init__(self, wall_grid, width, height, margin, sizes=()):
+        self.wall_grid = wall_grid
+        self.cell_size = wall_grid.cell_size
+        self.width = width
+        self.height = height
+        self.margin = margin
+        self.cols = -(-width // self.cell_size)
+        self.rows = -(-height // self.cell_size)
+        self.occupied = [0] * (self.cols * self.rows)
+        self.footprints = {}
+        self.spans = {}
+        self.bounds = {}  # Cell range per sprite, compared before rebuilding its span
+
+        for size in sizes:
+            self._footprint(size)
+
+    def _bounds_for(self, x, y, w, h):
+        cs = self.cell_size
+        return (max(x // cs, 0), min((x + w - 1) // cs, self.cols - 1),
+                max(y // cs, 0), min((y + h - 1) // cs, self.rows - 1))
+
+    def _cells_in(self, bounds):
+        left, right, top, bottom = bounds
+        return tuple(row * self.cols + col
+                     for row in range(top, bottom + 1)
+                     for col in range(left, right + 1))
+
+    def _cells_for(self, x, y, w, h):
+        return self._cells_in(self._bounds_for(x, y, w, h))
+
+    def _footprint(self, size):
+        footprint = self.footprints.get(size)
+        if footprint is not None:
+            return footprint
+
+        # Same candidate positions the old rejection sampler drew from
+        placements = []
+        covered = []
+        for y in range(self.margin, self.height - size[1], self.cell_size):
+            for x in range(self.margin, self.width - size[0], self.cell_size):
+                if not self.wall_grid.collides_area(x, y, size[0], size[1]):
+                    placements.append((x, y))
+                    covered.append(self._cells_for(x, y, size[0], size[1]))
+
+        footprint = _Footprint(size, placements, covered)
+        for cell, count in enumerate(self.occupied):
+            if count:
+                for pid in footprint.by_cell.get(cell, ()):
+                    footprint.block(pid)
+        self.footprints[size] = footprint
+        return footprint
+
+    def update_walls(self, x, y, width, height):
+        # Walls inside the pixel area were edited (map hot reload). Only the
+        # placements overlapping it are checked again: new walls block theirs
+        # for good, removed walls free theirs or add new ones
+        cs = self.cell_size
+        for size, footprint in self.footprints.items():
+            first_x = self.margin + max(0, (x - size[0] - self.margin) // cs) * cs
+            first_y = self.margin + max(0, (y - size[1] - self.margin) // cs) * cs
+            for py in range(first_y, min(y + height, self.height - size[1]), cs):
+                for px in range(first_x, min(x + width, self.width - size[0]), cs):
+                    if px + size[0] <= x or py + size[1] <= y:
+                        continue
+                    pid = footprint.by_position.get((px, py))
+                    if self.wall_grid.collides_area(px, py, size[0], size[1]):
+                        if pid is not None and pid not in footprint.walled:
+                            footprint.walled.add(pid)
+                            footprint.block(pid)
+                    elif pid is None:
+                        footprint.add_placement((px, py), self._cells_for(px, py, size[0], size[1]),
+                                                self.occupied)
+                    elif pid in footprint.walled:
+                        footprint.walled.remove(pid)
+                        footprint.unblock(pid)
+
+    def _occupy(self, cells):
+        for cell in cells:
+            self.occupied[cell] += 1
+            if self.occupied[cell] == 1:
+                for footprint in self.footprints.values():
+                    for pid in footprint.by_cell.get(cell, ()):
+                        footprint.block(pid)
+
+    def _release(self, cells):
+        for cell in cells:
+            self.occupied[cell] -= 1
+            if self.occupied[cell] == 0:
+                for footprint in self.footprints.values():
+                    for pid in footprint.by_cell.get(cell, ()):
+                        footprint.unblock(pid)
+
+    def add(self, sprite):
+        rect = sprite.rect
+        bounds = self._bounds_for(rect.x, rect.y, rect.width, rect.height)
+        cells = self._cells_in(bounds)
+        self.bounds[sprite] = bounds
+        self.spans[sprite] = cells
+        self._occupy(cells)
+
+    def move(self, sprite):
+        # Most moves stay inside the same cells, only compare the bounds then
+        rect = sprite.rect
+        bounds = self._bounds_for(rect.x, rect.y, rect.width, rect.height)
+        if bounds != self.bounds[sprite]:
+            cells = self._cells_in(bounds)
+            self._release(self.spans[sprite])
+            self.bounds[sprite] = bounds
+            self.spans[sprite] = cells
+            self._occupy(cells)
+
+    def remove(self, sprite):
+        cells = self.spans.pop(sprite, None)
+        if cells is not None:
+            del self.bounds[sprite]
+            self._release(cells)
+
+    def clear(self):
+        for cells in self.spans.values():
+            self._release(cells)
+        self.spans.clear()
+        self.bounds.clear()
+
+    def find_position(self, size, player_pos=None, safe_distance=0, rng=random, allow_occupied=False):
+        footprint = self._footprint(size)
+        if not footprint.free:
+            return self._find_crowded(footprint, player_pos, safe_distance, rng, allow_occupied)
+        if player_pos is None:
+            return footprint.placements[rng.choice(footprint.free)]
+
+        player_x, player_y = player_pos
+        min_distance_sq = safe_distance * safe_distance
+
+        def far_enough(pid):
+            x, y = footprint.placements[pid]
+            return (x - player_x) ** 2 + (y - player_y) ** 2 >= min_distance_sq
+
+        # The safe area is small, a few random picks almost always land outside it
+        for _ in range(8):
+            pid = rng.choice(footprint.free)
+            if far_enough(pid):
+                return footprint.placements[pid]
+
+        # Fall back to an exact scan so spawning only fails when no space exists
+        candidates = [pid for pid in footprint.free if far_enough(pid)]
+        if candidates:
+            return footprint.placements[rng.choice(candidates)]
+        return self._find_crowded(footprint, player_pos, safe_distance, rng, allow_occupied)
+
+    def _find_crowded(self, footprint, player_pos, safe_distance, rng, allow_occupied):
+        # Crowded levels may stack entities, only walls still rule a placement out
+        placements = footprint.placements
+        if footprint.walled:
+            placements = [position for pid, position in enumerate(placements)
+                          if pid not in footprint.walled]
+        if not allow_occupied or not placements:
+            return None
+        if player_pos is None:
+            return rng.choice(placements)
+
+        player_x, player_y = player_pos
+        min_distance_sq = safe_distance * safe_distance
+        candidates = [(x, y) for x, y in placements
+                      if (x - player_x) ** 2 + (y - player_y) ** 2 >= min_distance_sq]
+        if candidates:
+            return rng.choice(candidates)
+        return None
+
+class AreaSpawnIndex:
+    # Spawn placement for streamed levels, whose size rules out SpawnIndex's
+    # whole-map tables. Positions are drawn on the same cell grid but only
+    # inside `area`, the active area around the player, and rejected when they
+    # hit a wall or an entity. Nothing is built up front and only the map
+    # chunks under the active area are ever looked at.
+    def __init__(self, wall_grid, area, margin, tries=64):
+        self.wall_grid = wall_grid
+        self.cell_size = wall_grid.cell_size
+        self.width = wall_grid.cols * self.cell_size
+        self.height = wall_grid.rows * self.cell_size
+        self.margin = margin
+        self.area = area
+        self.tries = tries
+        self.entities = SpatialHash(self.cell_size * 2)
+
+    def set_area(self, area):
+        self.area = area
+
+    def add(self, sprite):
+        self.entities.insert(sprite)
+
+    def move(self, sprite):
+        self.entities.move(sprite)
+
+    def remove(self, sprite):
+        self.entities.remove(sprite)
+
+    def clear(self):
+        self.entities.clear()
+
+    def find_position(self, size, player_pos=None, safe_distance=0, rng=random, allow_occupied=False):
+        cs = self.cell_size
+        area = self.area
+        # Grid steps inside both the area and the level's margin
+        first_x = max(0, -(-(area.left - self.margin) // cs))
+        last_x = (min(area.right, self.width) - size[0] - self.margin - 1) // cs
+        first_y = max(0, -(-(area.top - self.margin) // cs))
+        last_y = (min(area.bottom, self.height) - size[1] - self.margin - 1) // cs
+        if first_x > last_x or first_y > last_y:
+            return None
+
+        min_distance_sq = safe_distance * safe_distance
+        crowded = None
+        for _ in range(self.tries):
+            x = self.margin + rng.randint(first_x, last_x) * cs
+            y = self.margin + rng.randint(first_y, last_y) * cs
+            if player_pos is not None and \
+                    (x - player_pos[0]) ** 2 + (y - player_pos[1]) ** 2 < min_distance_sq:
+                continue
+            if self.wall_grid.collides_area(x, y, size[0], size[1]):
+                continue
+            if not self.entities.query(pygame.Rect(x, y, size[0], size[1])):
+                return (x, y)
+            if crowded is None:
+                crowded = (x, y)
+        # Crowded areas may stack entities, like SpawnIndex does
+        return crowded if allow_occupied else None
@@ -0,0 +1,112 @@
+from settings import *
+
+try:
+    import numpy as np
+except ImportError:  # Optional, only needed for batched chairs
+    np = None
+
+# Batched chair engine. Positions, directions and spawn times of every chair
+# live in NumPy arrays and advance in one vectorised step, the Enemy sprites
+# are only kept around for drawing.
+
+DIRECTIONS = [(1,0), (-1,0), (0,1), (0,-1)]
+
+def numpy_available():
+    return np is not None
+
+class ChairSwarm:
+    def __init__(self, wall_grid, size, speed=ENEMY_SPEED, seed=None,
+                 respawn_time=CHAIR_RESPAWN_TIME):
+        if np is None:
+            raise ImportError("Batched chairs need NumPy installed")
+
+        self.width, self.height = size
+        self.speed = speed
+        self.respawn_time = respawn_time
+        self.rng = np.random.default_rng(seed)
+        self.set_walls(wall_grid)
+
+        self.vectors = np.array(DIRECTIONS, dtype=np.float64)
+        # Every direction except the reverse one, indexed by current direction
+        self.turns = np.array([[d for d in range(4)
+                                if DIRECTIONS[d] != (-DIRECTIONS[current][0], -DIRECTIONS[current][1])]
+                               for current in range(4)], dtype=np.int8)
+
+        self.x = np.zeros(0, dtype=np.int64)
+        self.y = np.zeros(0, dtype=np.int64)
+        self.direction = np.zeros(0, dtype=np.int8)
+        self.spawn_time = np.zeros(0, dtype=np.float64)
+        self.sprites = []
+
+    def set_walls(self, wall_grid):
+        # Summed-area table over the wall grid, so counting the walls under a
+        # rect is four lookups no matter how many cells it covers
+        self.cell_size = wall_grid.cell_size
+        self.rows = wall_grid.rows
+        self.cols = wall_grid.cols
+        walls = np.frombuffer(bytes(wall_grid.cells), dtype=np.uint8)
+        walls = walls.reshape(self.rows, self.cols).astype(np.int32)
+        self.wall_sums = np.zeros((self.rows + 1, self.cols + 1), dtype=np.int32)
+        self.wall_sums[1:, 1:] = walls.cumsum(axis=0).cumsum(axis=1)
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def add(self, sprite, spawn_time):
+        self.x = np.append(self.x, sprite.rect.x)
+        self.y = np.append(self.y, sprite.rect.y)
+        self.direction = np.append(self.direction, DIRECTIONS.index(sprite.direction)).astype(np.int8)
+        self.spawn_time = np.append(self.spawn_time, spawn_time)
+        self.sprites.append(sprite)
+
+    def place(self, index, x, y, spawn_time):
+        self.x[index] = x
+        self.y[index] = y
+        self.spawn_time[index] = spawn_time
+        self.sprites[index].rect.topleft = (x, y)
+
+    def _hits_walls(self, x, y):
+        cs = self.cell_size
+        left = np.clip(x // cs, 0, self.cols)
+        right = np.clip((x + self.width - 1) // cs + 1, 0, self.cols)
+        top = np.clip(y // cs, 0, self.rows)
+        bottom = np.clip((y + self.height - 1) // cs + 1, 0, self.rows)
+        # Rects fully outside the map clip to an empty range
+        right = np.maximum(right, left)
+        bottom = np.maximum(bottom, top)
+        sums = self.wall_sums
+        count = sums[bottom, right] - sums[top, right] - sums[bottom, left] + sums[top, left]
+        return count > 0
+
+    def inside_walls(self):
+        return np.nonzero(self._hits_walls(self.x, self.y))[0]
+
+    def update(self):
+        if not self.sprites:
+            return
+
+        # Move, rounding like pygame.Rect does for float offsets
+        step = self.vectors[self.direction] * self.speed
+        new_x = self.x + step[:, 0]
+        new_y = self.y + step[:, 1]
+        new_x = (np.sign(new_x) * np.floor(np.abs(new_x) + 0.5)).astype(np.int64)
+        new_y = (np.sign(new_y) * np.floor(np.abs(new_y) + 0.5)).astype(np.int64)
+
+        # Revert chairs that hit a wall and pick a new direction, never the reverse
+        hit = self._hits_walls(new_x, new_y)
+        self.x = np.where(hit, self.x, new_x)
+        self.y = np.where(hit, self.y, new_y)
+        hit_index = np.nonzero(hit)[0]
+        if len(hit_index):
+            choice = self.rng.integers(0, 3, size=len(hit_index))
+            self.direction[hit_index] = self.turns[self.direction[hit_index], choice]
+
+    def sync_sprites(self):
+        # Copy positions back into the sprites used for drawing
+        for sprite, x, y in zip(self.sprites, self.x.tolist(), self.y.tolist()):
+            sprite.rect.topleft = (x, y)
+
+    def colliding(self, rect):
+        hit = ((self.x < rect.right) & (self.x + self.width > rect.left) &
+               (self.y < rect.bottom) & (self.y + self.height > rect.top))
+        return [self.sprites[i] for i in np.nonzero(hit)[0]]
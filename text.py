@@ -0,0 +1,47 @@
+import pygame
+from collections import OrderedDict
+
+# Fonts live for the whole process, rendered strings are kept in a small LRU cache
+MAX_CACHED_SURFACES = 256
+
+_fonts = {}
+_surfaces = OrderedDict()
+
+def get_font(size, name=None):
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = pygame.font.Font(name, size)
+        _fonts[key] = font
+    return font
+
+def render(text, size, color, name=None):
+    key = (name, size, text, color)
+    surface = _surfaces.get(key)
+    if surface is not None:
+        _surfaces.move_to_end(key)
+        return surface
+
+    surface = get_font(size, name).render(text, True, color)
+    _surfaces[key] = surface
+    if len(_surfaces) > MAX_CACHED_SURFACES:
+        _surfaces.popitem(last=False)
+    return surface
+
+def clear_cache():
+    _surfaces.clear()
+
+class HudText:
+    # Keeps the last rendered surface and only re-renders when the value changes
+    def __init__(self, template, size, color):
+        self.template = template
+        self.size = size
+        self.color = color
+        self.value = None
+        self.surface = None
+
+    def render(self, value):
+        if self.surface is None or value != self.value:
+            self.value = value
+            self.surface = render(self.template.format(value), self.size, self.color)
+        return self.surface